@@ -2,7 +2,7 @@
 
 import { useState, useEffect } from 'react';
 import { createClient } from '@/lib/supabase/client';
-import { generateDailyFeed } from '@/lib/api';
+import { streamDailyFeed } from '@/lib/api';
 import { MOCK_USER, MOCK_DINING_HALLS } from '@/lib/mockData';
 import { DEMO_PROFILES } from '@/lib/demoProfiles';
 import { getMockRecommendations } from '@/lib/mockApiResponses';
@@ -10,6 +10,20 @@ import FeedCard from '@/components/FeedCard';
 import QueryBox from '@/components/QueryBox';
 import VisaOffers from '@/components/VisaOffers';
 
+// Map an AI recommendation to the FeedRecommendation format
+function formatRecommendation(rec: any) {
+  return {
+    diningHall: rec.dining_hall || rec.diningHall,
+    dishRecommendation: rec.meal || rec.dishRecommendation,
+    reasoning: rec.reasoning,
+    urgency: 'high' as const,
+    paymentMethod: rec.use_swipe ? 'swipe' as const : 'flex' as const,
+    savingsImpact: `Save ${rec.savings_amount}`,
+    estimatedWait: '5-10 min',
+    matchScore: 95
+  };
+}
+
 export default function FeedPage() {
   const [recommendations, setRecommendations] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
@@ -40,23 +54,16 @@ export default function FeedPage() {
     
     setUserData(data);
     
-    // Try to get AI recommendations with preferences
+    // Stream AI recommendations with preferences; show each card as it arrives
     try {
-      const aiRecs = await generateDailyFeed(data, MOCK_DINING_HALLS, new Date());
-      if (aiRecs && aiRecs.length > 0) {
-        // Map AI response to FeedRecommendation format
-        const formattedRecs = aiRecs.map((rec: any) => ({
-          diningHall: rec.dining_hall || rec.diningHall,
-          dishRecommendation: rec.meal || rec.dishRecommendation,
-          reasoning: rec.reasoning,
-          urgency: 'high' as const,
-          paymentMethod: rec.use_swipe ? 'swipe' as const : 'flex' as const,
-          savingsImpact: `Save ${rec.savings_amount}`,
-          estimatedWait: '5-10 min',
-          matchScore: 95
-        }));
-        setRecommendations(formattedRecs);
-      } else {
+      let received = 0;
+      await streamDailyFeed(data, MOCK_DINING_HALLS, new Date(), (rec: any) => {
+        const formattedRec = formatRecommendation(rec);
+        const first = received++ === 0;
+        setRecommendations(prev => (first ? [formattedRec] : [...prev, formattedRec]));
+        setLoading(false);
+      });
+      if (received === 0) {
         // Fallback to mock
         setRecommendations(getMockRecommendations(data));
       }
@@ -0,0 +1,271 @@
+"""
+Backtest: rolling-origin forecast accuracy vs latency over the mock_data corpus
+Runs forecast_from_json for every dataset, filter, mode and engine configuration
+
+For each dataset and mode the history is cut at `folds` origins, the first
+one a full forecast horizon before the last day and each further one `step`
+days earlier; everything up to an origin is the training payload, and each
+forecast point is scored against the realised mean daily spend (over active
+days) of its period: the day itself for daily mode, the following 7 days for
+weekly, the calendar month for monthly. Periods that run past the end of the
+data or have no spending are not scored.
+
+Per run we record MAE, MAPE, interval coverage, fit / predict time (from the
+result's timings_ms) and, with --memory, peak Python allocations via
+tracemalloc on the first fold (the Stan optimiser runs in a subprocess and is
+not included).
+
+Usage (from backend/):
+    python -m benchmarks.backtest [--datasets 10] [--modes daily weekly] [--folds 3] [--step 7]
+                                  [--filters type] [--configs numpy prophet ...]
+                                  [--grid changepoint_prior_scale=0.05,0.5] [--memory]
+                                  [--output backtest_report.json]
+"""
+
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.prediction import forecast_from_json, load_data, preprocess_data
+from src.rollup import parse_days
+
+MOCK_DATA_DIR = Path(__file__).resolve().parent.parent / "src" / "mock_data"
+MIN_TRAIN_DAYS = 5
+
+# Days spanned by each mode's forecast (7 days / 4 weeks / 3 months, as in prediction)
+HORIZON_DAYS = {"daily": 7, "weekly": 28, "monthly": 91}
+
+# Named configurations: forecast_from_json keyword arguments
+CONFIGS: Dict[str, Dict[str, Any]] = {
+    "numpy": {"engine": "numpy"},
+    "prophet": {"engine": "prophet"},
+    "prophet-reduced": {"engine": "prophet", "interval_strategy": "reduced"},
+    "prophet-analytic": {"engine": "prophet", "interval_strategy": "analytic"},
+    "prophet-cps0.05": {"engine": "prophet", "prophet_params": {"changepoint_prior_scale": 0.05}},
+    "prophet-no-daily": {"engine": "prophet", "prophet_params": {"daily_seasonality": False}},
+}
+
+
+def grid_configs(grid: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Expand --grid KEY=V1,V2 options into one Prophet config per value"""
+    configs = {}
+    for spec in grid:
+        name, _, raw_values = spec.partition("=")
+        for raw in raw_values.split(","):
+            try:
+                value = json.loads(raw)
+            except json.JSONDecodeError:
+                value = raw
+            configs[f"prophet[{name}={raw}]"] = {"engine": "prophet", "prophet_params": {name: value}}
+    return configs
+
+
+def period_end(day: np.datetime64, mode: str) -> np.datetime64:
+    """Exclusive end of the period a forecast point stands for"""
+    if mode == "weekly":
+        return day + np.timedelta64(7, "D")
+    if mode == "monthly":
+        return (day.astype("datetime64[M]") + np.timedelta64(1, "M")).astype("datetime64[D]")
+    return day + np.timedelta64(1, "D")
+
+
+def score(forecast: List[Dict[str, Any]], actuals: pd.DataFrame, mode: str) -> Dict[str, float]:
+    """Absolute / percentage errors and interval hits of one forecast against realised spend"""
+    days = actuals["ds"].to_numpy(dtype="datetime64[D]")
+    amounts = actuals["y"].to_numpy(dtype=np.float64)
+    data_end = days.max() + np.timedelta64(1, "D")
+
+    sums = {"points": 0, "abs_err": 0.0, "ape": 0.0, "ape_points": 0, "covered": 0}
+    for point in forecast:
+        start = np.datetime64(point["date"], "D")
+        end = period_end(start, mode)
+        in_period = (days >= start) & (days < end)
+        if end > data_end or not in_period.any():
+            continue
+
+        actual = float(amounts[in_period].mean())
+        error = abs(point["predicted_amount"] - actual)
+        sums["points"] += 1
+        sums["abs_err"] += error
+        if actual > 0:
+            sums["ape"] += error / actual
+            sums["ape_points"] += 1
+        if point["lower_bound"] <= actual <= point["upper_bound"]:
+            sums["covered"] += 1
+    return sums
+
+
+def run_config(payload: Dict[str, Any], mode: str, filter_spec: Tuple[Optional[str], Optional[str]],
+               config: Dict[str, Any], trace_memory: bool) -> Dict[str, Any]:
+    """One timed forecast (plus an optional traced repeat for peak memory)"""
+    kwargs = dict(
+        data=payload, mode=mode, filter_type=filter_spec[0], filter_value=filter_spec[1],
+        use_cache=False, use_registry=False, **config
+    )
+
+    started = time.perf_counter()
+    result = forecast_from_json(**kwargs)
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    peak_kib = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            forecast_from_json(**kwargs)
+            peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+
+    timings = result["metadata"].get("timings_ms", {})
+    return {
+        "result": result,
+        "wall_ms": wall_ms,
+        "fit_ms": timings.get("fit", 0.0),
+        "predict_ms": timings.get("predict", 0.0) + timings.get("intervals", 0.0),
+        "peak_kib": peak_kib
+    }
+
+
+def backtest_dataset(path: Path, args: argparse.Namespace, configs: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    data = load_data(path)
+    transactions = data["Transactions"]
+    transaction_days = parse_days([t["date"] for t in transactions])
+
+    filters: List[Tuple[Optional[str], Optional[str]]] = [(None, None)]
+    for field in args.filters:
+        filters += [(field, value) for value in sorted({str(t[field]) for t in transactions if t.get(field)})]
+
+    rows = []
+    for filter_spec in filters:
+        actuals = preprocess_data(data, *filter_spec)
+        actual_days = actuals["ds"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+        last_day = int(actual_days.max())
+
+        for mode in args.modes:
+            for fold in range(1, args.folds + 1):
+                cutoff = last_day - HORIZON_DAYS[mode] - (fold - 1) * args.step
+                train_days = int((actual_days <= cutoff).sum())
+                if train_days < MIN_TRAIN_DAYS:
+                    break
+                payload = {"Transactions": [t for t, day in zip(transactions, transaction_days) if day <= cutoff]}
+
+                for name, config in configs.items():
+                    row = {
+                        "dataset": path.stem,
+                        "filter": f"{filter_spec[0]}={filter_spec[1]}" if filter_spec[0] else "none",
+                        "fold": fold,
+                        "mode": mode,
+                        "config": name,
+                        "train_days": train_days
+                    }
+                    try:
+                        run = run_config(payload, mode, filter_spec, config, args.memory and fold == 1)
+                    except Exception as e:
+                        row["error"] = str(e)
+                        rows.append(row)
+                        continue
+
+                    row.update(score(run["result"]["forecast"], actuals, mode))
+                    row.update({key: run[key] for key in ("wall_ms", "fit_ms", "predict_ms", "peak_kib")})
+                    rows.append(row)
+    return rows
+
+
+def summarise(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Pool errors over datasets/filters/folds per (config, mode); latency as percentiles"""
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        groups[(row["config"], row["mode"])].append(row)
+
+    summary = []
+    for (config, mode), group in groups.items():
+        ok = [row for row in group if "error" not in row]
+        points = sum(row["points"] for row in ok)
+        ape_points = sum(row["ape_points"] for row in ok)
+        wall = np.array([row["wall_ms"] for row in ok]) if ok else np.zeros(1)
+        peaks = [row["peak_kib"] for row in ok if row["peak_kib"] is not None]
+
+        summary.append({
+            "config": config,
+            "mode": mode,
+            "runs": len(ok),
+            "failed": len(group) - len(ok),
+            "points": points,
+            "mae": sum(row["abs_err"] for row in ok) / points if points else None,
+            "mape": sum(row["ape"] for row in ok) / ape_points * 100 if ape_points else None,
+            "coverage": sum(row["covered"] for row in ok) / points * 100 if points else None,
+            "fit_ms_p50": float(np.median([row["fit_ms"] for row in ok])) if ok else None,
+            "predict_ms_p50": float(np.median([row["predict_ms"] for row in ok])) if ok else None,
+            "wall_ms_p50": float(np.percentile(wall, 50)),
+            "wall_ms_p95": float(np.percentile(wall, 95)),
+            "peak_kib_p50": float(np.median(peaks)) if peaks else None
+        })
+
+    return sorted(summary, key=lambda s: (s["mode"], s["config"]))
+
+
+def print_report(summary: List[Dict[str, Any]]) -> None:
+    def fmt(value: Optional[float], width: int, decimals: int) -> str:
+        return f"{'-':>{width}}" if value is None else f"{value:>{width}.{decimals}f}"
+
+    name_width = max([len("config")] + [len(s["config"]) for s in summary])
+    header = (f"{'mode':>8} | {'config':>{name_width}} | {'runs':>5} | {'fail':>4} | {'points':>6} | {'MAE $':>7} | "
+              f"{'MAPE %':>7} | {'cover %':>7} | {'fit ms':>7} | {'pred ms':>7} | {'p95 ms':>7} | {'peak KiB':>8}")
+    print(header)
+    print("-" * len(header))
+    for s in summary:
+        print(f"{s['mode']:>8} | {s['config']:>{name_width}} | {s['runs']:>5} | {s['failed']:>4} | {s['points']:>6} | "
+              f"{fmt(s['mae'], 7, 2)} | {fmt(s['mape'], 7, 1)} | {fmt(s['coverage'], 7, 1)} | "
+              f"{fmt(s['fit_ms_p50'], 7, 1)} | {fmt(s['predict_ms_p50'], 7, 1)} | "
+              f"{s['wall_ms_p95']:>7.1f} | {fmt(s['peak_kib_p50'], 8, 0)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--datasets", type=int, default=None, help="only the first N mock_data files")
+    parser.add_argument("--modes", nargs="+", default=["daily", "weekly", "monthly"])
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--step", type=int, default=7, help="days between forecast origins")
+    parser.add_argument("--filters", nargs="*", default=["type"], help="fields whose values are backtested separately")
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS), choices=list(CONFIGS))
+    parser.add_argument("--grid", nargs="*", default=[], help="extra Prophet configs, e.g. changepoint_prior_scale=0.05,0.5")
+    parser.add_argument("--memory", action="store_true", help="trace peak allocations (one extra run per first fold)")
+    parser.add_argument("--output", type=Path, default=None, help="write settings, summary and per-run rows as JSON")
+    args = parser.parse_args()
+
+    # Failed runs are counted in the report; don't log their tracebacks too
+    logging.disable(logging.ERROR)
+
+    configs = {name: CONFIGS[name] for name in args.configs}
+    configs.update(grid_configs(args.grid))
+
+    paths = sorted(MOCK_DATA_DIR.glob("combined_mockdata_*.json"))[:args.datasets]
+    print(f"Backtesting {len(configs)} configs on {len(paths)} datasets "
+          f"({args.folds} folds every {args.step} days, modes {args.modes})\n")
+
+    started = time.perf_counter()
+    rows: List[Dict[str, Any]] = []
+    for path in paths:
+        rows += backtest_dataset(path, args, configs)
+
+    summary = summarise(rows)
+    print_report(summary)
+    print(f"\n{len(rows)} runs in {time.perf_counter() - started:.1f}s")
+
+    if args.output is not None:
+        report = {"settings": {**vars(args), "output": str(args.output)}, "configs": configs,
+                  "summary": summary, "rows": rows}
+        args.output.write_text(json.dumps(report, indent=2, default=str))
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
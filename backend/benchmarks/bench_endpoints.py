@@ -0,0 +1,449 @@
+"""
+Benchmark: every API route in-process, with the LLM and Visa backends stubbed out
+Records p50/p95/p99 latency and allocations per route and compares them with a stored baseline
+
+Requests go through httpx's ASGITransport straight into the FastAPI app (with
+its lifespan, so the forecast pool is running). call_claude_via_lava and the
+Visa calls are replaced by deterministic stand-ins that answer instantly, or
+after --llm-latency-ms (async) / --visa-latency-ms (blocking, like the Visa
+client) of sleep to mimic the real network calls. Allocations are the median per-request tracemalloc peak over
+a separate traced pass (API process only; forecast workers are not traced).
+
+A route regresses when its p50 or p95 latency, or its allocation peak, is more
+than --threshold above the baseline (and by more than a small absolute
+margin, --min-delta-ms, so scheduler noise is ignored). Regressions exit with status 1.
+
+Usage (from backend/):
+    python -m benchmarks.bench_endpoints [--iterations 200] [--routes analyze query ...]
+                                         [--baseline benchmarks/baselines/endpoints.json]
+                                         [--save-baseline] [--threshold 0.25]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Keep benchmark fits out of the developer's model registry (read at import time)
+os.environ.setdefault("MODEL_REGISTRY_DIR", tempfile.mkdtemp(prefix="zenwallet-bench-registry-"))
+
+import httpx
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baselines" / "endpoints.json"
+MOCK_DATA_PATH = BENCH_DIR.parent / "src" / "mock_data" / "combined_mockdata_01.json"
+
+# Absolute margins below which a relative slowdown is treated as noise
+MIN_DELTA_MS = 1.0
+MIN_DELTA_KIB = 16.0
+
+
+@dataclass
+class Scenario:
+    """One benchmarked request; body(i) builds the JSON body for iteration i"""
+    name: str
+    method: str
+    path: str
+    url: Optional[str] = None
+    body: Optional[Callable[[int], Any]] = None
+    iterations: Optional[int] = None
+
+
+# ---------------------------------------------------------------------------
+# Deterministic stand-ins for the external services
+# ---------------------------------------------------------------------------
+
+def install_stubs(llm_latency_ms: float, visa_latency_ms: float) -> None:
+    """Replace the Lava/Claude and Visa calls everywhere the routes look them up"""
+    import src.agent
+    import src.main
+    import src.visa_service
+    from src.mock_data import FALLBACK_ANALYSIS, FALLBACK_RECOMMENDATIONS, FALLBACK_QUERY_RESPONSE
+    from src.prompts import ANALYZER_PROMPT, CHATBOT_PROMPT
+
+    responses = {
+        ANALYZER_PROMPT: json.dumps(FALLBACK_ANALYSIS.model_dump()),
+        src.agent.RECOMMENDER_PROMPT: json.dumps([rec.model_dump() for rec in FALLBACK_RECOMMENDATIONS]),
+        CHATBOT_PROMPT: FALLBACK_QUERY_RESPONSE,
+    }
+    parsed_transaction = json.dumps({"merchant": "Starbucks", "amount": 4.5, "type": "flex"})
+
+    async def fake_claude(system_prompt: str, user_prompt: str, temperature: float = 0.7, **kwargs: Any) -> str:
+        if llm_latency_ms:
+            await asyncio.sleep(llm_latency_ms / 1000)
+        return responses.get(system_prompt, parsed_transaction)
+
+    async def fake_claude_stream(system_prompt: str, user_prompt: str, temperature: float = 0.7, **kwargs: Any):
+        words = responses.get(system_prompt, parsed_transaction).split(" ")
+        for index, word in enumerate(words):
+            if llm_latency_ms:
+                await asyncio.sleep(llm_latency_ms / 1000 / len(words))
+            yield word if index == 0 else " " + word
+
+    def fake_search_merchant(merchant_name: str, latitude: Optional[float] = None,
+                             longitude: Optional[float] = None) -> Dict[str, Any]:
+        if visa_latency_ms:
+            time.sleep(visa_latency_ms / 1000)
+        return src.visa_service.get_mock_merchant_data(merchant_name)
+
+    def fake_get_merchant_offers(latitude: float = 37.8044, longitude: float = -122.2712,
+                                 radius: int = 5) -> List[Dict[str, Any]]:
+        if visa_latency_ms:
+            time.sleep(visa_latency_ms / 1000)
+        return src.visa_service.get_mock_offers()
+
+    stubs = {
+        "call_claude_via_lava": fake_claude,
+        "stream_claude_via_lava": fake_claude_stream,
+        "search_merchant": fake_search_merchant,
+        "get_merchant_offers": fake_get_merchant_offers,
+    }
+    for module in (src.agent, src.visa_service, src.main):
+        for name, stub in stubs.items():
+            if hasattr(module, name):
+                setattr(module, name, stub)
+
+
+# ---------------------------------------------------------------------------
+# Scenarios
+# ---------------------------------------------------------------------------
+
+def build_scenarios() -> List[Scenario]:
+    with open(MOCK_DATA_PATH, "r", encoding="utf-8") as f:
+        mock = json.load(f)
+
+    user = mock["UserData"]
+    profile = {
+        "name": user["name"],
+        "total_budget": float(user["totalPlan"]),
+        "total_spent": float(user["currentSpent"]),
+        "total_swipes": user["totalSwipes"],
+        "swipes_used": user["currentSwipes"],
+        "swipes_remaining": user["totalSwipes"] - user["currentSwipes"],
+        "total_flex": float(user["flexDollars"]),
+        "flex_spent": 120.0,
+        "flex_remaining": float(user["flexDollars"]) - 120.0,
+        "weeks_remaining": 16 - user["weeksIntoSemester"],
+        "preferences": {
+            **user["preferences"],
+            "priorities": {"speed": 80, "budget": 60, "health": 40, "social": 20},
+            "cuisine_ratings": {"Mexican": 5, "American": 4, "Thai": 2},
+            "dietary_restrictions": ["Pescatarian"],
+            "avoid_ingredients": ["peanuts"]
+        }
+    }
+    dining_halls = [
+        {
+            "name": hall["name"],
+            "current_menu": hall["currentMenu"],
+            "wait_time": 5 + 3 * index,
+            "crowd_level": hall["crowdLevel"],
+            "accepts_swipes": hall["acceptsSwipes"],
+            "distance": hall["distance"]
+        }
+        for index, hall in enumerate(mock["DiningHalls"])
+    ]
+    transactions = [
+        {"merchant": t["location"], "amount": t["amount"], "type": t["type"], "timestamp": t["date"],
+         "category": t.get("category")}
+        for t in mock["Transactions"]
+    ]
+    current_time = "2025-10-23T12:30:00"
+
+    def forecast_payload(i: int, cold: bool, **extra: Any) -> Dict[str, Any]:
+        payload = copy.deepcopy(mock)
+        if cold:
+            # A fresh user per iteration misses the rollup, result cache and model registry
+            payload["UserData"]["id"] = f"bench-cold-{i}"
+            for t in payload["Transactions"]:
+                t["amount"] = round(t["amount"] * (1 + i / 1000), 2)
+        return {**payload, "mode": "weekly", **extra}
+
+    return [
+        Scenario("root", "GET", "/"),
+        Scenario("health", "GET", "/health"),
+        Scenario("ready", "GET", "/ready"),
+        Scenario("metrics", "GET", "/metrics"),
+        Scenario("analyze", "POST", "/api/analyze",
+                 body=lambda i: {"user_data": profile, "transactions": transactions}),
+        Scenario("analyze[local]", "POST", "/api/analyze",
+                 body=lambda i: {"user_data": profile, "transactions": transactions, "mode": "local"}),
+        Scenario("recommendations", "POST", "/api/recommendations",
+                 body=lambda i: {"user_data": profile, "dining_halls": dining_halls, "current_time": current_time}),
+        Scenario("recommendations[local]", "POST", "/api/recommendations",
+                 body=lambda i: {"user_data": profile, "dining_halls": dining_halls, "current_time": current_time,
+                                 "mode": "local"}),
+        Scenario("recommendations/stream", "POST", "/api/recommendations/stream",
+                 body=lambda i: {"user_data": {**profile, "flex_remaining": profile["flex_remaining"] + i},
+                                 "dining_halls": dining_halls, "current_time": current_time}),
+        Scenario("query", "POST", "/api/query",
+                 body=lambda i: {"query": "Where should I get lunch?", "user_data": profile,
+                                 "dining_halls": dining_halls, "current_time": current_time}),
+        Scenario("query[uncached]", "POST", "/api/query",
+                 body=lambda i: {"query": f"Where should I get lunch near building {i}?", "user_data": profile,
+                                 "dining_halls": dining_halls, "current_time": current_time}),
+        Scenario("query/stream", "POST", "/api/query/stream",
+                 body=lambda i: {"query": f"Anything quick for lunch near building {i}?", "user_data": profile,
+                                 "dining_halls": dining_halls, "current_time": current_time}),
+        Scenario("parse-transaction", "POST", "/api/parse-transaction",
+                 body=lambda i: {"text": "spent 450 cents at starbucks with flex"}),
+        Scenario("parse-transaction[llm]", "POST", "/api/parse-transaction",
+                 body=lambda i: {"text": "grabbed lunch with friends, split the bill"}),
+        Scenario("spending-forecast[cached]", "POST", "/api/spending-forecast",
+                 body=lambda i: forecast_payload(i, cold=False)),
+        Scenario("spending-forecast[numpy-cold]", "POST", "/api/spending-forecast",
+                 body=lambda i: forecast_payload(i, cold=True, engine="numpy")),
+        Scenario("spending-forecast[prophet-cold]", "POST", "/api/spending-forecast", iterations=20,
+                 body=lambda i: forecast_payload(i, cold=True, engine="prophet")),
+        Scenario("spending-forecast/horizons", "POST", "/api/spending-forecast/horizons",
+                 body=lambda i: forecast_payload(i, cold=True, engine="numpy")),
+        Scenario("spending-forecast/groups", "POST", "/api/spending-forecast/groups",
+                 body=lambda i: forecast_payload(i, cold=True, engine="numpy", group_by="category")),
+        Scenario("spending-forecast/batch", "POST", "/api/spending-forecast/batch",
+                 body=lambda i: forecast_payload(i, cold=True, engine="numpy",
+                                                 filters=[{"filter_type": "type", "filter_value": "swipe"},
+                                                          {"filter_type": "type", "filter_value": "flex"}])),
+        Scenario("spending-rollup", "POST", "/api/spending-rollup",
+                 body=lambda i: {**mock, "grain": "week", "group_by": "category"}),
+        Scenario("spending-rollup[get]", "GET", "/api/spending-rollup/{user_id}",
+                 url=f"/api/spending-rollup/{user['id']}?grain=month&group_by=type"),
+        Scenario("spending-rollup/append", "POST", "/api/spending-rollup/append",
+                 body=lambda i: {"UserData": user, "Transactions": [
+                     {"id": f"bench-append-{i}", "date": "2025-10-24T12:00:00Z", "amount": 9.5,
+                      "category": "lunch", "location": "Central Dining", "type": "swipe"}
+                 ]}),
+        Scenario("merchant-search", "POST", "/api/merchant-search",
+                 body=lambda i: {"merchant_name": "Starbucks"}),
+        Scenario("visa-offers", "POST", "/api/visa-offers",
+                 body=lambda i: {"latitude": 37.8044, "longitude": -122.2712, "radius": 5}),
+        Scenario("transaction-controls", "GET", "/api/transaction-controls/{user_id}",
+                 url="/api/transaction-controls/bench-user"),
+    ]
+
+
+def uncovered_routes(app: Any, scenarios: List[Scenario]) -> List[str]:
+    """API routes with no scenario, so new endpoints don't silently escape the benchmark"""
+    from fastapi.routing import APIRoute
+
+    covered = {(s.method, s.path) for s in scenarios}
+    missing = []
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        for method in route.methods:
+            if (method, route.path) not in covered:
+                missing.append(f"{method} {route.path}")
+    return missing
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+async def measure(client: httpx.AsyncClient, scenario: Scenario, iterations: int,
+                  warmup: int, alloc_iterations: int) -> Dict[str, Any]:
+    async def send(i: int) -> None:
+        body = scenario.body(i) if scenario.body else None
+        response = await client.request(scenario.method, scenario.url or scenario.path, json=body)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{scenario.name}: HTTP {response.status_code} {response.text[:200]}")
+
+    for i in range(warmup):
+        await send(-1 - i)
+
+    latencies = []
+    for i in range(iterations):
+        body = scenario.body(i) if scenario.body else None
+        started = time.perf_counter()
+        response = await client.request(scenario.method, scenario.url or scenario.path, json=body)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{scenario.name}: HTTP {response.status_code} {response.text[:200]}")
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(alloc_iterations):
+            tracemalloc.reset_peak()
+            baseline_size = tracemalloc.get_traced_memory()[0]
+            await send(iterations + i)
+            peaks.append((tracemalloc.get_traced_memory()[1] - baseline_size) / 1024)
+    finally:
+        tracemalloc.stop()
+
+    samples = np.array(latencies)
+    return {
+        "n": iterations,
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "alloc_kib": round(statistics.median(peaks), 1) if peaks else None
+    }
+
+
+async def wait_for_warmup(timeout: float = 120.0) -> None:
+    """Block until the app's background warm-up (src.warmup) has finished
+
+    Warm-up imports compete for CPU with the routes being timed, so measuring
+    any earlier skews p95.
+    """
+    from src.forecast_executor import forecast_executor
+    from src.warmup import warmup
+
+    if not warmup.enabled:
+        await forecast_executor.wait_until_warm()
+        return
+
+    deadline = time.monotonic() + timeout
+    while warmup.state == "warming" and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    if not warmup.ready:
+        print(f"⚠️  Warm-up {warmup.state}; measurements may be noisy")
+
+
+async def run_benchmarks(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    from src.main import app
+
+    install_stubs(args.llm_latency_ms, args.visa_latency_ms)
+    scenarios = build_scenarios()
+
+    missing = uncovered_routes(app, scenarios)
+    if missing:
+        print(f"⚠️  Routes without a benchmark scenario: {', '.join(missing)}\n")
+
+    if args.routes:
+        scenarios = [s for s in scenarios if any(s.name.startswith(r) for r in args.routes)]
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        await wait_for_warmup()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for scenario in scenarios:
+                iterations = min(args.iterations, scenario.iterations or args.iterations)
+                gc.collect()
+                # Route handlers print progress; keep it out of the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results[scenario.name] = await measure(
+                        client, scenario, iterations, args.warmup, min(args.alloc_iterations, iterations)
+                    )
+                print(f"  {scenario.name:<34} p50 {results[scenario.name]['p50_ms']:>9.2f} ms")
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Baselines
+# ---------------------------------------------------------------------------
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float, min_delta_ms: float = MIN_DELTA_MS) -> Dict[str, List[str]]:
+    """Per-route list of metrics that regressed beyond the threshold"""
+    regressions: Dict[str, List[str]] = {}
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+
+        flagged = []
+        for metric, margin in (("p50_ms", min_delta_ms), ("p95_ms", min_delta_ms), ("alloc_kib", MIN_DELTA_KIB)):
+            now, before = current.get(metric), previous.get(metric)
+            if now is None or before is None:
+                continue
+            if now > before * (1 + threshold) and now - before > margin:
+                flagged.append(f"{metric} {before:g} -> {now:g}")
+        if flagged:
+            regressions[name] = flagged
+    return regressions
+
+
+def print_report(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                 regressions: Dict[str, List[str]]) -> None:
+    header = (f"{'route':<34} | {'n':>4} | {'p50 ms':>9} | {'p95 ms':>9} | {'p99 ms':>9} | "
+              f"{'alloc KiB':>9} | {'base p95':>9} | {'Δ p95':>7} | status")
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        previous = baseline.get(name, {})
+        base_p95 = previous.get("p95_ms")
+        change = f"{(r['p95_ms'] / base_p95 - 1) * 100:+6.0f}%" if base_p95 else f"{'-':>7}"
+        status = "REGRESSION" if name in regressions else ("ok" if previous else "new")
+        alloc = f"{r['alloc_kib']:>9.1f}" if r["alloc_kib"] is not None else f"{'-':>9}"
+        base = f"{base_p95:>9.2f}" if base_p95 else f"{'-':>9}"
+        print(f"{name:<34} | {r['n']:>4} | {r['p50_ms']:>9.2f} | {r['p95_ms']:>9.2f} | {r['p99_ms']:>9.2f} | "
+              f"{alloc} | {base} | {change} | {status}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--alloc-iterations", type=int, default=10)
+    parser.add_argument("--routes", nargs="*", default=None, help="only scenarios whose name starts with these")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated Claude/Lava latency")
+    parser.add_argument("--visa-latency-ms", type=float, default=0.0, help="simulated Visa API latency")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative slowdown that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=MIN_DELTA_MS,
+                        help="ignore latency regressions smaller than this in absolute terms")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    print(f"Benchmarking routes ({args.iterations} iterations, stubbed LLM {args.llm_latency_ms:g} ms, "
+          f"Visa {args.visa_latency_ms:g} ms)\n")
+    results = asyncio.run(run_benchmarks(args))
+
+    stored: Dict[str, Any] = {}
+    if args.baseline.exists():
+        stored = json.loads(args.baseline.read_text())
+    baseline = stored.get("routes", {})
+
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    print()
+    print_report(results, baseline, regressions)
+
+    if stored.get("meta") and stored["meta"].get("machine") != platform.machine():
+        print(f"\nNote: baseline was recorded on {stored['meta'].get('machine')} "
+              f"({stored['meta'].get('cpu_count')} CPUs); absolute numbers may not compare")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        routes = {**baseline, **results}
+        meta = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "iterations": args.iterations,
+            "llm_latency_ms": args.llm_latency_ms,
+            "visa_latency_ms": args.visa_latency_ms
+        }
+        args.baseline.write_text(json.dumps({"meta": meta, "routes": routes}, indent=2) + "\n")
+        print(f"\nBaseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\n❌ {len(regressions)} route(s) regressed beyond {args.threshold:.0%}:")
+        for name, flagged in regressions.items():
+            print(f"  {name}: {'; '.join(flagged)}")
+        raise SystemExit(1)
+    elif baseline:
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
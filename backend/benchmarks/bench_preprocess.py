@@ -0,0 +1,99 @@
+"""
+Benchmark: transaction ingestion + daily aggregation
+Compares the columnar preprocess_data against the original DataFrame pipeline
+
+Usage (from backend/):
+    python -m benchmarks.bench_preprocess [--sizes 100 1000 ... ] [--repeat 3]
+"""
+
+import argparse
+import logging
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from src.prediction import preprocess_data
+
+CATEGORIES = ["breakfast", "lunch", "dinner", "snack", "coffee"]
+LOCATIONS = ["Central Dining", "North Commons", "West Hall", "Starbucks", "Chipotle"]
+TYPES = ["swipe", "flex"]
+
+
+def legacy_preprocess(data: Dict[str, Any], filter_type: str = None, filter_value: str = None) -> pd.DataFrame:
+    """The original list-of-dicts -> DataFrame -> groupby(date) pipeline, kept as the baseline"""
+    df = pd.DataFrame(data["Transactions"])
+    df["date"] = pd.to_datetime(df["date"], utc=True)
+    if filter_type is not None and filter_value is not None:
+        df = df[df[filter_type] == filter_value]
+    daily_agg = df.groupby(df["date"].dt.date).agg({"amount": "sum"}).reset_index()
+    daily_agg.columns = ["ds", "y"]
+    daily_agg["ds"] = pd.to_datetime(daily_agg["ds"])
+    return daily_agg.sort_values("ds").reset_index(drop=True)
+
+
+def make_transactions(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Synthetic transactions in the mock_data format, spread over ~1 year"""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2025-01-01T00:00:00")
+    offsets = rng.integers(0, 365 * 86400, size=count)
+    stamps = np.datetime_as_string(start + offsets.astype("timedelta64[s]"), unit="us")
+    amounts = np.round(rng.gamma(2.0, 6.0, size=count), 2)
+    cats = rng.integers(0, len(CATEGORIES), size=count)
+    locs = rng.integers(0, len(LOCATIONS), size=count)
+    types = rng.integers(0, len(TYPES), size=count)
+
+    return [
+        {
+            "id": str(i),
+            "date": f"{stamps[i]}Z",
+            "amount": float(amounts[i]),
+            "location": LOCATIONS[locs[i]],
+            "type": TYPES[types[i]],
+            "category": CATEGORIES[cats[i]]
+        }
+        for i in range(count)
+    ]
+
+
+def best_of(fn: Callable[[], Any], repeat: int) -> float:
+    """Best wall time in seconds over `repeat` runs"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(f"{'transactions':>12} | {'filter':>14} | {'legacy ms':>10} | {'columnar ms':>11} | {'speedup':>7}")
+    print("-" * 68)
+
+    for size in args.sizes:
+        data = {"Transactions": make_transactions(size)}
+        repeat = args.repeat if size < 1_000_000 else 1
+
+        for filter_type, filter_value in [(None, None), ("category", "coffee")]:
+            expected = legacy_preprocess(data, filter_type, filter_value)
+            actual = preprocess_data(data, filter_type, filter_value)
+            assert np.array_equal(expected["ds"].to_numpy("datetime64[D]"), actual["ds"].to_numpy("datetime64[D]"))
+            assert np.allclose(expected["y"].to_numpy(), actual["y"].to_numpy())
+
+            legacy = best_of(lambda: legacy_preprocess(data, filter_type, filter_value), repeat)
+            columnar = best_of(lambda: preprocess_data(data, filter_type, filter_value), repeat)
+            label = f"{filter_type}={filter_value}" if filter_type else "none"
+
+            print(f"{size:>12,} | {label:>14} | {legacy * 1000:>10.1f} | {columnar * 1000:>11.1f} | {legacy / columnar:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
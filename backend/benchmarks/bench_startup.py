@@ -0,0 +1,111 @@
+"""
+Benchmark: API cold start - import cost of src.main and time until /ready
+Every run is a fresh interpreter, as with uvicorn --reload or a new autoscaled instance
+
+Reports the wall time of `import src.main`, which heavy libraries that
+import pulled in (they should load on first use / during warm-up, not here),
+the slowest modules by cumulative import time (python -X importtime), and
+the time from process start until /health answers and until /ready reports
+the background warm-up as done.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup [--runs 5] [--top 15] [--no-ready]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("pandas", "prophet", "cmdstanpy", "matplotlib", "src.prediction")
+
+IMPORT_SNIPPET = f"""
+import json, sys, time
+started = time.perf_counter()
+import src.main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"import_ms": elapsed * 1000,
+                  "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+READY_SNIPPET = """
+import json, time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+from src.main import app
+
+if __name__ == "__main__":
+    with TestClient(app) as client:
+        client.get("/health")
+        health_ms = (time.perf_counter() - started) * 1000
+        while True:
+            response = client.get("/ready")
+            if response.status_code == 200 or response.json()["state"] == "failed":
+                break
+            time.sleep(0.02)
+        ready_ms = (time.perf_counter() - started) * 1000
+        print(json.dumps({"health_ms": health_ms, "ready_ms": ready_ms, "status": response.json()}))
+"""
+
+
+def run_python(args: List[str]) -> Tuple[str, str]:
+    env = {**os.environ, "PYTHONPATH": str(BACKEND_DIR)}
+    completed = subprocess.run(
+        [sys.executable, *args], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return completed.stdout, completed.stderr
+
+
+def last_json_line(output: str) -> Dict[str, Any]:
+    return json.loads([line for line in output.splitlines() if line.startswith("{")][-1])
+
+
+def slowest_imports(importtime_log: str, top: int) -> List[Tuple[str, float]]:
+    """Modules with the largest cumulative import time from a -X importtime log"""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(cumulative) / 1000))
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--no-ready", action="store_true", help="skip the time-to-ready measurement")
+    args = parser.parse_args()
+
+    imports = [last_json_line(run_python(["-c", IMPORT_SNIPPET])[0]) for _ in range(args.runs)]
+    import_ms = [run["import_ms"] for run in imports]
+    print(f"import src.main: median {statistics.median(import_ms):.0f} ms "
+          f"(min {min(import_ms):.0f}, max {max(import_ms):.0f}, {args.runs} runs)")
+    heavy = imports[-1]["heavy"]
+    print(f"heavy modules loaded at import: {', '.join(heavy) if heavy else 'none'}")
+
+    _, importtime_log = run_python(["-X", "importtime", "-c", "import src.main"])
+    print(f"\n{'module':<50} | {'cumulative ms':>13}")
+    print("-" * 66)
+    for name, cumulative_ms in slowest_imports(importtime_log, args.top):
+        print(f"{name:<50} | {cumulative_ms:>13.1f}")
+
+    if args.no_ready:
+        return
+
+    runs = [last_json_line(run_python(["-c", READY_SNIPPET])[0]) for _ in range(args.runs)]
+    health_ms = statistics.median(run["health_ms"] for run in runs)
+    ready_ms = statistics.median(run["ready_ms"] for run in runs)
+    status = runs[-1]["status"]
+    print(f"\nfirst /health answered: median {health_ms:.0f} ms after process start")
+    print(f"/ready:                 median {ready_ms:.0f} ms (state {status['state']}, steps {status['steps_ms']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""
+ZenWallet backend package
+"""
+
+from dotenv import load_dotenv
+
+# Load .env exactly once, before any module reads its settings from os.environ
+load_dotenv()
@@ -5,9 +5,12 @@ NOW WITH PREFERENCES SUPPORT!
 
 import os
 import json
-import requests
-from dotenv import load_dotenv
-from datetime import datetime
+import asyncio
+import hashlib
+import httpx
+from functools import lru_cache
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 from src.models import (
     UserProfile, 
@@ -16,57 +19,81 @@ from src.models import (
     SpendingAnalysis, 
     Recommendation
 )
-from src.prompts import ANALYZER_PROMPT, CHATBOT_PROMPT
-
-load_dotenv()
-
-LAVA_FORWARD_TOKEN = os.getenv("LAVA_FORWARD_TOKEN")
-LAVA_BASE_URL = os.getenv("LAVA_BASE_URL")
-
-# ENHANCED RECOMMENDER PROMPT WITH PREFERENCES
-RECOMMENDER_PROMPT = """You are a college dining recommendation engine. Generate personalized meal suggestions based on context AND user preferences.
-
-Consider:
-- Time of day (breakfast/lunch/dinner timing)
-- Meal swipe vs flex dollar efficiency
-- User dietary restrictions (STRICTLY enforce these)
-- Wait times and convenience
-- Expiring swipes (prioritize using them)
-- **User priority weights (0-100 scale):**
-  - Speed: How much they value quick service
-  - Budget: How much they want to save money
-  - Health: Preference for nutritious options
-  - Social: Preference for busy vs quiet dining halls
-- **Cuisine ratings (1-5 stars):**
-  - Prioritize cuisines with 4-5 stars
-  - Avoid cuisines with 1-2 stars unless no other options
-- **Ingredients to avoid:** Never suggest meals with these ingredients
-
-**CRITICAL DIETARY RULES:**
-1. PESCATARIAN means: Fish and seafood ARE allowed, but NO beef, pork, or chicken
-   - Suggest: Salmon, tuna, shrimp, fish tacos, poke bowls
-   - DO NOT suggest: Just vegetarian options without fish
-2. VEGETARIAN means: NO meat or fish at all (dairy and eggs OK)
-3. VEGAN means: NO animal products whatsoever
-4. If speed priority > 70: Only suggest options with wait time < 10 min
-5. If budget priority > 70: Strongly emphasize savings and swipe usage
-6. If health priority > 70: Focus on salads, grain bowls, lean proteins
-7. Match cuisine preferences - suggest 4-5 star cuisines first
-8. NEVER suggest foods with restricted ingredients
-
-Format each recommendation as JSON array of 3 recommendations:
-[
-  {
-    "dining_hall": "Name",
-    "meal": "Specific dish to order",
-    "reasoning": "Why this matches their priorities and preferences (mention specific priority matches)",
-    "emoji": "One relevant emoji",
-    "savings_amount": 12.50,
-    "use_swipe": true
-  }
-]
-
-CRITICAL: Return ONLY the JSON array, no other text."""
+from src.prompts import (
+    ANALYZER_PROMPT,
+    CHATBOT_PROMPT,
+    RECOMMENDER_PROMPT,
+    ANALYSIS_TEMPLATE,
+    RECOMMENDATIONS_TEMPLATE,
+    RECOMMENDATION_PREFERENCES_TEMPLATE,
+    QUERY_TEMPLATE,
+    QUERY_PREFERENCES_TEMPLATE,
+    QUERY_HALL_TEMPLATE,
+    prompt_stats
+)
+from src.cache import LRUCache
+from src.lava_client import lava_client, LAVA_FORWARD_TOKEN, LAVA_BASE_URL, LAVA_TIMEOUT
+from src import deadline
+from src.singleflight import SingleFlight
+from src.resilience import Upstream
+from src.json_stream import JSONArrayStream
+from src.recommender import MENU_TERMS, recommender
+from src.spending_analytics import spending_analytics
+
+ANTHROPIC_MESSAGES_URL = "https://api.anthropic.com/v1/messages"
+
+# LLM response cache for recommendations / queries (override via .env)
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "900"))
+LLM_CACHE_WAIT_BUCKET = int(os.getenv("LLM_CACHE_WAIT_BUCKET", "5"))  # minutes
+
+llm_cache = LRUCache(max_entries=LLM_CACHE_SIZE, ttl_seconds=LLM_CACHE_TTL)
+
+# Identical concurrent Claude calls share one upstream request
+llm_flight = SingleFlight("claude")
+
+# Recommendations: "llm" (Claude picks from locally ranked candidates) or "local" (ranking only);
+# an LLM call slower than the timeout is answered by the local ranking instead (override via .env)
+RECOMMENDER_MODE = os.getenv("RECOMMENDER_MODE", "llm")
+RECOMMENDER_LLM_TIMEOUT = float(os.getenv("RECOMMENDER_LLM_TIMEOUT", "12"))
+
+# Spending analysis: "llm" (Claude reads the locally computed metrics) or "local" (metrics only);
+# the local analysis also answers when Claude fails (override via .env)
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "llm")
+
+# Menu term -> ingredient categories, the table the local ranker screens dishes with; the
+# recommender system prompt carries it so Claude's own dietary check uses the same facts
+INGREDIENT_REFERENCE = "\n".join(
+    f"- {term}: contains {', '.join(sorted(facts['contains'])) or 'nothing restricted'}"
+    + (f"; may contain {', '.join(sorted(facts['may_contain']))}" if facts.get("may_contain") else "")
+    for term, facts in MENU_TERMS.items()
+)
+RECOMMENDER_SYSTEM_PROMPT = RECOMMENDER_PROMPT + """
+
+INGREDIENT REFERENCE - typical ingredient categories for common menu terms ("may contain"
+depends on the recipe; assume it does unless the dish name rules it out, e.g. "veggie"):
+""" + INGREDIENT_REFERENCE
+
+# Mark the system prompt as a cacheable prefix (Messages API prompt caching; override via .env)
+LLM_PROMPT_CACHE = os.getenv("LLM_PROMPT_CACHE", "1") != "0"
+
+# Claude breaker / retry policy: a Messages POST is billed once processed, so it is only sent
+# again when it provably wasn't (connection never made, 429, 529);
+# LLM_HEDGE_AFTER > 0 sends a second request when the first is slower (costs tokens; override via .env)
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "1"))
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+LLM_SLO_P95_MS = float(os.getenv("LLM_SLO_P95_MS", "15000"))
+
+# Transient status codes, counted against the breaker (529 = Anthropic overloaded)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504, 529}
+# Of those, the ones returned before the request is processed
+UNPROCESSED_STATUS = {429, 529}
+
+# Meal periods and the hour each one ends
+MEAL_PERIOD_ENDS = {'breakfast': 11, 'lunch': 15, 'dinner': 24}
+
 
 def clean_json_response(response: str) -> str:
     """Clean Claude's response to extract pure JSON"""
@@ -82,25 +109,138 @@ def clean_json_response(response: str) -> str:
     
     return response.strip()
 
-def call_claude_via_lava(system_prompt: str, user_prompt: str, temperature: float = 0.7) -> str:
-    """Call Claude API through Lava Payments proxy"""
+def meal_period(time_obj: datetime) -> str:
+    """Breakfast before 11, lunch before 3pm, dinner after"""
+    hour = time_obj.hour
+    return 'breakfast' if hour < 11 else 'lunch' if hour < 15 else 'dinner'
+
+def _canonical(value: Any) -> Any:
+    """Order-insensitive form of preference data (string lists sorted, strings trimmed)"""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_canonical(v) for v in value]
+        return sorted(items) if all(isinstance(v, str) for v in items) else items
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+def _hall_state(hall: DiningHall, menu_items: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Dining hall as it affects a prompt: menu order ignored, wait time bucketed
     
+    A menu change, a wait time crossing a bucket, or a change in crowd level
+    or swipe acceptance changes the cache key, so stale answers are never served.
+    """
+    menu = hall.current_menu[:menu_items] if menu_items else hall.current_menu
+    return {
+        "name": hall.name.strip(),
+        "menu": sorted(item.strip() for item in menu),
+        "wait": hall.wait_time // LLM_CACHE_WAIT_BUCKET * LLM_CACHE_WAIT_BUCKET,
+        "crowd": hall.crowd_level,
+        "swipes": hall.accepts_swipes,
+        "distance": hall.distance
+    }
+
+def llm_cache_key(kind: str, context: Dict[str, Any]) -> str:
+    """SHA-256 of the canonical prompt context; identical contexts share one LLM answer"""
+    canonical = json.dumps(_canonical(context), sort_keys=True, separators=(',', ':'), default=str)
+    return f"{kind}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+def _meal_period_ttl(time_obj: datetime) -> float:
+    """Seconds until the meal period ends, capped at LLM_CACHE_TTL"""
+    day_start = time_obj.replace(hour=0, minute=0, second=0, microsecond=0)
+    period_end = day_start + timedelta(hours=MEAL_PERIOD_ENDS[meal_period(time_obj)])
+    return max(1.0, min(LLM_CACHE_TTL, (period_end - time_obj).total_seconds()))
+
+def _user_context(user_data: UserProfile, user_preferences: Optional[dict]) -> Dict[str, Any]:
+    """Profile fields the prompts use; flex dollars rounded so near-identical balances share answers"""
+    return {
+        "swipes_remaining": user_data.swipes_remaining,
+        "swipes_unused": user_data.total_swipes - user_data.swipes_used,
+        "flex_remaining": round(user_data.flex_remaining),
+        "profile_preferences": user_data.preferences,
+        "preferences": user_preferences or {}
+    }
+
+async def call_claude_via_lava(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.7,
+    coalesce_key: Optional[str] = None,
+    kind: str = "other"
+) -> str:
+    """
+    Call Claude API through Lava Payments proxy, coalescing identical in-flight calls
+    
+    Calls are identical when their prompts and temperature match, or when the
+    caller passes the same coalesce_key (e.g. an llm_cache key, for prompts
+    that differ only in details the cache already treats as equivalent).
+    kind labels the call in the prompt size / token usage stats.
+    """
+    if coalesce_key is None:
+        digest = hashlib.sha256(
+            json.dumps([system_prompt, user_prompt, temperature]).encode('utf-8')
+        ).hexdigest()
+        coalesce_key = f"prompt:{digest[:16]}"
+    
+    return await llm_flight.do(
+        coalesce_key, lambda: _request_claude(system_prompt, user_prompt, temperature, kind)
+    )
+
+ANTHROPIC_HEADERS = {
+    'anthropic-version': '2023-06-01'
+}
+
+def _transient_lava_error(e: BaseException) -> bool:
+    """Timeouts, connection failures, rate limits and server errors (not auth / balance errors)"""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in RETRYABLE_STATUS
+    return isinstance(e, httpx.TransportError)
+
+def _unprocessed_lava_error(e: BaseException) -> bool:
+    """Failures where Claude never processed the request, so sending it again can't bill twice"""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in UNPROCESSED_STATUS
+    return isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+claude_upstream = Upstream(
+    "claude",
+    retryable=_transient_lava_error,
+    retries=LLM_RETRIES,
+    resend=_unprocessed_lava_error,
+    hedge_after=LLM_HEDGE_AFTER,
+    failure_threshold=LLM_BREAKER_FAILURES,
+    reset_seconds=LLM_BREAKER_RESET,
+    slo_p95_ms=LLM_SLO_P95_MS
+)
+
+def _messages_body(system_prompt: str, user_prompt: str, temperature: float, kind: str) -> Dict[str, Any]:
+    """Messages API request body for a call through Lava (checks Lava is configured)"""
     if not LAVA_FORWARD_TOKEN or not LAVA_BASE_URL:
         raise ValueError("LAVA_FORWARD_TOKEN and LAVA_BASE_URL must be set in .env file")
     
-    url = f"{LAVA_BASE_URL}/forward?u=https://api.anthropic.com/v1/messages"
+    return message_params(system_prompt, user_prompt, temperature, kind)
+
+def message_params(system_prompt: str, user_prompt: str, temperature: float, kind: str = "other") -> Dict[str, Any]:
+    """
+    Messages API parameters for one system + user prompt
     
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {LAVA_FORWARD_TOKEN}',
-        'anthropic-version': '2023-06-01'
-    }
+    System prompts are static, so with LLM_PROMPT_CACHE the system block ends
+    in a cache breakpoint and repeat calls read it from Anthropic's prompt
+    cache. Whether a prompt is long enough to be cached is taken from the
+    usage Claude reports (see PromptStats.cacheable): a kind that came back
+    with no cache write or read is sent without the breakpoint from then on.
+    """
+    system: Any = system_prompt
+    if LLM_PROMPT_CACHE and prompt_stats.cacheable(kind):
+        system = [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
     
-    request_body = {
+    return {
         "model": "claude-sonnet-4-5-20250929",
         "max_tokens": 1024,
         "temperature": temperature,
-        "system": system_prompt,
+        "system": system,
         "messages": [
             {
                 "role": "user",
@@ -108,73 +248,155 @@ def call_claude_via_lava(system_prompt: str, user_prompt: str, temperature: floa
             }
         ]
     }
-    
-    try:
-        response = requests.post(url, headers=headers, json=request_body, timeout=30)
-        response.raise_for_status()
-        
-        data = response.json()
-        lava_request_id = response.headers.get('x-lava-request-id')
-        
-        print(f"✅ Lava Request ID: {lava_request_id}")
-        
-        return data['content'][0]['text']
-        
-    except requests.exceptions.HTTPError as e:
+
+def _lava_error(e: httpx.HTTPError) -> Exception:
+    """User-facing error for a failed Lava/Claude request"""
+    if isinstance(e, httpx.HTTPStatusError):
         if e.response.status_code == 401:
-            raise Exception("Invalid Lava forward token - check your .env file")
+            return Exception("Invalid Lava forward token - check your .env file")
         elif e.response.status_code == 402:
-            raise Exception("Insufficient Lava wallet balance - add credits to continue")
+            return Exception("Insufficient Lava wallet balance - add credits to continue")
         elif e.response.status_code == 403:
-            raise Exception("Forbidden - check Lava token permissions")
+            return Exception("Forbidden - check Lava token permissions")
         else:
             print(f"HTTP Error: {e.response.status_code}")
             print(f"Response: {e.response.text}")
-            raise Exception(f"Lava API error: {e.response.status_code}")
-            
-    except requests.exceptions.Timeout:
-        raise Exception("Request timed out - try again")
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
-        raise Exception(f"Failed to connect to Lava API: {e}")
+            return Exception(f"Lava API error: {e.response.status_code}")
+    
+    if isinstance(e, httpx.TimeoutException):
+        return Exception("Request timed out - try again")
+    
+    print(f"Request failed: {e}")
+    return Exception(f"Failed to connect to Lava API: {e}")
 
-def analyze_spending(user_data: UserProfile, transactions: list[Transaction]) -> SpendingAnalysis:
-    """Analyze spending patterns and identify waste"""
+async def _request_claude(system_prompt: str, user_prompt: str, temperature: float, kind: str = "other") -> str:
+    """
+    One Claude request through Lava on the pooled async connection
     
-    print("\n📊 Analyzing spending patterns...")
+    Raises:
+        CircuitOpenError: If the Claude breaker is open (callers fall back at once)
+        DeadlineExceeded: If the request deadline passes first
+    """
+    request_body = _messages_body(system_prompt, user_prompt, temperature, kind)
+    prompt_stats.record_request(kind, system_prompt, user_prompt)
+    
+    async def send() -> httpx.Response:
+        response = await lava_client.forward(
+            ANTHROPIC_MESSAGES_URL, request_body, ANTHROPIC_HEADERS,
+            timeout=deadline.timeout(LAVA_TIMEOUT, "claude")
+        )
+        response.raise_for_status()
+        return response
+    
+    try:
+        response = await claude_upstream.call(send)
+    except httpx.HTTPError as e:
+        raise _lava_error(e)
     
-    transaction_summary = "\n".join([
-        f"- {t.merchant}: ${t.amount:.2f} ({'Meal Swipe' if t.type == 'swipe' else 'Flex/Cash'})"
-        for t in transactions[:20]
-    ])
+    data = response.json()
+    prompt_stats.record_usage(kind, data.get('usage'))
+    lava_request_id = response.headers.get('x-lava-request-id')
+    
+    print(f"✅ Lava Request ID: {lava_request_id}")
+    
+    return data['content'][0]['text']
+
+async def stream_claude_via_lava(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.7,
+    kind: str = "other"
+) -> AsyncIterator[str]:
+    """
+    Stream Claude's reply through Lava (Messages API with "stream": true)
+    
+    Yields each text delta as its content_block_delta event arrives. Streams
+    are not coalesced or retried: every caller gets its own upstream request.
+    """
+    request_body = {**_messages_body(system_prompt, user_prompt, temperature, kind), "stream": True}
+    prompt_stats.record_request(kind, system_prompt, user_prompt)
+    
+    # Breaker-guarded up to the response headers; a started stream cannot be retried.
+    # Each read may take up to the budget left at the start; the stream stops at the deadline.
+    read_timeout = deadline.timeout(LAVA_TIMEOUT, "claude")
+    started: Optional[float] = claude_upstream.admit()
+    try:
+        async with lava_client.stream(
+            ANTHROPIC_MESSAGES_URL, request_body, ANTHROPIC_HEADERS, timeout=read_timeout
+        ) as response:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            
+            claude_upstream.record(None, started)
+            started = None
+            print(f"✅ Lava Request ID: {response.headers.get('x-lava-request-id')} (streaming)")
+            
+            async for line in response.aiter_lines():
+                deadline.check("claude")
+                if not line.startswith('data:'):
+                    continue
+                
+                event = json.loads(line[5:])
+                event_type = event.get('type')
+                if event_type == 'content_block_delta' and event['delta'].get('type') == 'text_delta':
+                    yield event['delta']['text']
+                elif event_type == 'message_start':
+                    # Input/cache tokens; output_tokens here is a placeholder, message_delta has the total
+                    usage = event['message'].get('usage') or {}
+                    prompt_stats.record_usage(kind, {k: v for k, v in usage.items() if k != 'output_tokens'})
+                elif event_type == 'message_delta':
+                    prompt_stats.record_usage(kind, {'output_tokens': event.get('usage', {}).get('output_tokens')})
+                elif event_type == 'error':
+                    raise Exception(f"Claude stream error: {event.get('error', {}).get('message', 'unknown')}")
+                elif event_type == 'message_stop':
+                    break
+                    
+    except httpx.HTTPError as e:
+        if deadline.expired():
+            raise deadline.exceeded("claude") from e
+        if started is not None:
+            claude_upstream.record(e, started)
+        raise _lava_error(e)
+
+def analysis_prompt(
+    user_data: UserProfile,
+    transactions: list[Transaction],
+    metrics: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    User prompt for ANALYZER_PROMPT (also used by the batch analysis pipeline)
+    
+    Sends aggregates over the whole history (see src.spending_analytics), so the
+    prompt stays the same size however many transactions the student has.
+    """
+    if metrics is None:
+        metrics = spending_analytics.compute(user_data, transactions)
     
     spent_percentage = round((user_data.total_spent / user_data.total_budget) * 100)
     swipes_percentage = round((user_data.swipes_used / user_data.total_swipes) * 100)
     
-    user_prompt = f"""
-Analyze this student's meal plan spending:
-
-MEAL PLAN STATUS:
-- Total budget: ${user_data.total_budget:.2f}
-- Spent so far: ${user_data.total_spent:.2f} ({spent_percentage}%)
-- Meal swipes: {user_data.swipes_used}/{user_data.total_swipes} used ({swipes_percentage}%)
-- Flex dollars: ${user_data.flex_spent:.2f}/${user_data.total_flex:.2f} spent
-- Weeks remaining: {user_data.weeks_remaining}
-
-RECENT TRANSACTIONS:
-{transaction_summary}
-
-CONTEXT:
-- Average meal swipe value: $12
-- Student preferences: {', '.join(user_data.preferences.get('dietary', []))}
-
-Identify the BIGGEST waste and quantify exactly how much money is being lost.
-Focus on the mismatch between swipe usage and flex spending.
-"""
-    
-    response = call_claude_via_lava(ANALYZER_PROMPT, user_prompt, temperature=0.5)
+    return ANALYSIS_TEMPLATE.render(
+        total_budget=f"{user_data.total_budget:.2f}",
+        total_spent=f"{user_data.total_spent:.2f}",
+        spent_percentage=spent_percentage,
+        swipes_used=user_data.swipes_used,
+        total_swipes=user_data.total_swipes,
+        swipes_percentage=swipes_percentage,
+        flex_spent=f"{user_data.flex_spent:.2f}",
+        total_flex=f"{user_data.total_flex:.2f}",
+        weeks_remaining=user_data.weeks_remaining,
+        metrics=spending_analytics.prompt_summary(metrics),
+        dietary=', '.join(user_data.preferences.get('dietary', []))
+    )
+
+def parse_analysis(response: str) -> SpendingAnalysis:
+    """
+    SpendingAnalysis from Claude's reply to ANALYZER_PROMPT
     
+    Raises:
+        Exception: If the reply is not a valid analysis JSON object
+    """
     try:
         cleaned_response = clean_json_response(response)
         data = json.loads(cleaned_response)
@@ -184,38 +406,77 @@ Focus on the mismatch between swipe usage and flex spending.
         print(f"Response was: {response}")
         raise Exception("Failed to parse AI response - invalid JSON")
 
-def generate_recommendations(
-    user_data: UserProfile, 
+async def analyze_spending(
+    user_data: UserProfile,
+    transactions: list[Transaction],
+    mode: Optional[str] = None
+) -> SpendingAnalysis:
+    """
+    Analyze spending patterns and identify waste
+    
+    Claude reads the metrics computed by src.spending_analytics unless mode
+    (or ANALYSIS_MODE when mode is None; "llm" by default) is "local", which
+    builds the analysis from the metrics alone. A failed or unparseable
+    Claude reply is also answered from the metrics.
+    """
+    metrics = spending_analytics.compute(user_data, transactions)
+    
+    if (mode or ANALYSIS_MODE) == 'local':
+        print("\n📊 Analyzing spending patterns locally...")
+        return spending_analytics.analyze(metrics)
+    
+    print("\n📊 Analyzing spending patterns...")
+    
+    user_prompt = analysis_prompt(user_data, transactions, metrics)
+    try:
+        response = await call_claude_via_lava(ANALYZER_PROMPT, user_prompt, temperature=0.5, kind="analysis")
+        return parse_analysis(response)
+    except Exception as e:
+        print(f"⚠️ Claude analysis unavailable ({e}) - using local analysis")
+        return spending_analytics.analyze(metrics, fallback=True)
+
+def _recommendations_key(
+    user_data: UserProfile,
     dining_halls: list[DiningHall],
     current_time: str,
     user_preferences: dict = None
-) -> list[Recommendation]:
-    """Generate personalized meal recommendations WITH PREFERENCES"""
-    
-    print("\n🍽️ Generating meal recommendations with preferences...")
+) -> Tuple[str, float]:
+    """
+    llm_cache key and TTL for a recommendations request
     
+    Same meal period, user context and dining hall state -> same recommendations.
+    """
     time_obj = datetime.fromisoformat(current_time)
-    hour = time_obj.hour
-    meal_time = 'breakfast' if hour < 11 else 'lunch' if hour < 15 else 'dinner'
-    
-    dining_summary = "\n".join([
-        f"""
-{hall.name}:
-- Menu: {', '.join(hall.current_menu)}
-- Wait time: {hall.wait_time} min
-- Crowd level: {hall.crowd_level}
-- Accepts: {'Meal swipes ✓' if hall.accepts_swipes else 'Flex only'}
-- Distance: {hall.distance}
-"""
-        for hall in dining_halls
-    ])
+    cache_key = llm_cache_key('recommendations', {
+        "meal": meal_period(time_obj),
+        "user": _user_context(user_data, user_preferences),
+        "halls": sorted((_hall_state(hall) for hall in dining_halls), key=lambda h: h["name"])
+    })
+    return cache_key, _meal_period_ttl(time_obj)
+
+def _recommendations_prompt(
+    user_data: UserProfile,
+    dining_halls: list[DiningHall],
+    current_time: str,
+    user_preferences: dict = None
+) -> str:
+    """Build the recommender prompt (only needed on a cache miss)"""
+    time_obj = datetime.fromisoformat(current_time)
+    meal_time = meal_period(time_obj)
+    
+    # Dietary/avoid filters and priority ranking are applied locally;
+    # the model only chooses among the best few candidates
+    candidates = recommender.rank(user_data, dining_halls, user_preferences, limit=recommender.prompt_candidates)
+    dining_summary = recommender.prompt_options(candidates, dining_halls) or (
+        "None - nothing on today's menus fits every restriction. Suggest the closest safe option and say so."
+    )
     
     prefs = user_data.preferences
     dietary = ', '.join(prefs.get('dietary', []))
     cuisines = ', '.join(prefs.get('favorite_cuisines', []))
     priorities = ', '.join(prefs.get('priorities', []))
     
-    # NEW: Include user preferences from Supabase
+    # NEW: Include user preferences from Supabase (dietary definitions live in RECOMMENDER_PROMPT)
     pref_section = ""
     if user_preferences:
         priorities_data = user_preferences.get('priorities', {})
@@ -223,107 +484,182 @@ def generate_recommendations(
         dietary_restrictions = user_preferences.get('dietary_restrictions', [])
         avoid_ingredients = user_preferences.get('avoid_ingredients', [])
         
-        # Format dietary restrictions with clear definitions
-        dietary_definitions = {
-            'Vegetarian': 'No meat (beef, pork, chicken, fish, seafood) - dairy and eggs OK',
-            'Vegan': 'No animal products at all (no meat, dairy, eggs, honey)',
-            'Pescatarian': 'Fish and seafood OK - but NO other meat (no beef, pork, chicken)',
-            'Gluten-Free': 'No wheat, barley, rye, or gluten-containing grains',
-            'Dairy-Free': 'No milk, cheese, yogurt, butter, or dairy products',
-            'Nut Allergy': 'AVOID all nuts and nut products (life-threatening)'
-        }
-        
-        dietary_explanations = []
-        for restriction in dietary_restrictions:
-            if restriction in dietary_definitions:
-                dietary_explanations.append(f"{restriction}: {dietary_definitions[restriction]}")
-        
-        # Format priorities
-        pref_section = f"""
-USER PREFERENCES (IMPORTANT - MATCH THESE!):
-
-Priorities (0-100 scale):
-- Speed: {priorities_data.get('speed', 50)}/100 {"⚡ HIGH PRIORITY" if priorities_data.get('speed', 50) > 70 else ""}
-- Budget: {priorities_data.get('budget', 50)}/100 {"💰 HIGH PRIORITY" if priorities_data.get('budget', 50) > 70 else ""}
-- Health: {priorities_data.get('health', 50)}/100 {"🥗 HIGH PRIORITY" if priorities_data.get('health', 50) > 70 else ""}
-- Social: {priorities_data.get('social', 50)}/100 {"👥 HIGH PRIORITY" if priorities_data.get('social', 50) > 70 else ""}
-
-Cuisine Preferences (1-5 stars):
-{chr(10).join([f"- {cuisine}: {'★' * rating}{'☆' * (5-rating)} ({rating}/5)" + (" - HIGHLY PREFERRED" if rating >= 4 else " - AVOID" if rating <= 2 else "") for cuisine, rating in cuisine_ratings.items()])}
-
-Dietary Restrictions (STRICT - MUST FOLLOW):
-{chr(10).join(dietary_explanations) if dietary_explanations else 'None'}
-
-Ingredients to AVOID:
-{', '.join(avoid_ingredients) if avoid_ingredients else 'None'}
-
-CRITICAL RULES:
-- If user is Pescatarian: Suggest fish/seafood dishes, NOT just vegetarian options
-- If user is Vegetarian: NO meat or fish at all
-- If user is Vegan: NO animal products whatsoever
-"""
+        pref_section = RECOMMENDATION_PREFERENCES_TEMPLATE.render(
+            priorities=', '.join(
+                f"{name} {priorities_data.get(name, 50)}" + (" HIGH" if priorities_data.get(name, 50) > 70 else "")
+                for name in ('speed', 'budget', 'health', 'social')
+            ),
+            liked=', '.join(f"{c} {r}★" for c, r in cuisine_ratings.items() if r >= 4) or 'None',
+            disliked=', '.join(f"{c} {r}★" for c, r in cuisine_ratings.items() if r <= 2) or 'None',
+            dietary=', '.join(dietary_restrictions) or 'None',
+            avoid=', '.join(avoid_ingredients) or 'None'
+        )
     
-    user_prompt = f"""
-Generate 3 meal recommendations for RIGHT NOW.
-
-USER CONTEXT:
-- Time: {time_obj.strftime('%I:%M %p')} ({meal_time})
-- Meal swipes left: {user_data.swipes_remaining} ({user_data.total_swipes - user_data.swipes_used} unused this week)
-- Flex dollars left: ${user_data.flex_remaining:.2f}
-- Dietary restrictions: {dietary}
-- Favorite cuisines: {cuisines}
-- Priorities: {priorities}
-
-{pref_section}
-
-AVAILABLE DINING HALLS:
-{dining_summary}
-
-IMPORTANT RULES:
-1. If swipes are expiring soon, STRONGLY prioritize using them
-2. Show exact savings compared to alternatives
-3. Match user's preferences and priorities
-4. Consider wait times based on speed priority
-5. Each recommendation should be unique and compelling
-6. STRICTLY honor dietary restrictions and avoided ingredients
+    user_prompt = RECOMMENDATIONS_TEMPLATE.render(
+        time=time_obj.strftime('%I:%M %p'),
+        meal=meal_time,
+        swipes_remaining=user_data.swipes_remaining,
+        swipes_unused=user_data.total_swipes - user_data.swipes_used,
+        flex_remaining=f"{user_data.flex_remaining:.2f}",
+        dietary=dietary,
+        cuisines=cuisines,
+        priorities=priorities,
+        preferences=pref_section,
+        options=dining_summary
+    )
+    
+    return user_prompt
 
-Generate 3 diverse recommendations as a JSON array.
-"""
+async def generate_recommendations(
+    user_data: UserProfile, 
+    dining_halls: list[DiningHall],
+    current_time: str,
+    user_preferences: dict = None,
+    mode: Optional[str] = None
+) -> list[Recommendation]:
+    """
+    Generate personalized meal recommendations WITH PREFERENCES
+    
+    mode falls back to RECOMMENDER_MODE, which defaults to "llm": Claude picks
+    from the locally ranked candidates, and the local ranking answers instead
+    when Claude fails or takes longer than RECOMMENDER_LLM_TIMEOUT or the
+    request deadline allows. "local" is opt-in and skips Claude entirely.
+    """
+    if (mode or RECOMMENDER_MODE) == 'local':
+        print("\n🍽️ Ranking meal recommendations locally...")
+        return recommender.recommend(user_data, dining_halls, user_preferences)
+    
+    print("\n🍽️ Generating meal recommendations with preferences...")
     
-    response = call_claude_via_lava(RECOMMENDER_PROMPT, user_prompt, temperature=0.7)
+    cache_key, cache_ttl = _recommendations_key(user_data, dining_halls, current_time, user_preferences)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        print("⚡ Recommendations served from cache")
+        return [rec.model_copy() for rec in cached]
+    
+    user_prompt = _recommendations_prompt(user_data, dining_halls, current_time, user_preferences)
+    try:
+        llm_timeout = deadline.timeout(RECOMMENDER_LLM_TIMEOUT, "recommendations")
+        response = await asyncio.wait_for(
+            call_claude_via_lava(
+                RECOMMENDER_SYSTEM_PROMPT, user_prompt, temperature=0.7, coalesce_key=cache_key, kind="recommendations"
+            ),
+            timeout=llm_timeout
+        )
+    except asyncio.TimeoutError:
+        print("⚠️ Claude ran out of time - using local ranking")
+        return recommender.recommend(user_data, dining_halls, user_preferences, fallback=True)
+    except Exception as e:
+        print(f"⚠️ Claude unavailable ({e}) - using local ranking")
+        return recommender.recommend(user_data, dining_halls, user_preferences, fallback=True)
     
     try:
         cleaned_response = clean_json_response(response)
         data = json.loads(cleaned_response)
-        return [Recommendation(**rec) for rec in data]
-    except json.JSONDecodeError as e:
+        recommendations = [Recommendation(**rec) for rec in data]
+    except (json.JSONDecodeError, ValueError, TypeError) as e:
         print(f"❌ JSON parse error: {e}")
         print(f"Response was: {response}")
-        raise Exception("Failed to parse AI response - invalid JSON")
+        return recommender.recommend(user_data, dining_halls, user_preferences, fallback=True)
+    
+    llm_cache.put(cache_key, recommendations, ttl_seconds=cache_ttl)
+    return [rec.model_copy() for rec in recommendations]
 
-def handle_query(
+async def stream_recommendations(
+    user_data: UserProfile,
+    dining_halls: list[DiningHall],
+    current_time: str,
+    user_preferences: dict = None,
+    mode: Optional[str] = None
+) -> AsyncIterator[Recommendation]:
+    """
+    generate_recommendations, streamed: yields each Recommendation as soon as
+    its JSON object is complete in Claude's output
+    
+    Cached recommendations are yielded straight away; a completed stream is
+    cached for later calls. If the stream fails before its first
+    recommendation, the local ranking is yielded instead.
+    """
+    if (mode or RECOMMENDER_MODE) == 'local':
+        for rec in recommender.recommend(user_data, dining_halls, user_preferences):
+            yield rec
+        return
+    
+    print("\n🍽️ Streaming meal recommendations...")
+    
+    cache_key, cache_ttl = _recommendations_key(user_data, dining_halls, current_time, user_preferences)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        print("⚡ Recommendations served from cache")
+        for rec in cached:
+            yield rec.model_copy()
+        return
+    
+    user_prompt = _recommendations_prompt(user_data, dining_halls, current_time, user_preferences)
+    parser = JSONArrayStream()
+    recommendations = []
+    try:
+        async for text in stream_claude_via_lava(
+            RECOMMENDER_SYSTEM_PROMPT, user_prompt, temperature=0.7, kind="recommendations"
+        ):
+            for data in parser.feed(text):
+                rec = Recommendation(**data)
+                recommendations.append(rec)
+                yield rec.model_copy()
+            if parser.finished:
+                break
+        parser.close()
+    except Exception as e:
+        if recommendations:
+            # Some recommendations are already out; the caller ends the response
+            raise
+        print(f"⚠️ Recommendation stream failed ({e}) - using local ranking")
+        for rec in recommender.recommend(user_data, dining_halls, user_preferences, fallback=True):
+            yield rec
+        return
+    
+    llm_cache.put(cache_key, recommendations, ttl_seconds=cache_ttl)
+
+@lru_cache(maxsize=256)
+def _query_dining_options(halls: Tuple[Tuple[str, int, Tuple[str, ...], bool], ...]) -> str:
+    """Dining options block of the query prompt, rendered once per dining hall snapshot"""
+    return "\n".join(
+        QUERY_HALL_TEMPLATE.render(
+            name=name,
+            wait_time=wait_time,
+            menu=', '.join(menu),
+            payment='✓ Accepts meal swipes' if accepts_swipes else '✗ Flex only'
+        )
+        for name, wait_time, menu, accepts_swipes in halls
+    )
+
+def _query_prompt(
     query: str,
     user_data: UserProfile,
     dining_halls: list[DiningHall],
     current_time: str,
     user_preferences: dict = None
-) -> str:
-    """Handle natural language queries WITH PREFERENCES"""
-    
-    print(f"\n💬 Processing query: '{query}'")
+) -> Tuple[str, str, float]:
+    """
+    Build the chatbot prompt for a query
     
+    Returns:
+        Tuple of (llm_cache key, user prompt, cache TTL in seconds)
+    """
     time_obj = datetime.fromisoformat(current_time)
-    hour = time_obj.hour
-    meal_time = 'breakfast' if hour < 11 else 'lunch' if hour < 15 else 'dinner'
+    meal_time = meal_period(time_obj)
     
-    dining_options = "\n".join([
-        f"""
-{hall.name} ({hall.wait_time} min wait):
-Menu: {', '.join(hall.current_menu[:3])}
-{'✓ Accepts meal swipes' if hall.accepts_swipes else '✗ Flex only'}
-"""
-        for hall in dining_halls
-    ])
+    # Queries differing only in case, spacing or trailing punctuation share an answer
+    cache_key = llm_cache_key('query', {
+        "query": " ".join(query.lower().split()).rstrip("?!. "),
+        "meal": meal_time,
+        "user": _user_context(user_data, user_preferences),
+        "halls": sorted((_hall_state(hall, menu_items=3) for hall in dining_halls), key=lambda h: h["name"])
+    })
+    
+    dining_options = _query_dining_options(tuple(
+        (hall.name, hall.wait_time, tuple(hall.current_menu[:3]), hall.accepts_swipes) for hall in dining_halls
+    ))
     
     prefs = user_data.preferences
     dietary = ', '.join(prefs.get('dietary', []))
@@ -347,42 +683,88 @@ Menu: {', '.join(hall.current_menu[:3])}
         if 'Vegan' in dietary_restrictions:
             dietary_info.append("Vegan (no animal products)")
         
-        pref_context = f"""
-User Priorities:
-- Speed importance: {priorities.get('speed', 50)}/100
-- Budget importance: {priorities.get('budget', 50)}/100
-- Health importance: {priorities.get('health', 50)}/100
-
-Top Cuisine Preferences: {', '.join([f"{c} ({r}★)" for c, r in top_cuisines])}
-Dietary Restrictions: {', '.join(dietary_info) if dietary_info else 'None'}
-
-IMPORTANT: If user is Pescatarian, suggest fish/seafood dishes, not just vegetarian!
-"""
+        pref_context = QUERY_PREFERENCES_TEMPLATE.render(
+            speed=priorities.get('speed', 50),
+            budget=priorities.get('budget', 50),
+            health=priorities.get('health', 50),
+            cuisines=', '.join([f"{c} ({r}★)" for c, r in top_cuisines]),
+            dietary=', '.join(dietary_info) if dietary_info else 'None'
+        )
     
-    user_prompt = f"""
-User asked: "{query}"
-
-CONTEXT:
-- Current time: {time_obj.strftime('%I:%M %p')} ({meal_time})
-- Meal swipes remaining: {user_data.swipes_remaining}
-- Flex dollars remaining: ${user_data.flex_remaining:.2f}
-- Dietary preferences: {dietary}
-- Favorite cuisines: {cuisines}
-
-{pref_context}
-
-DINING OPTIONS RIGHT NOW:
-{dining_options}
+    user_prompt = QUERY_TEMPLATE.render(
+        query=query,
+        time=time_obj.strftime('%I:%M %p'),
+        meal=meal_time,
+        swipes_remaining=user_data.swipes_remaining,
+        flex_remaining=f"{user_data.flex_remaining:.2f}",
+        dietary=dietary,
+        cuisines=cuisines,
+        preferences=pref_context,
+        dining_options=dining_options
+    )
+    
+    return cache_key, user_prompt, _meal_period_ttl(time_obj)
 
-Give ONE perfect recommendation that:
-1. Directly answers their query
-2. Mentions a specific dining hall and dish
-3. Explains why it's smart (savings, swipes, matches their preferences and priorities)
-4. Includes dollar amount saved if relevant
-5. Feels natural and friendly
+async def handle_query(
+    query: str,
+    user_data: UserProfile,
+    dining_halls: list[DiningHall],
+    current_time: str,
+    user_preferences: dict = None
+) -> str:
+    """Handle natural language queries WITH PREFERENCES"""
+    
+    print(f"\n💬 Processing query: '{query}'")
+    
+    cache_key, user_prompt, cache_ttl = _query_prompt(
+        query, user_data, dining_halls, current_time, user_preferences
+    )
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        print("⚡ Query answer served from cache")
+        return cached
+    
+    response = await call_claude_via_lava(
+        CHATBOT_PROMPT, user_prompt, temperature=0.8, coalesce_key=cache_key, kind="query"
+    )
+    answer = response.strip()
+    
+    llm_cache.put(cache_key, answer, ttl_seconds=cache_ttl)
+    return answer
 
-Be conversational and enthusiastic. 2-3 sentences max.
-"""
+async def stream_query(
+    query: str,
+    user_data: UserProfile,
+    dining_halls: list[DiningHall],
+    current_time: str,
+    user_preferences: dict = None
+) -> AsyncIterator[str]:
+    """
+    handle_query, streamed: yields the answer in chunks as Claude writes it
+    
+    A cached answer is yielded whole; a completed stream is cached for later calls.
+    """
+    print(f"\n💬 Streaming query: '{query}'")
+    
+    cache_key, user_prompt, cache_ttl = _query_prompt(
+        query, user_data, dining_halls, current_time, user_preferences
+    )
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        print("⚡ Query answer served from cache")
+        yield cached
+        return
+    
+    parts = []
+    async for text in stream_claude_via_lava(CHATBOT_PROMPT, user_prompt, temperature=0.8, kind="query"):
+        if not parts:
+            # Match handle_query's stripped answer
+            text = text.lstrip()
+            if not text:
+                continue
+        parts.append(text)
+        yield text
     
-    response = call_claude_via_lava(CHATBOT_PROMPT, user_prompt, temperature=0.8)
-    return response.strip()
\ No newline at end of file
+    answer = "".join(parts).strip()
+    if answer:
+        llm_cache.put(cache_key, answer, ttl_seconds=cache_ttl)
@@ -0,0 +1,561 @@
+"""
+Offline bulk spending analysis
+Builds analyzer prompts for a whole cohort, runs them as one batch job and
+stores the parsed insights so /api/analyze can answer without calling Claude
+
+Run weekly (or from cron):
+    python -m src.batch_analysis                     # every file in src/mock_data
+    python -m src.batch_analysis --backend local     # no Batches API (one call per student)
+    python -m src.batch_analysis --resume            # keep polling jobs from an earlier run
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.agent import (
+    ANTHROPIC_HEADERS,
+    analysis_prompt,
+    call_claude_via_lava,
+    message_params,
+    parse_analysis
+)
+from src.lava_client import lava_client, LAVA_FORWARD_TOKEN, LAVA_BASE_URL
+from src.models import SpendingAnalysis, Transaction, UserProfile
+from src.prompts import ANALYZER_PROMPT, prompt_stats
+from src.spending_analytics import SEMESTER_WEEKS
+
+logger = logging.getLogger(__name__)
+
+ANTHROPIC_BATCHES_URL = "https://api.anthropic.com/v1/messages/batches"
+
+# Batch pipeline configuration (override via .env)
+BATCH_COHORT_DIR = os.getenv("BATCH_COHORT_DIR", os.path.join(os.path.dirname(__file__), "mock_data"))
+BATCH_ANALYSIS_DB = Path(
+    os.getenv("BATCH_ANALYSIS_DB", Path(__file__).resolve().parent.parent / ".batch_analysis" / "analysis.sqlite3")
+)
+BATCH_ANALYSIS_MAX_AGE_DAYS = float(os.getenv("BATCH_ANALYSIS_MAX_AGE_DAYS", "7"))
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+BATCH_LOCAL_CONCURRENCY = int(os.getenv("BATCH_LOCAL_CONCURRENCY", "4"))
+
+# Same sampling as the live /api/analyze call
+ANALYSIS_TEMPERATURE = 0.5
+
+
+# ---------------------------------------------------------------------------
+# Cohort
+# ---------------------------------------------------------------------------
+
+def analysis_user_key(user_data: Dict[str, Any]) -> Optional[str]:
+    """Store key for a user payload (its stable id), or None"""
+    user_id = user_data.get("id")
+    return str(user_id) if user_id else None
+
+
+def analysis_inputs_hash(user_prompt: str) -> str:
+    """Fingerprint of what an analysis was based on (its analyzer prompt)"""
+    return hashlib.sha256(user_prompt.encode("utf-8")).hexdigest()
+
+
+def member_from_mock(mock: Dict[str, Any]) -> Tuple[str, UserProfile, List[Transaction]]:
+    """
+    (user key, profile, transactions) for one mock_data file
+
+    mock_data has no flex balance, so flex spent is the sum of the student's
+    flex transactions.
+
+    Raises:
+        KeyError: If the user has no id (analyses are only stored by id)
+    """
+    user = mock["UserData"]
+    user_key = analysis_user_key(user)
+    if user_key is None:
+        raise KeyError("UserData has no id")
+    transactions = [
+        Transaction(
+            merchant=t["location"], amount=t["amount"], type=t["type"], timestamp=t["date"], category=t.get("category")
+        )
+        for t in sorted(mock.get("Transactions", []), key=lambda t: t["date"], reverse=True)
+    ]
+    flex_spent = round(sum(t.amount for t in transactions if t.type == "flex"), 2)
+
+    profile = UserProfile(
+        name=user["name"],
+        total_budget=float(user["totalPlan"]),
+        total_spent=float(user["currentSpent"]),
+        total_swipes=user["totalSwipes"],
+        swipes_used=user["currentSwipes"],
+        swipes_remaining=user["totalSwipes"] - user["currentSwipes"],
+        total_flex=float(user["flexDollars"]),
+        flex_spent=flex_spent,
+        flex_remaining=float(user["flexDollars"]) - flex_spent,
+        weeks_remaining=max(0, SEMESTER_WEEKS - user["weeksIntoSemester"]),
+        preferences=user.get("preferences", {})
+    )
+    return user_key, profile, transactions
+
+
+def load_cohort(directory: str = BATCH_COHORT_DIR) -> List[Tuple[str, UserProfile, List[Transaction]]]:
+    """Every student in directory (one mock_data-format JSON file each); unreadable files are skipped"""
+    cohort = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cohort.append(member_from_mock(json.load(f)))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Skipping cohort file {path}: {e}")
+    return cohort
+
+
+def build_requests(cohort: List[Tuple[str, UserProfile, List[Transaction]]]) -> List[Dict[str, Any]]:
+    """
+    One analyzer request per student
+
+    custom_id is derived from the user key, since the Batches API only
+    allows [a-zA-Z0-9_-]{1,64}.
+    """
+    requests = []
+    for user_key, profile, transactions in cohort:
+        user_prompt = analysis_prompt(profile, transactions)
+        requests.append({
+            "custom_id": "u-" + hashlib.sha1(user_key.encode("utf-8")).hexdigest()[:32],
+            "user_key": user_key,
+            "name": profile.name,
+            "inputs_hash": analysis_inputs_hash(user_prompt),
+            "user_prompt": user_prompt
+        })
+    return requests
+
+
+# ---------------------------------------------------------------------------
+# Batch backends
+# ---------------------------------------------------------------------------
+
+class BatchBackend(ABC):
+    """
+    Upstream that runs many analyzer prompts as one job
+
+    submit() returns a batch id; status() reports "in_progress", "ended" or
+    "expired" (the job is gone); results() returns {custom_id: reply text or
+    None if that request failed} once the job has ended.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def submit(self, requests: List[Dict[str, Any]]) -> str:
+        ...
+
+    @abstractmethod
+    async def status(self, batch_id: str) -> str:
+        ...
+
+    @abstractmethod
+    async def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        ...
+
+
+class AnthropicBatchBackend(BatchBackend):
+    """
+    Message Batches API through Lava
+
+    Batches are billed at half the price of individual calls and usually
+    finish well within 24 hours; the system prompt is sent with the same
+    cache breakpoint as live calls.
+    """
+
+    name = "anthropic"
+
+    async def submit(self, requests: List[Dict[str, Any]]) -> str:
+        if not LAVA_FORWARD_TOKEN or not LAVA_BASE_URL:
+            raise ValueError("LAVA_FORWARD_TOKEN and LAVA_BASE_URL must be set in .env file")
+
+        body = {
+            "requests": [
+                {
+                    "custom_id": request["custom_id"],
+                    "params": message_params(
+                        ANALYZER_PROMPT, request["user_prompt"], ANALYSIS_TEMPERATURE, "analysis_batch"
+                    )
+                }
+                for request in requests
+            ]
+        }
+        for request in requests:
+            prompt_stats.record_request("analysis_batch", ANALYZER_PROMPT, request["user_prompt"])
+
+        response = await lava_client.forward(ANTHROPIC_BATCHES_URL, body, ANTHROPIC_HEADERS)
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def _batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        response = await lava_client.forward(
+            f"{ANTHROPIC_BATCHES_URL}/{batch_id}", None, ANTHROPIC_HEADERS, method="GET"
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def status(self, batch_id: str) -> str:
+        batch = await self._batch(batch_id)
+        if batch is None:
+            return "expired"
+        return "ended" if batch["processing_status"] == "ended" else "in_progress"
+
+    async def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        batch = await self._batch(batch_id)
+        if batch is None or not batch.get("results_url"):
+            return {}
+
+        response = await lava_client.forward(batch["results_url"], None, ANTHROPIC_HEADERS, method="GET")
+        response.raise_for_status()
+
+        replies: Dict[str, Optional[str]] = {}
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            result = entry.get("result", {})
+            if result.get("type") == "succeeded":
+                message = result["message"]
+                prompt_stats.record_usage("analysis_batch", message.get("usage"))
+                replies[entry["custom_id"]] = message["content"][0]["text"]
+            else:
+                logger.warning(f"Batch request {entry['custom_id']} {result.get('type', 'failed')}")
+                replies[entry["custom_id"]] = None
+        return replies
+
+
+# Local stand-in responder: (system prompt, user prompt, temperature) -> reply text
+Responder = Callable[[str, str, float], Awaitable[str]]
+
+
+async def _claude_responder(system_prompt: str, user_prompt: str, temperature: float) -> str:
+    return await call_claude_via_lava(system_prompt, user_prompt, temperature=temperature, kind="analysis_batch")
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    In-process stand-in for the Batches API
+
+    Runs each request through responder (one Claude call each by default, at
+    most `concurrency` at a time) in a background task. Jobs live in memory,
+    so they are "expired" for any other process; use it for development,
+    tests (pass a fake responder) or when the Batches API is unavailable.
+    """
+
+    name = "local"
+
+    def __init__(self, responder: Optional[Responder] = None, concurrency: int = BATCH_LOCAL_CONCURRENCY):
+        self.responder = responder or _claude_responder
+        self.concurrency = concurrency
+        self._jobs: Dict[str, "asyncio.Task[Dict[str, Optional[str]]]"] = {}
+
+    async def submit(self, requests: List[Dict[str, Any]]) -> str:
+        batch_id = f"local_{uuid.uuid4().hex}"
+        self._jobs[batch_id] = asyncio.ensure_future(self._run(requests))
+        return batch_id
+
+    async def _run(self, requests: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def answer(request: Dict[str, Any]) -> Optional[str]:
+            async with slots:
+                try:
+                    return await self.responder(ANALYZER_PROMPT, request["user_prompt"], ANALYSIS_TEMPERATURE)
+                except Exception as e:
+                    logger.warning(f"Local batch request {request['custom_id']} failed: {e}")
+                    return None
+
+        replies = await asyncio.gather(*(answer(request) for request in requests))
+        return {request["custom_id"]: reply for request, reply in zip(requests, replies)}
+
+    async def status(self, batch_id: str) -> str:
+        job = self._jobs.get(batch_id)
+        if job is None:
+            return "expired"
+        return "ended" if job.done() else "in_progress"
+
+    async def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        job = self._jobs.pop(batch_id, None)
+        return await job if job is not None else {}
+
+
+BATCH_BACKENDS: Dict[str, Callable[[], BatchBackend]] = {
+    "anthropic": AnthropicBatchBackend,
+    "local": LocalBatchBackend,
+}
+
+
+# ---------------------------------------------------------------------------
+# Result store
+# ---------------------------------------------------------------------------
+
+class AnalysisStore:
+    """
+    SQLite store of precomputed analyses and of submitted batch jobs
+
+    analyses: latest SpendingAnalysis per user id, with the hash of the
+    prompt it answered and the batch it came from. batch_jobs: jobs still to
+    be collected, with their custom_id -> user mapping, so polling survives
+    restarts. One connection guarded by a lock; lookups are single-row
+    primary key reads.
+    """
+
+    def __init__(self, path: Path, max_age_days: float = 7.0):
+        self.path = Path(path)
+        self.max_age_seconds = max_age_days * 86400
+
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._hits = 0
+        self._misses = 0
+        self._stored = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS analyses (
+                    user_key TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    inputs_hash TEXT NOT NULL,
+                    analysis TEXT NOT NULL,
+                    batch_id TEXT,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS batch_jobs (
+                    batch_id TEXT PRIMARY KEY,
+                    backend TEXT NOT NULL,
+                    members TEXT NOT NULL,
+                    submitted_at REAL NOT NULL,
+                    status TEXT NOT NULL
+                );
+            """)
+        return self._db
+
+    def lookup(self, user_data: Dict[str, Any], inputs_hash: str) -> Optional[SpendingAnalysis]:
+        """
+        Precomputed analysis for a user payload (by id), if younger than
+        max_age_days and based on the same inputs (see analysis_inputs_hash)
+        """
+        user_key = analysis_user_key(user_data)
+        if user_key is None:
+            return None
+
+        with self._lock:
+            if self._db is None and not self.path.exists():
+                # No batch has run yet
+                self._misses += 1
+                return None
+            db = self._connection()
+            row = db.execute(
+                "SELECT analysis, created_at, inputs_hash FROM analyses WHERE user_key = ?", (user_key,)
+            ).fetchone()
+
+            if row is None or row[2] != inputs_hash or time.time() - row[1] > self.max_age_seconds:
+                self._misses += 1
+                return None
+            self._hits += 1
+
+        return SpendingAnalysis.model_validate_json(row[0])
+
+    def save_analyses(self, rows: List[Tuple[str, str, str, SpendingAnalysis]], batch_id: str) -> None:
+        """Store (user key, name, inputs hash, analysis) rows, replacing each user's previous analysis"""
+        now = time.time()
+        with self._lock:
+            db = self._connection()
+            with db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO analyses (user_key, name, inputs_hash, analysis, batch_id, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (user_key, name, inputs_hash, analysis.model_dump_json(), batch_id, now)
+                        for user_key, name, inputs_hash, analysis in rows
+                    ]
+                )
+            self._stored += len(rows)
+
+    def save_job(self, batch_id: str, backend: str, requests: List[Dict[str, Any]]) -> None:
+        members = {
+            request["custom_id"]: [request["user_key"], request["name"], request["inputs_hash"]] for request in requests
+        }
+        with self._lock:
+            db = self._connection()
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO batch_jobs (batch_id, backend, members, submitted_at, status) "
+                    "VALUES (?, ?, ?, ?, 'in_progress')",
+                    (batch_id, backend, json.dumps(members), time.time())
+                )
+
+    def pending_jobs(self, backend: str) -> List[Tuple[str, Dict[str, List[str]]]]:
+        """(batch id, custom_id -> [user key, name, inputs hash]) for jobs of backend not collected yet"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT batch_id, members FROM batch_jobs WHERE status = 'in_progress' AND backend = ? "
+                "ORDER BY submitted_at",
+                (backend,)
+            ).fetchall()
+        return [(batch_id, json.loads(members)) for batch_id, members in rows]
+
+    def finish_job(self, batch_id: str, status: str) -> None:
+        with self._lock:
+            db = self._connection()
+            with db:
+                db.execute("UPDATE batch_jobs SET status = ? WHERE batch_id = ?", (status, batch_id))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Store size and lookup counters for /metrics"""
+        if not self.path.exists():
+            return {"analyses": 0, "pending_jobs": 0, "hits": self._hits, "misses": self._misses}
+
+        with self._lock:
+            db = self._connection()
+            analyses, newest = db.execute("SELECT COUNT(*), MAX(created_at) FROM analyses").fetchone()
+            pending = db.execute("SELECT COUNT(*) FROM batch_jobs WHERE status = 'in_progress'").fetchone()[0]
+        return {
+            "analyses": analyses,
+            "pending_jobs": pending,
+            "newest_age_hours": round((time.time() - newest) / 3600, 1) if newest else None,
+            "stored": self._stored,
+            "hits": self._hits,
+            "misses": self._misses
+        }
+
+
+analysis_store = AnalysisStore(BATCH_ANALYSIS_DB, max_age_days=BATCH_ANALYSIS_MAX_AGE_DAYS)
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+async def collect(
+    backend: BatchBackend,
+    batch_id: str,
+    members: Dict[str, List[str]],
+    store: AnalysisStore,
+    poll_interval: float = BATCH_POLL_INTERVAL
+) -> Dict[str, int]:
+    """
+    Poll a job until it ends, then parse and store every analysis
+
+    Returns:
+        Counts of stored, failed (no reply or unparseable) and missing results
+    """
+    while True:
+        status = await backend.status(batch_id)
+        if status != "in_progress":
+            break
+        logger.info(f"Batch {batch_id} in progress, checking again in {poll_interval:.0f}s")
+        await asyncio.sleep(poll_interval)
+
+    if status == "expired":
+        logger.warning(f"Batch {batch_id} is no longer available")
+        store.finish_job(batch_id, "expired")
+        return {"stored": 0, "failed": 0, "missing": len(members)}
+
+    replies = await backend.results(batch_id)
+    rows = []
+    failed = 0
+    for custom_id, (user_key, name, inputs_hash) in members.items():
+        if custom_id not in replies:
+            continue
+        reply = replies[custom_id]
+        if reply is None:
+            failed += 1
+            continue
+        try:
+            rows.append((user_key, name, inputs_hash, parse_analysis(reply)))
+        except Exception as e:
+            logger.warning(f"Unusable analysis for {name}: {e}")
+            failed += 1
+
+    store.save_analyses(rows, batch_id)
+    store.finish_job(batch_id, "ended")
+    return {"stored": len(rows), "failed": failed, "missing": len(members) - len(rows) - failed}
+
+
+async def run_batch(
+    backend: BatchBackend,
+    store: AnalysisStore,
+    cohort_dir: str = BATCH_COHORT_DIR,
+    poll_interval: float = BATCH_POLL_INTERVAL
+) -> Dict[str, int]:
+    """Analyze every student in cohort_dir as one batch job and store the results"""
+    requests = build_requests(load_cohort(cohort_dir))
+    if not requests:
+        logger.warning(f"No students found in {cohort_dir}")
+        return {"stored": 0, "failed": 0, "missing": 0}
+
+    batch_id = await backend.submit(requests)
+    store.save_job(batch_id, backend.name, requests)
+    logger.info(f"Submitted batch {batch_id}: {len(requests)} students via {backend.name}")
+
+    members = {
+        request["custom_id"]: [request["user_key"], request["name"], request["inputs_hash"]] for request in requests
+    }
+    return await collect(backend, batch_id, members, store, poll_interval)
+
+
+async def resume(backend: BatchBackend, store: AnalysisStore, poll_interval: float = BATCH_POLL_INTERVAL) -> Dict[str, int]:
+    """Collect every job of this backend that an earlier run submitted but never collected"""
+    totals = {"stored": 0, "failed": 0, "missing": 0}
+    for batch_id, members in store.pending_jobs(backend.name):
+        counts = await collect(backend, batch_id, members, store, poll_interval)
+        totals = {key: totals[key] + counts[key] for key in totals}
+    return totals
+
+
+async def _main(args: argparse.Namespace) -> None:
+    backend = BATCH_BACKENDS[args.backend]()
+    started = time.perf_counter()
+    try:
+        if args.resume:
+            counts = await resume(backend, analysis_store, args.poll)
+        else:
+            counts = await run_batch(backend, analysis_store, args.cohort, args.poll)
+    finally:
+        await lava_client.aclose()
+        analysis_store.close()
+
+    print(
+        f"✅ Batch analysis: {counts['stored']} stored, {counts['failed']} failed, "
+        f"{counts['missing']} missing in {time.perf_counter() - started:.1f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precompute spending analyses for a cohort")
+    parser.add_argument("--backend", choices=sorted(BATCH_BACKENDS), default="anthropic")
+    parser.add_argument("--cohort", default=BATCH_COHORT_DIR, help="Directory of mock_data-format JSON files")
+    parser.add_argument("--poll", type=float, default=BATCH_POLL_INTERVAL, help="Seconds between status checks")
+    parser.add_argument("--resume", action="store_true", help="Collect jobs submitted by an earlier run")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
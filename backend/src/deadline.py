@@ -0,0 +1,185 @@
+"""
+Request deadlines - one time budget per request, shared by every stage it reaches
+Set from the X-Request-Timeout header or a per-route default, carried in a contextvar
+"""
+
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Header with the client's budget in seconds, e.g. "X-Request-Timeout: 8"
+DEADLINE_HEADER = b"x-request-timeout"
+
+# Budget for routes without their own default, and the most a client may ask for (override via .env)
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "30"))
+REQUEST_DEADLINE_MAX = float(os.getenv("REQUEST_DEADLINE_MAX", "120"))
+
+# Per-route defaults in seconds (exact paths)
+ROUTE_DEADLINES: Dict[str, float] = {
+    "/api/analyze": 20,
+    "/api/recommendations": 15,
+    "/api/recommendations/stream": 45,
+    "/api/query": 15,
+    "/api/query/stream": 45,
+    "/api/parse-transaction": 10,
+    "/api/spending-forecast": 30,
+    "/api/spending-forecast/horizons": 30,
+    "/api/spending-forecast/groups": 45,
+    # /api/spending-forecast/batch streams for as long as the batch takes; each
+    # item gets its own budget instead (forecast_executor.FORECAST_BATCH_ITEM_DEADLINE)
+    "/api/merchant-search": 8,
+    "/api/visa-offers": 8,
+}
+
+
+class _Budget:
+    """One request's deadline (time.monotonic()) and the first stage that missed it"""
+
+    __slots__ = ("deadline", "missed_by")
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.missed_by: Optional[str] = None
+
+
+# Budget of the current request (None outside a request)
+_budget: ContextVar[Optional[_Budget]] = ContextVar("request_budget", default=None)
+
+# Requests that missed their deadline, by the first stage to notice
+_exceeded: Dict[str, int] = {}
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised by a stage that would run past the request deadline"""
+
+
+def exceeded(stage: str) -> DeadlineExceeded:
+    """Count the request's missed deadline (once) and return the exception to raise"""
+    budget = _budget.get()
+    if budget is not None and budget.missed_by is None:
+        budget.missed_by = stage
+        _exceeded[stage] = _exceeded.get(stage, 0) + 1
+    return DeadlineExceeded(f"{stage}: request deadline passed")
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None if there is no deadline"""
+    budget = _budget.get()
+    return None if budget is None else budget.deadline - time.monotonic()
+
+
+def expired() -> bool:
+    budget = _budget.get()
+    return budget is not None and time.monotonic() >= budget.deadline
+
+
+def check(stage: str) -> None:
+    """Raise DeadlineExceeded if the budget is already spent"""
+    if expired():
+        raise exceeded(stage)
+
+
+def timeout(default: float, stage: str) -> float:
+    """
+    Timeout for one stage: its own default, capped by the remaining budget
+
+    Raises:
+        DeadlineExceeded: If the budget is already spent
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise exceeded(stage)
+    return min(default, left)
+
+
+async def within(awaitable: Awaitable[T], stage: str) -> T:
+    """
+    Await within the remaining budget, cancelling it when the deadline passes
+
+    Raises:
+        DeadlineExceeded: If the deadline passes first
+    """
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        # Drop what we were handed without the "never awaited / retrieved" warnings
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        elif asyncio.isfuture(awaitable):
+            awaitable.cancel()
+        raise exceeded(stage)
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise exceeded(stage) from None
+
+
+async def detached(fn: Callable[[], Awaitable[T]]) -> T:
+    """
+    Await fn() outside any request deadline, bounded only by each stage's
+    default timeout; for work shared by several requests, run as its own task
+    """
+    _budget.set(None)
+    return await fn()
+
+
+def restart(seconds: float) -> None:
+    """
+    Give the current task a fresh budget of its own, starting now; for one
+    unit of a long stream, so later units aren't failed by the request-wide
+    deadline (run it as its own task, other tasks keep their budget)
+    """
+    _budget.set(_Budget(time.monotonic() + seconds))
+
+
+def request_budget(path: str, header: Optional[bytes]) -> float:
+    """Budget for a request: the header value (clamped to REQUEST_DEADLINE_MAX) or the route default"""
+    if header:
+        try:
+            seconds = float(header)
+        except ValueError:
+            seconds = 0.0
+        if seconds > 0:
+            return min(seconds, REQUEST_DEADLINE_MAX)
+    return ROUTE_DEADLINES.get(path, REQUEST_DEADLINE)
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware that starts the deadline clock for every HTTP request
+
+    The deadline lives in a contextvar, so everything the request awaits
+    (streaming response bodies included) and every thread it hands work to
+    via asyncio.to_thread sees the same budget.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = next((value for name, value in scope["headers"] if name == DEADLINE_HEADER), None)
+        token = _budget.set(_Budget(time.monotonic() + request_budget(scope["path"], header)))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _budget.reset(token)
+
+
+def stats() -> Dict[str, Any]:
+    """Deadline defaults and missed deadlines per stage for /metrics"""
+    return {
+        "default_seconds": REQUEST_DEADLINE,
+        "max_seconds": REQUEST_DEADLINE_MAX,
+        "exceeded": dict(_exceeded)
+    }
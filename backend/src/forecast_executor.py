@@ -0,0 +1,437 @@
+"""
+Forecast executor - runs Prophet fits in a pool of pre-warmed worker processes
+Keeps CPU-bound model fitting off the FastAPI event loop
+"""
+
+import asyncio
+import copy
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, cast
+
+from src import deadline
+
+logger = logging.getLogger(__name__)
+
+# Pool configuration (override via .env)
+FORECAST_POOL_SIZE = int(os.getenv("FORECAST_POOL_SIZE", "0")) or max(1, (os.cpu_count() or 2) - 1)
+FORECAST_QUEUE_LIMIT = int(os.getenv("FORECAST_QUEUE_LIMIT", "32"))
+FORECAST_POOL_START_METHOD = os.getenv("FORECAST_POOL_START_METHOD", "spawn")
+# Time budget for each item of a batch, counted from when it starts running (override via .env)
+FORECAST_BATCH_ITEM_DEADLINE = float(os.getenv("FORECAST_BATCH_ITEM_DEADLINE", "30"))
+
+
+class ForecastQueueFull(RuntimeError):
+    """Raised when every worker is busy and the wait queue is at its limit"""
+
+
+def _warm_worker() -> None:
+    """Pool initializer: import Prophet/cmdstanpy and load the Stan model once per worker"""
+    from src.prediction import warm_up
+
+    started = time.perf_counter()
+    warm_up()
+    logger.info(f"Forecast worker {os.getpid()} warm in {time.perf_counter() - started:.2f}s")
+
+
+def _ping() -> int:
+    """No-op job used to force the pool to spawn (and warm) all of its workers"""
+    return os.getpid()
+
+
+def _timed_call(fn: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[Any, float]:
+    """Run a job inside a worker and report how long it actually ran"""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+class ForecastExecutor:
+    """
+    Process pool dedicated to forecasting jobs
+
+    Jobs are awaited from async routes, so the event loop stays free while Stan
+    optimises. At most pool_size jobs run at once and at most queue_limit more
+    may wait; anything beyond that is rejected with ForecastQueueFull.
+    """
+
+    def __init__(self, pool_size: int, queue_limit: int, start_method: str = "spawn"):
+        self.pool_size = pool_size
+        self.queue_limit = queue_limit
+        self.start_method = start_method
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._abandoned = 0
+        self._run_seconds = 0.0
+        self._wait_seconds = 0.0
+        self._warm_pids: Set[int] = set()
+        self._warm_seconds: Optional[float] = None
+
+    def start(self) -> None:
+        """Create the pool and spawn every worker up front so they warm in the background"""
+        if self._pool is not None:
+            return
+
+        context = multiprocessing.get_context(self.start_method)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.pool_size,
+            mp_context=context,
+            initializer=_warm_worker
+        )
+        self._started_at = time.monotonic()
+        self._warm_pids = set()
+        self._warm_seconds = None
+
+        for _ in range(self.pool_size):
+            self._pool.submit(_ping)
+
+        logger.info(f"Forecast pool started: {self.pool_size} workers, queue limit {self.queue_limit}")
+
+    def shutdown(self) -> None:
+        """Stop the pool, dropping any jobs that have not started yet"""
+        if self._pool is None:
+            return
+
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+        logger.info("Forecast pool stopped")
+
+    async def wait_until_warm(self, poll_interval: float = 0.1) -> float:
+        """
+        Wait until every worker has run its initializer (Prophet imported, Stan model loaded)
+
+        Workers still warming don't take jobs, so pings are only answered by
+        warm ones; keep pinging until pool_size distinct workers have replied.
+
+        Returns:
+            Seconds from pool start until the last worker was warm
+        """
+        if self._pool is None:
+            self.start()
+        pool = cast(ProcessPoolExecutor, self._pool)
+
+        while len(self._warm_pids) < self.pool_size:
+            pings = [asyncio.wrap_future(pool.submit(_ping)) for _ in range(self.pool_size)]
+            self._warm_pids.update(await asyncio.gather(*pings))
+            if len(self._warm_pids) < self.pool_size:
+                await asyncio.sleep(poll_interval)
+
+        if self._warm_seconds is None:
+            self._warm_seconds = time.monotonic() - cast(float, self._started_at)
+        return self._warm_seconds
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run fn(*args, **kwargs) in a worker process and await its result
+
+        fn and its arguments must be picklable (module-level functions, plain data).
+        If the request deadline passes first, a job the pool has not handed to a
+        worker yet is cancelled; a running fit cannot be interrupted, so it
+        finishes in the background (keeping its slot until then) and its result
+        is dropped.
+
+        Raises:
+            ForecastQueueFull: If the pool is saturated
+            DeadlineExceeded: If the request deadline passes first
+        """
+        deadline.check("forecast")
+        if self._pool is None:
+            self.start()
+
+        with self._lock:
+            if self._in_flight >= self.pool_size + self.queue_limit:
+                self._rejected += 1
+                raise ForecastQueueFull(
+                    f"Forecast queue is full ({self._in_flight} jobs in flight)"
+                )
+            self._in_flight += 1
+
+        submitted = time.perf_counter()
+        try:
+            job = cast(ProcessPoolExecutor, self._pool).submit(_timed_call, fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+                self._failed += 1
+            raise
+        job.add_done_callback(lambda done: self._job_done(done, submitted))
+
+        try:
+            result, _ = await deadline.within(asyncio.wrap_future(job), "forecast")
+        except deadline.DeadlineExceeded:
+            with self._lock:
+                self._abandoned += 1
+            raise
+        return result
+
+    def _job_done(self, job: "Future[Tuple[Any, float]]", submitted: float) -> None:
+        """Pool callback: free the job's slot and record how long it queued and ran"""
+        with self._lock:
+            self._in_flight -= 1
+            if job.cancelled() or job.exception() is not None:
+                self._failed += 1
+                return
+            run_seconds = job.result()[1]
+            self._completed += 1
+            self._run_seconds += run_seconds
+            self._wait_seconds += max(0.0, time.perf_counter() - submitted - run_seconds)
+
+    async def forecast(
+        self,
+        data: Dict[str, Any],
+        mode: str = "daily",
+        filter_type: Optional[str] = None,
+        filter_value: Optional[str] = None,
+        confidence_interval: float = 0.95,
+        engine: str = "auto",
+        interval_strategy: str = "full",
+        interval_widths: Tuple[float, ...] = ()
+    ) -> Dict[str, Any]:
+        """
+        Forecast a request payload, serving unchanged series from the result cache
+
+        Aggregation (via the user's rollup) and the cache lookup happen in this
+        process, so every worker shares one rollup store and one cache; only
+        Prophet cache misses are shipped to the pool.
+        The NumPy engine takes milliseconds, so it runs on a thread instead of
+        paying the inter-process round trip.
+        """
+        from src.prediction import load_series, series_model_key
+
+        df = await asyncio.to_thread(load_series, data, filter_type, filter_value)
+        return await self.forecast_frame(
+            df, mode, filter_type, filter_value, confidence_interval, engine,
+            model_key=series_model_key(data, filter_type, filter_value),
+            interval_strategy=interval_strategy,
+            interval_widths=interval_widths
+        )
+
+    async def forecast_frame(
+        self,
+        df: Any,
+        mode: str = "daily",
+        filter_type: Optional[str] = None,
+        filter_value: Optional[str] = None,
+        confidence_interval: float = 0.95,
+        engine: str = "auto",
+        model_key: Optional[str] = None,
+        interval_strategy: str = "full",
+        interval_widths: Tuple[float, ...] = ()
+    ) -> Dict[str, Any]:
+        """Forecast an already-aggregated ds/y series (cache, then pool or thread)"""
+        from src.prediction import forecast_cache, forecast_cache_key, forecast_series, select_engine
+
+        if engine == "auto":
+            engine = select_engine(df)
+
+        cache_key = forecast_cache_key(
+            df, mode, filter_type, filter_value, confidence_interval, engine, interval_strategy, interval_widths
+        )
+        cached = forecast_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Forecast cache hit ({mode}, {len(df)} data points)")
+            return copy.deepcopy(cached)
+
+        args = (
+            df, mode, confidence_interval, filter_type, filter_value, engine, model_key,
+            interval_strategy, interval_widths
+        )
+        if engine == "prophet":
+            result = await self.run(forecast_series, *args)
+        else:
+            result = await deadline.within(asyncio.to_thread(forecast_series, *args), "forecast")
+        forecast_cache.put(cache_key, copy.deepcopy(result))
+        return result
+
+    async def forecast_horizons(
+        self,
+        data: Dict[str, Any],
+        modes: Tuple[str, ...] = ("daily", "weekly", "monthly"),
+        filter_type: Optional[str] = None,
+        filter_value: Optional[str] = None,
+        confidence_interval: float = 0.95,
+        engine: str = "auto",
+        interval_strategy: str = "full",
+        interval_widths: Tuple[float, ...] = ()
+    ) -> Dict[str, Any]:
+        """
+        Async counterpart of prediction.forecast_horizons_from_json
+
+        One fit serves every mode. Each mode's result goes into the shared
+        result cache, so single-mode requests for the same data hit it too.
+        """
+        from src.prediction import (
+            load_series, forecast_cache, forecast_cache_key, forecast_horizons,
+            select_engine, series_model_key
+        )
+
+        df = await asyncio.to_thread(load_series, data, filter_type, filter_value)
+        if engine == "auto":
+            engine = select_engine(df)
+
+        cache_keys = {
+            mode: forecast_cache_key(
+                df, mode, filter_type, filter_value, confidence_interval, engine, interval_strategy, interval_widths
+            )
+            for mode in modes
+        }
+        cached = {mode: forecast_cache.get(key) for mode, key in cache_keys.items()}
+        if all(result is not None for result in cached.values()):
+            logger.info(f"Multi-horizon cache hit ({len(df)} data points)")
+            return copy.deepcopy(cached)
+
+        args = (
+            df, tuple(modes), confidence_interval, engine,
+            series_model_key(data, filter_type, filter_value), filter_type, filter_value,
+            interval_strategy, interval_widths
+        )
+        if engine == "prophet":
+            results = await self.run(forecast_horizons, *args)
+        else:
+            results = await deadline.within(asyncio.to_thread(forecast_horizons, *args), "forecast")
+
+        for mode, result in results.items():
+            forecast_cache.put(cache_keys[mode], copy.deepcopy(result))
+        return results
+
+    async def forecast_groups(
+        self,
+        data: Dict[str, Any],
+        group_by: str,
+        mode: str = "daily",
+        confidence_interval: float = 0.95,
+        engine: str = "auto",
+        interval_strategy: str = "full",
+        interval_widths: Tuple[float, ...] = ()
+    ) -> Dict[str, Any]:
+        """
+        Async counterpart of prediction.forecast_by_group
+
+        Aggregates once, then forecasts the total and every group concurrently
+        across the pool. Failed groups are reported under "errors".
+        """
+        from src.prediction import load_groups, series_model_key
+
+        total_df, group_dfs = await asyncio.to_thread(load_groups, data, group_by)
+
+        interval_options = {"interval_strategy": interval_strategy, "interval_widths": interval_widths}
+        group_values = list(group_dfs)
+        outcomes = await asyncio.gather(
+            self.forecast_frame(
+                total_df, mode, None, None, confidence_interval, engine,
+                model_key=series_model_key(data), **interval_options
+            ),
+            *[
+                self.forecast_frame(
+                    group_dfs[value], mode, group_by, value, confidence_interval, engine,
+                    model_key=series_model_key(data, group_by, value), **interval_options
+                )
+                for value in group_values
+            ],
+            return_exceptions=True
+        )
+
+        total = outcomes[0]
+        if isinstance(total, BaseException):
+            raise total
+
+        grouped_result: Dict[str, Any] = {
+            "group_by": group_by,
+            "total": total,
+            "groups": {},
+            "errors": {}
+        }
+        for value, outcome in zip(group_values, outcomes[1:]):
+            if isinstance(outcome, BaseException):
+                logger.warning(f"Forecast for {group_by}={value} failed: {outcome}")
+                grouped_result["errors"][value] = str(outcome)
+            else:
+                grouped_result["groups"][value] = outcome
+
+        return grouped_result
+
+    async def forecast_batch(self, items: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Forecast batch items (from expand_batch_request) across the pool
+
+        Yields one result per item as soon as it finishes. At most pool_size
+        items are in flight so a large batch keeps every worker busy without
+        tripping the queue limit; a failing item only fails itself. Each item
+        runs under its own FORECAST_BATCH_ITEM_DEADLINE rather than the
+        request's deadline, so a long batch isn't cut off part-way.
+        """
+        from src.prediction import batch_item_label
+
+        slots = asyncio.Semaphore(self.pool_size)
+
+        async def run_item(item: Dict[str, Any]) -> Dict[str, Any]:
+            batch_result = batch_item_label(item)
+            if item["error"]:
+                batch_result["status"] = "error"
+                batch_result["error"] = item["error"]
+                return batch_result
+            async with slots:
+                deadline.restart(FORECAST_BATCH_ITEM_DEADLINE)
+                try:
+                    batch_result["result"] = await self.forecast(
+                        item["data"], item["mode"], item["filter_type"], item["filter_value"],
+                        engine=item["engine"],
+                        interval_strategy=item["interval_strategy"],
+                        interval_widths=item["interval_widths"]
+                    )
+                    batch_result["status"] = "ok"
+                except Exception as e:
+                    logger.warning(f"Batch item {item['index']} failed: {e}")
+                    batch_result["status"] = "error"
+                    batch_result["error"] = str(e)
+            return batch_result
+
+        tasks = [asyncio.create_task(run_item(item)) for item in items]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away mid-stream: don't leave orphaned jobs queued
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool utilisation snapshot for /metrics"""
+        with self._lock:
+            uptime = time.monotonic() - self._started_at if self._started_at else 0.0
+            finished = self._completed or 1
+
+            return {
+                "running": self._pool is not None,
+                "pool_size": self.pool_size,
+                "queue_limit": self.queue_limit,
+                "active": min(self._in_flight, self.pool_size),
+                "queued": max(0, self._in_flight - self.pool_size),
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "abandoned": self._abandoned,
+                "avg_run_ms": round(self._run_seconds / finished * 1000, 1),
+                "avg_wait_ms": round(self._wait_seconds / finished * 1000, 1),
+                "utilisation": round(self._run_seconds / (uptime * self.pool_size), 3) if uptime else 0.0,
+                "uptime_seconds": round(uptime, 1),
+                "warm_workers": min(len(self._warm_pids), self.pool_size),
+                "warm_seconds": round(self._warm_seconds, 2) if self._warm_seconds is not None else None
+            }
+
+
+forecast_executor = ForecastExecutor(
+    pool_size=FORECAST_POOL_SIZE,
+    queue_limit=FORECAST_QUEUE_LIMIT,
+    start_method=FORECAST_POOL_START_METHOD
+)
@@ -0,0 +1,27 @@
+"""
+Forecast type definitions - shared by prediction.py and the API layer
+Kept free of pandas/Prophet so importing them costs nothing at startup
+"""
+
+from typing import Any, Dict, List, Literal, Union
+
+# Forecast options
+ForecastMode = Literal["daily", "weekly", "monthly"]
+FilterType = Literal["category", "location", "type"]
+FrequencyType = Literal["D", "W", "MS"]
+ForecastEngine = Literal["prophet", "numpy", "auto"]
+IntervalStrategy = Literal["full", "reduced", "analytic"]
+
+# Data structure types
+TransactionDict = Dict[str, Union[str, float, int]]
+UserDataDict = Dict[str, Union[str, float, int, Dict[str, List[str]]]]
+DiningHallDict = Dict[str, Union[str, Dict[str, str], List[str], bool]]
+InputDataDict = Dict[str, Union[UserDataDict, List[TransactionDict], List[DiningHallDict]]]
+ForecastItemDict = Dict[str, Union[str, float]]
+SummaryDict = Dict[str, Union[str, float, int]]
+MetadataDict = Dict[str, Union[str, int, float, Dict[str, str], Dict[str, float]]]
+ResultDict = Dict[str, Union[List[ForecastItemDict], SummaryDict, MetadataDict]]
+BatchItemDict = Dict[str, Any]
+BatchResultDict = Dict[str, Any]
+GroupedResultDict = Dict[str, Any]
+HorizonResultDict = Dict[str, ResultDict]
@@ -0,0 +1,132 @@
+"""
+Incremental JSON array parser for streamed LLM output
+Emits each element of a top-level array as soon as it closes
+"""
+
+import json
+from typing import Any, List
+
+
+class JSONArrayStream:
+    """
+    Parse a JSON array of objects/arrays that arrives in arbitrary chunks
+
+    The array starts at a '[' that opens a line (or follows a ```json fence)
+    and is followed by an object, an array or ']'; any other '[' in a preamble
+    ("Here are [3] picks:") is skipped. Text before the array and after the
+    closing ']' is ignored, so raw Claude output can be fed as-is. Elements
+    must be objects or arrays; each is decoded with json.loads the moment its
+    closing bracket arrives. Only the element currently being received is
+    buffered.
+
+    Example:
+        >>> parser = JSONArrayStream()
+        >>> parser.feed('```json\\n[{"a": 1}, {"a"')
+        [{'a': 1}]
+        >>> parser.feed(': "}"}]\\n```')
+        [{'a': '}'}]
+    """
+
+    def __init__(self) -> None:
+        self.started = False
+        self.finished = False
+        self.count = 0
+
+        self._element: List[str] = []
+        self._depth = 0  # bracket depth inside the current element
+        self._in_string = False
+        self._escaped = False
+        self._line = ""  # preamble text since the last newline, before the array starts
+
+    def _restart(self) -> None:
+        """The '[' seen was not the array after all: go back to scanning the preamble"""
+        self.started = False
+        self._element = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._line = "["
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Consume the next chunk of text
+
+        Returns:
+            Elements completed by this chunk, in order
+
+        Raises:
+            ValueError: If, after its first element, the array holds something
+                other than objects/arrays or a completed element is not valid JSON
+        """
+        completed: List[Any] = []
+        if self.finished:
+            return completed
+
+        element_start = 0 if self._depth else None
+        for index, char in enumerate(chunk):
+            if not self.started:
+                if char == '\n':
+                    self._line = ""
+                elif char == '[' and self._line.strip() in ("", "```", "```json"):
+                    self.started = True
+                elif len(self._line) < 8:
+                    self._line += char
+                continue
+
+            if self._depth == 0:
+                # Between elements: only separators, whitespace or the closing bracket
+                if char in '{[':
+                    self._depth = 1
+                    element_start = index
+                elif char == ']':
+                    self.finished = True
+                    break
+                elif not self.count and not char.isspace():
+                    self._restart()
+                elif not (char == ',' or char.isspace()):
+                    raise ValueError(f"Expected an object or array in the JSON stream, got {char!r}")
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._element.append(chunk[element_start:index + 1])
+                    element_start = None
+                    try:
+                        element = json.loads("".join(self._element))
+                    except ValueError:
+                        if self.count:
+                            raise
+                        self._restart()
+                        continue
+                    completed.append(element)
+                    self._element = []
+                    self.count += 1
+
+        if self._depth and element_start is not None:
+            self._element.append(chunk[element_start:])
+
+        return completed
+
+    def close(self) -> None:
+        """
+        Check the stream ended cleanly
+
+        Raises:
+            ValueError: If no array was seen or it was cut off mid-way
+        """
+        if not self.started:
+            raise ValueError("No JSON array found in the stream")
+        if not self.finished:
+            raise ValueError(f"JSON array ended early after {self.count} elements")
@@ -0,0 +1,192 @@
+"""
+Async Lava forwarder client - one pooled httpx.AsyncClient for every Claude call
+Keeps LLM round trips off the event loop and reuses TLS connections between them
+"""
+
+import importlib.util
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, cast
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+LAVA_FORWARD_TOKEN = os.getenv("LAVA_FORWARD_TOKEN")
+LAVA_BASE_URL = os.getenv("LAVA_BASE_URL")
+
+# Connection pool configuration (override via .env)
+LAVA_MAX_CONNECTIONS = int(os.getenv("LAVA_MAX_CONNECTIONS", "20"))
+LAVA_MAX_KEEPALIVE = int(os.getenv("LAVA_MAX_KEEPALIVE", "10"))
+LAVA_KEEPALIVE_EXPIRY = float(os.getenv("LAVA_KEEPALIVE_EXPIRY", "60"))
+LAVA_TIMEOUT = float(os.getenv("LAVA_TIMEOUT", "30"))
+LAVA_CONNECT_TIMEOUT = float(os.getenv("LAVA_CONNECT_TIMEOUT", "5"))
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]"); HTTP/1.1 keep-alive otherwise
+LAVA_HTTP2 = os.getenv("LAVA_HTTP2", "1") != "0" and importlib.util.find_spec("h2") is not None
+
+
+class LavaClient:
+    """
+    Shared async connection pool for requests forwarded through Lava
+
+    Created in the FastAPI lifespan (start / aclose); code running outside
+    the app (scripts, benchmarks) gets a client lazily on first use. At most
+    max_connections requests are in flight at once; up to max_keepalive idle
+    connections are kept open for keepalive_expiry seconds so back-to-back
+    calls skip the TCP/TLS handshake.
+    """
+
+    def __init__(
+        self,
+        max_connections: int,
+        max_keepalive: int,
+        keepalive_expiry: float,
+        timeout: float,
+        connect_timeout: float,
+        http2: bool
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.http2 = http2
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._requests = 0
+        self._errors = 0
+        self._streams = 0
+        self._seconds = 0.0
+        self._http_versions: Dict[str, int] = {}
+
+    def start(self) -> None:
+        """Open the connection pool (no-op if already open)"""
+        if self._client is not None:
+            return
+
+        self._client = httpx.AsyncClient(http2=self.http2, limits=self.limits, timeout=self.timeout)
+        logger.info(
+            f"Lava client started: {'HTTP/2' if self.http2 else 'HTTP/1.1'}, "
+            f"{self.limits.max_connections} connections, {self.limits.max_keepalive_connections} keep-alive"
+        )
+
+    async def aclose(self) -> None:
+        """Close every pooled connection"""
+        if self._client is None:
+            return
+
+        await self._client.aclose()
+        self._client = None
+        logger.info("Lava client stopped")
+
+    def forward_request(self, target_url: str, body: Optional[Dict[str, Any]],
+                        headers: Optional[Dict[str, str]] = None,
+                        timeout: Optional[float] = None,
+                        method: str = "POST") -> httpx.Request:
+        """
+        Build a POST of body (or another method) to target_url via Lava's /forward endpoint
+
+        timeout (seconds) overrides the pool's default for this request,
+        e.g. to fit the remaining request deadline.
+        """
+        if self._client is None:
+            self.start()
+
+        request_timeout = self.timeout
+        if timeout is not None:
+            request_timeout = httpx.Timeout(timeout, connect=min(timeout, cast(float, self.timeout.connect)))
+
+        return self._client.build_request(
+            method,
+            f"{LAVA_BASE_URL}/forward?u={target_url}",
+            headers={
+                'Content-Type': 'application/json',
+                'Authorization': f'Bearer {LAVA_FORWARD_TOKEN}',
+                **(headers or {})
+            },
+            json=body,
+            timeout=request_timeout
+        )
+
+    async def forward(self, target_url: str, body: Optional[Dict[str, Any]],
+                      headers: Optional[Dict[str, str]] = None,
+                      timeout: Optional[float] = None,
+                      method: str = "POST") -> httpx.Response:
+        """
+        POST body to target_url via Lava on a pooled connection (GET with method="GET", body=None)
+
+        Raises:
+            httpx.HTTPError: On connection failures and timeouts (status codes
+                are left to the caller)
+        """
+        request = self.forward_request(target_url, body, headers, timeout, method)
+
+        started = time.perf_counter()
+        try:
+            response = await self._client.send(request)
+        except httpx.HTTPError:
+            self._errors += 1
+            raise
+        finally:
+            self._requests += 1
+            self._seconds += time.perf_counter() - started
+
+        self._http_versions[response.http_version] = self._http_versions.get(response.http_version, 0) + 1
+        return response
+
+    @asynccontextmanager
+    async def stream(self, target_url: str, body: Dict[str, Any],
+                     headers: Optional[Dict[str, str]] = None,
+                     timeout: Optional[float] = None) -> AsyncIterator[httpx.Response]:
+        """
+        POST body via Lava and yield the response as soon as its headers arrive
+
+        The body is read incrementally (e.g. response.aiter_lines() for SSE);
+        the connection goes back to the pool when the block exits.
+
+        Raises:
+            httpx.HTTPError: On connection failures and timeouts
+        """
+        request = self.forward_request(target_url, body, headers, timeout)
+
+        try:
+            response = await self._client.send(request, stream=True)
+        except httpx.HTTPError:
+            self._errors += 1
+            raise
+        finally:
+            self._streams += 1
+
+        self._http_versions[response.http_version] = self._http_versions.get(response.http_version, 0) + 1
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool configuration and request counters for /metrics"""
+        return {
+            "open": self._client is not None,
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive": self.limits.max_keepalive_connections,
+            "requests": self._requests,
+            "streams": self._streams,
+            "errors": self._errors,
+            "avg_ms": round(self._seconds / (self._requests or 1) * 1000, 1),
+            "http_versions": dict(self._http_versions)
+        }
+
+
+lava_client = LavaClient(
+    max_connections=LAVA_MAX_CONNECTIONS,
+    max_keepalive=LAVA_MAX_KEEPALIVE,
+    keepalive_expiry=LAVA_KEEPALIVE_EXPIRY,
+    timeout=LAVA_TIMEOUT,
+    connect_timeout=LAVA_CONNECT_TIMEOUT,
+    http2=LAVA_HTTP2
+)
@@ -3,40 +3,70 @@ FastAPI server for ZenWallet
 Includes AI analysis, recommendations, query, and ML forecasting
 """
 
-from fastapi import FastAPI, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional, Literal, cast
+from typing import List, Dict, Any, Optional, Literal, Union, Awaitable, TypeVar, cast
+from contextlib import asynccontextmanager
 import os
-from dotenv import load_dotenv
+import json
+import asyncio
 
 # Your existing imports
-from src.agent import analyze_spending, generate_recommendations, handle_query
+from src.agent import analysis_prompt, analyze_spending, generate_recommendations, stream_recommendations, handle_query, stream_query, llm_cache, llm_flight, claude_upstream, clean_json_response
 from src.models import UserProfile, Transaction, DiningHall, SpendingAnalysis, Recommendation
+from src.prompts import PARSER_PROMPT, PARSE_TRANSACTION_TEMPLATE, prompt_stats
 from src.mock_data import FALLBACK_ANALYSIS, FALLBACK_RECOMMENDATIONS, FALLBACK_QUERY_RESPONSE
 
-# Partner's ML forecasting import
-from src.prediction import (
-    forecast_from_json,
-    InputDataDict,
-    ResultDict,
-    ForecastMode,
-    FilterType
-)
+# Partner's ML forecasting types (src.prediction itself - pandas, Prophet - loads on first use)
+from src.forecast_types import InputDataDict, ResultDict, ForecastMode, FilterType
+from src.forecast_executor import forecast_executor, ForecastQueueFull
+from src.model_registry import model_registry
+from src.rollup import rollup_store, rollup_user_id, ROLLUP_FIELDS, ROLLUP_GRAINS
+from src.warmup import warmup
+from src.lava_client import lava_client
+from src import deadline
+from src.deadline import DeadlineExceeded, DeadlineMiddleware
+from src.transaction_parser import transaction_parser
+from src.recommender import recommender
+from src.spending_analytics import spending_analytics
+from src.batch_analysis import analysis_inputs_hash, analysis_store, analysis_user_key
 
 # Visa API integration
 from src.visa_service import (
     search_merchant,
     get_merchant_offers,
-    get_transaction_controls
+    get_transaction_controls,
+    visa_flight,
+    visa_upstream
 )
 
-load_dotenv()
+# Module import cost (FastAPI, Pydantic, NumPy); reported by /ready
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Spawn forecast workers and warm the forecasting stack in the background;
+    # with FORECAST_WARMUP=0 both happen on the first forecast instead
+    if warmup.enabled:
+        forecast_executor.start()
+        warmup.start()
+    # One pooled connection set for every Claude call via Lava
+    lava_client.start()
+    yield
+    await warmup.stop()
+    await lava_client.aclose()
+    forecast_executor.shutdown()
 
 app = FastAPI(
     title="ZenWallet API",
     description="AI-powered meal plan optimizer with ML forecasting",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # CRITICAL: CORS Configuration - Allow ALL origins
@@ -48,15 +78,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request time budget (X-Request-Timeout header or the route default), see src/deadline.py
+app.add_middleware(DeadlineMiddleware)
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded(request: Request, exc: DeadlineExceeded):
+    """Deadline misses a route doesn't answer with its own fallback"""
+    print(f"⏱️ {request.url.path} ran out of time: {exc}")
+    return JSONResponse(status_code=504, content={"detail": {
+        "error": str(exc),
+        "message": "Took longer than the request allows - try again"
+    }})
+
+@app.exception_handler(ForecastQueueFull)
+async def forecast_queue_full(request: Request, exc: ForecastQueueFull):
+    """Forecast pool and queue are full - shed the request rather than wait"""
+    print(f"⚠️ Forecast rejected: {exc}")
+    return JSONResponse(status_code=503, content={"detail": {
+        "error": str(exc),
+        "message": "Forecast service busy - try again shortly"
+    }})
+
 # Request Models
 class AnalyzeRequest(BaseModel):
     user_data: dict
     transactions: List[dict]
+    fresh: bool = False  # skip the precomputed (batch) analysis and ask Claude now
+    mode: Optional[Literal["llm", "local"]] = None  # "local" = computed metrics only, no Claude
 
 class RecommendationsRequest(BaseModel):
     user_data: dict
     dining_halls: List[dict]
     current_time: str
+    mode: Optional[Literal["llm", "local"]] = None  # "local" = rule-based ranking only, no Claude
 
 class QueryRequest(BaseModel):
     query: str
@@ -66,6 +120,7 @@ class QueryRequest(BaseModel):
 
 class ParseTransactionRequest(BaseModel):
     text: str
+    dining_halls: Optional[List[Union[str, dict]]] = None  # names or dining hall objects
 
 class MerchantSearchRequest(BaseModel):
     merchant_name: str
@@ -100,16 +155,70 @@ async def health():
         "features": ["AI Analysis", "AI Recommendations", "Natural Language Query", "ML Forecasting", "Visa Integration"]
     }
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once background warm-up has finished, 503 until then"""
+    status = {**warmup.status(), "import_ms": round(IMPORT_SECONDS * 1000, 1)}
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime stats for the forecasting subsystems"""
+    from src.prediction import forecast_cache
+    
+    return {
+        "forecast_pool": forecast_executor.stats(),
+        "forecast_cache": forecast_cache.stats(),
+        "model_registry": model_registry.stats(),
+        "rollup": rollup_store.stats(),
+        "lava_client": lava_client.stats(),
+        "llm_cache": llm_cache.stats(),
+        "transaction_parser": transaction_parser.stats(),
+        "recommender": recommender.stats(),
+        "spending_analytics": spending_analytics.stats(),
+        "prompts": prompt_stats.stats(),
+        "batch_analysis": analysis_store.stats(),
+        "singleflight": {
+            "claude": llm_flight.stats(),
+            "visa": visa_flight.stats()
+        },
+        "deadlines": deadline.stats(),
+        "upstreams": {
+            "claude": claude_upstream.stats(),
+            "visa": visa_upstream.stats()
+        }
+    }
+
 @app.post("/api/analyze")
 async def analyze(request: AnalyzeRequest):
-    """Analyze spending patterns using Claude AI via Lava"""
+    """
+    Analyze spending patterns using Claude AI via Lava
+    
+    Students covered by the weekly batch job (src/batch_analysis.py) get
+    their precomputed analysis straight from the store, as long as it was
+    computed for this user id from the same profile and transactions.
+    "mode": "local" answers from the locally computed spending metrics
+    without Claude.
+    """
     print(f"📊 Analyzing spending for {request.user_data['name']}")
     
     try:
         user_profile = UserProfile(**request.user_data)
         transactions = [Transaction(**t) for t in request.transactions]
         
-        analysis = analyze_spending(user_profile, transactions)
+        if not request.fresh and analysis_user_key(request.user_data) is not None:
+            inputs_hash = analysis_inputs_hash(analysis_prompt(user_profile, transactions))
+            precomputed = analysis_store.lookup(request.user_data, inputs_hash)
+            if precomputed is not None:
+                print("⚡ Analysis served from the batch store")
+                return {
+                    "main_insight": precomputed.main_insight,
+                    "dollar_amount": precomputed.dollar_amount,
+                    "patterns": precomputed.patterns,
+                    "recommendation": precomputed.recommendation
+                }
+        
+        analysis = await analyze_spending(user_profile, transactions, request.mode)
         
         print(f"✅ AI Analysis complete: {analysis.main_insight}")
         
@@ -129,6 +238,16 @@ async def analyze(request: AnalyzeRequest):
             "recommendation": FALLBACK_ANALYSIS.recommendation
         }
 
+def _recommendation_dict(rec: Recommendation) -> Dict[str, Any]:
+    return {
+        "dining_hall": rec.dining_hall,
+        "meal": rec.meal,
+        "reasoning": rec.reasoning,
+        "emoji": rec.emoji,
+        "savings_amount": rec.savings_amount,
+        "use_swipe": rec.use_swipe
+    }
+
 @app.post("/api/recommendations")
 async def recommendations(request: RecommendationsRequest):
     """Generate meal recommendations using Claude AI via Lava"""
@@ -150,42 +269,66 @@ async def recommendations(request: RecommendationsRequest):
         
         user_preferences = request.user_data.get('preferences', None)
         
-        recs = generate_recommendations(
+        recs = await generate_recommendations(
             user_profile, 
             dining_halls, 
             request.current_time,
-            user_preferences
+            user_preferences,
+            request.mode
         )
         
         print(f"✅ Generated {len(recs)} AI recommendations with preferences")
         
-        return [
-            {
-                "dining_hall": rec.dining_hall,
-                "meal": rec.meal,
-                "reasoning": rec.reasoning,
-                "emoji": rec.emoji,
-                "savings_amount": rec.savings_amount,
-                "use_swipe": rec.use_swipe
-            }
-            for rec in recs
-        ]
+        return [_recommendation_dict(rec) for rec in recs]
         
     except Exception as e:
         print(f"❌ Error in recommendations: {e}")
         import traceback
         traceback.print_exc()
-        return [
-            {
-                "dining_hall": rec.dining_hall,
-                "meal": rec.meal,
-                "reasoning": rec.reasoning,
-                "emoji": rec.emoji,
-                "savings_amount": rec.savings_amount,
-                "use_swipe": rec.use_swipe
-            }
-            for rec in FALLBACK_RECOMMENDATIONS
-        ]
+        return [_recommendation_dict(rec) for rec in FALLBACK_RECOMMENDATIONS]
+
+@app.post("/api/recommendations/stream")
+async def recommendations_stream(request: RecommendationsRequest):
+    """
+    Streaming /api/recommendations: one NDJSON line per recommendation, each
+    sent as soon as Claude has finished writing it
+    
+    If the stream fails before the first recommendation, the fallback
+    recommendations are sent instead; a failure after that just ends the stream.
+    """
+    print(f"🍽️ Streaming recommendations for {request.user_data['name']}")
+    
+    async def lines():
+        sent = 0
+        try:
+            user_profile = UserProfile(**request.user_data)
+            dining_halls = [DiningHall(**d) for d in request.dining_halls]
+            
+            user_preferences = request.user_data.get('preferences', None)
+            
+            async for rec in stream_recommendations(
+                user_profile,
+                dining_halls,
+                request.current_time,
+                user_preferences,
+                request.mode
+            ):
+                sent += 1
+                yield json.dumps(_recommendation_dict(rec)) + "\n"
+            
+            print(f"✅ Streamed {sent} AI recommendations")
+            
+        except Exception as e:
+            print(f"❌ Error in recommendations stream after {sent} sent: {e}")
+            if not sent:
+                for rec in FALLBACK_RECOMMENDATIONS:
+                    yield json.dumps(_recommendation_dict(rec)) + "\n"
+    
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/api/query")
 async def query(request: QueryRequest):
@@ -198,7 +341,7 @@ async def query(request: QueryRequest):
         
         user_preferences = request.user_data.get('preferences', None)
         
-        response = handle_query(
+        response = await handle_query(
             request.query,
             user_profile,
             dining_halls,
@@ -214,139 +357,399 @@ async def query(request: QueryRequest):
         print(f"❌ Error in query: {e}")
         return {"response": FALLBACK_QUERY_RESPONSE}
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/query/stream")
+async def query_stream(request: QueryRequest):
+    """
+    Streaming /api/query: the answer arrives as Server-Sent Events while Claude writes it
+    
+    Events: "delta" {"text"} for each chunk, "fallback" {"response"} if the
+    stream fails (replaces anything shown so far), then "done" {"response"}
+    with the complete answer.
+    """
+    print(f"💬 Streaming query: '{request.query}'")
+    
+    async def events():
+        parts = []
+        try:
+            user_profile = UserProfile(**request.user_data)
+            dining_halls = [DiningHall(**d) for d in request.dining_halls]
+            
+            user_preferences = request.user_data.get('preferences', None)
+            
+            async for text in stream_query(
+                request.query,
+                user_profile,
+                dining_halls,
+                request.current_time,
+                user_preferences
+            ):
+                parts.append(text)
+                yield _sse("delta", {"text": text})
+            
+            response = "".join(parts).strip()
+            if not response:
+                raise Exception("Empty response from Claude")
+            
+            print(f"✅ Streamed AI response: {response[:100]}...")
+            
+        except Exception as e:
+            print(f"❌ Error in query stream: {e}")
+            response = FALLBACK_QUERY_RESPONSE
+            yield _sse("fallback", {"response": response})
+        
+        yield _sse("done", {"response": response})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/parse-transaction")
 async def parse_transaction(request: ParseTransactionRequest):
-    """Parse natural language transaction description using Claude AI"""
+    """
+    Parse a natural language transaction description
+    
+    The local grammar handles amounts, payment keywords, dining halls and known
+    merchants; Claude is only asked when its confidence is below the threshold.
+    """
     print(f"💳 Parsing transaction: '{request.text}'")
     
+    hall_names = [
+        name for name in (
+            hall if isinstance(hall, str) else hall.get('name') for hall in request.dining_halls or []
+        )
+        if isinstance(name, str) and name
+    ]
+    local = transaction_parser.parse(request.text, hall_names or None)
+    if local.complete and local.confidence >= transaction_parser.threshold:
+        transaction_parser.record("local")
+        print(f"⚡ Parsed locally ({local.confidence:.2f}): {local.merchant} - ${local.amount} ({local.type})")
+        return {**local.as_dict(), "confidence": local.confidence, "source": "local"}
+    
     try:
         # Use Claude to parse the transaction
         from src.agent import call_claude_via_lava
         
-        prompt = f"""Parse this transaction description into structured data:
-
-"{request.text}"
-
-Extract:
-1. Merchant name (e.g., "Starbucks", "Chipotle", "Costco")
-2. Amount in dollars (convert cents to dollars if needed: 150 cents = $1.50)
-3. Payment type: "swipe" (dining hall meal swipe), "flex" (flex dollars), or "external" (off-campus cash/card)
-
-Return ONLY a JSON object:
-{{
-  "merchant": "Merchant Name",
-  "amount": 1.50,
-  "type": "swipe|flex|external"
-}}
-
-Rules:
-- If they mention cents, divide by 100 to get dollars
-- If they mention a dining hall or swipe, type is "swipe"
-- If they mention flex, type is "flex"  
-- Otherwise type is "external"
-- Merchant should be properly capitalized
-- Amount should be a number (float)"""
-
-        response = call_claude_via_lava("You are a transaction parser. Extract structured data from natural language.", prompt, temperature=0.3)
-        
-        # Parse Claude's response
-        import json
-        import re
-        
-        # Remove markdown code blocks if present
-        cleaned = response.strip()
-        if cleaned.startswith('```json'):
-            cleaned = cleaned[7:]
-        elif cleaned.startswith('```'):
-            cleaned = cleaned[3:]
-        if cleaned.endswith('```'):
-            cleaned = cleaned[:-3]
-        cleaned = cleaned.strip()
+        response = await call_claude_via_lava(
+            PARSER_PROMPT,
+            PARSE_TRANSACTION_TEMPLATE.render(text=request.text),
+            temperature=0.3,
+            kind="parse_transaction"
+        )
         
-        parsed = json.loads(cleaned)
+        parsed = json.loads(clean_json_response(response))
+        transaction_parser.record("llm")
         
         print(f"✅ Parsed: {parsed['merchant']} - ${parsed['amount']} ({parsed['type']})")
         
-        return parsed
+        return {**parsed, "confidence": None, "source": "llm"}
         
     except Exception as e:
         print(f"❌ Parse failed: {e}")
-        # Fallback to simple parsing
+        transaction_parser.record("llm_error")
         import traceback
         traceback.print_exc()
         
+        # Fall back to whatever the local parse found
         return {
-            "merchant": "Restaurant",
-            "amount": 10.0,
-            "type": "external"
+            "merchant": local.merchant or "Restaurant",
+            "amount": local.amount if local.amount is not None else 10.0,
+            "type": local.type,
+            "confidence": local.confidence,
+            "source": "local"
         }
 
-# 🆕 ML FORECASTING ENDPOINT
-@app.post("/api/spending-forecast")
-async def spending_forecast(request: Dict[str, Any]) -> ResultDict:
+def _interval_options(request: Dict[str, Any]) -> Dict[str, Any]:
     """
-    ML-based spending forecast using Facebook Prophet
+    Read "interval_strategy" ("full", "reduced" or "analytic") and
+    "interval_widths" (extra widths, e.g. [0.5, 0.8]) from a forecast body
+    """
+    interval_strategy = request.get('interval_strategy', 'full')
+    if interval_strategy not in ('full', 'reduced', 'analytic'):
+        raise HTTPException(
+            status_code=400, detail={"error": f"Unknown interval_strategy: {interval_strategy}"}
+        )
     
-    Predicts future spending patterns based on historical transactions
+    interval_widths = request.get('interval_widths') or []
+    if not isinstance(interval_widths, list) or not all(
+        isinstance(w, (int, float)) and 0 < w < 1 for w in interval_widths
+    ):
+        raise HTTPException(
+            status_code=400, detail={"error": "interval_widths must be a list of numbers between 0 and 1"}
+        )
+    
+    return {"interval_strategy": interval_strategy, "interval_widths": tuple(interval_widths)}
+
+def _engine_option(request: Dict[str, Any]) -> str:
+    """Read "engine" ("prophet", "numpy" or "auto") from a forecast body"""
+    engine = request.get('engine', 'auto')
+    if engine not in ('prophet', 'numpy', 'auto'):
+        raise HTTPException(status_code=400, detail={"error": f"Unknown engine: {engine}"})
+    return engine
+
+T = TypeVar("T")
+
+async def _forecast_or_500(label: str, forecast: Awaitable[T]) -> T:
+    """
+    Await a forecast, answering any failure with a 500
+    
+    ForecastQueueFull (503) and DeadlineExceeded (504) pass through to
+    their app-level handlers.
     """
     try:
-        print("\n" + "="*60)
-        print("📈 SPENDING FORECAST REQUEST")
-        print("="*60)
-        
-        # Extract and cast parameters
-        user_data_raw = request.get('UserData', {})
-        transactions_raw = request.get('Transactions', [])
-        mode = cast(ForecastMode, request.get('mode', 'weekly'))
-        filter_type = cast(Optional[FilterType], request.get('filter_type'))
-        filter_value = request.get('filter_value')
-        
-        # Build input data structure
-        data: InputDataDict = cast(InputDataDict, {
-            'UserData': user_data_raw,
-            'Transactions': transactions_raw,
-            'DiningHalls': request.get('DiningHalls', [])
-        })
-        
-        user_name = str(user_data_raw.get('name', 'User'))
-        transaction_count = len(transactions_raw)
-        
-        print(f"User: {user_name}")
-        print(f"Transactions: {transaction_count}")
-        print(f"Mode: {mode}")
-        if filter_type and filter_value:
-            print(f"Filter: {filter_type}={filter_value}")
-        
-        # Call Prophet forecast
-        result: ResultDict = forecast_from_json(
-            data=data,
-            mode=mode,
-            filter_type=filter_type,
-            filter_value=filter_value if filter_value else None
-        )
-        
-        summary = result.get('summary', {})
-        total_forecasted = float(summary.get('total_forecasted', 0))
-        trend = str(summary.get('trend', 'unknown'))
-        
-        print(f"✅ Forecast complete: ${total_forecasted:.2f} ({trend} trend)")
-        
-        return result
-        
+        return await forecast
+    except (ForecastQueueFull, DeadlineExceeded):
+        raise
     except Exception as e:
-        print(f"❌ Forecast failed: {e}")
-        import traceback
-        traceback.print_exc()
-        
-        # Return error with proper structure
+        print(f"❌ {label} failed: {e}")
         raise HTTPException(
-            status_code=500, 
+            status_code=500,
             detail={
                 "error": str(e),
                 "message": "Forecast unavailable - not enough transaction data"
             }
         )
 
+# 🆕 ML FORECASTING ENDPOINT
+@app.post("/api/spending-forecast")
+async def spending_forecast(request: Dict[str, Any]) -> ResultDict:
+    """
+    ML-based spending forecast using Facebook Prophet
+    
+    Predicts future spending patterns based on historical transactions.
+    "engine" may be "prophet", "numpy" (fast, for short histories) or "auto".
+    "interval_strategy" may be "full", "reduced" or "analytic" (fastest) for
+    latency-sensitive callers; "interval_widths" adds extra bounds per item.
+    """
+    print("\n" + "="*60)
+    print("📈 SPENDING FORECAST REQUEST")
+    print("="*60)
+    
+    # Extract and cast parameters
+    user_data_raw = request.get('UserData', {})
+    transactions_raw = request.get('Transactions', [])
+    mode = cast(ForecastMode, request.get('mode', 'weekly'))
+    filter_type = cast(Optional[FilterType], request.get('filter_type'))
+    filter_value = request.get('filter_value')
+    engine = _engine_option(request)
+    interval_options = _interval_options(request)
+    
+    # Build input data structure
+    data: InputDataDict = cast(InputDataDict, {
+        'UserData': user_data_raw,
+        'Transactions': transactions_raw,
+        'DiningHalls': request.get('DiningHalls', [])
+    })
+    
+    user_name = str(user_data_raw.get('name', 'User'))
+    transaction_count = len(transactions_raw)
+    
+    print(f"User: {user_name}")
+    print(f"Transactions: {transaction_count}")
+    print(f"Mode: {mode}")
+    print(f"Engine: {engine} ({interval_options['interval_strategy']} intervals)")
+    if filter_type and filter_value:
+        print(f"Filter: {filter_type}={filter_value}")
+    
+    # Call Prophet forecast in a warm worker process (cached results skip the fit)
+    result: ResultDict = await _forecast_or_500("Forecast", forecast_executor.forecast(
+        data=data,
+        mode=mode,
+        filter_type=filter_type,
+        filter_value=filter_value if filter_value else None,
+        engine=engine,
+        **interval_options
+    ))
+    
+    summary = result.get('summary', {})
+    total_forecasted = float(summary.get('total_forecasted', 0))
+    trend = str(summary.get('trend', 'unknown'))
+    
+    print(f"✅ Forecast complete: ${total_forecasted:.2f} ({trend} trend)")
+    
+    return result
+
+@app.post("/api/spending-forecast/horizons")
+async def spending_forecast_horizons(request: Dict[str, Any]):
+    """
+    Daily, weekly and monthly forecasts from a single model fit
+    
+    Takes the same body as /api/spending-forecast plus an optional "modes"
+    list (default all three); returns {mode: forecast}.
+    """
+    modes = request.get('modes') or ['daily', 'weekly', 'monthly']
+    invalid_modes = [m for m in modes if m not in ('daily', 'weekly', 'monthly')]
+    if invalid_modes:
+        raise HTTPException(status_code=400, detail={"error": f"Invalid modes: {invalid_modes}"})
+    
+    engine = _engine_option(request)
+    interval_options = _interval_options(request)
+    
+    filter_type = cast(Optional[FilterType], request.get('filter_type'))
+    filter_value = request.get('filter_value')
+    data: InputDataDict = cast(InputDataDict, {
+        'UserData': request.get('UserData', {}),
+        'Transactions': request.get('Transactions', []),
+        'DiningHalls': request.get('DiningHalls', [])
+    })
+    
+    print(f"📈 Multi-horizon forecast {modes} ({len(data['Transactions'])} transactions)")
+    
+    results = await _forecast_or_500("Multi-horizon forecast", forecast_executor.forecast_horizons(
+        data,
+        tuple(modes),
+        filter_type=filter_type if filter_value else None,
+        filter_value=filter_value if filter_value else None,
+        engine=engine,
+        **interval_options
+    ))
+    
+    print(f"✅ Multi-horizon forecast complete: " + ", ".join(
+        f"{mode} ${float(result['summary']['total_forecasted']):.2f}" for mode, result in results.items()
+    ))
+    
+    return results
+
+@app.post("/api/spending-forecast/groups")
+async def spending_forecast_groups(request: Dict[str, Any]):
+    """
+    Forecast the total plus every value of one field in a single call
+    
+    Set "group_by" to "category", "location" or "type". Transactions are
+    aggregated once and all series are forecast concurrently; the response
+    has "total", "groups" (value -> forecast) and "errors" (value -> reason).
+    """
+    group_by = request.get('group_by')
+    if group_by not in ('category', 'location', 'type'):
+        raise HTTPException(status_code=400, detail={"error": f"Invalid group_by: {group_by}"})
+    
+    engine = _engine_option(request)
+    interval_options = _interval_options(request)
+    
+    mode = cast(ForecastMode, request.get('mode', 'weekly'))
+    data: InputDataDict = cast(InputDataDict, {
+        'UserData': request.get('UserData', {}),
+        'Transactions': request.get('Transactions', []),
+        'DiningHalls': request.get('DiningHalls', [])
+    })
+    
+    print(f"📈 Grouped forecast by {group_by} ({mode}, {len(data['Transactions'])} transactions)")
+    
+    grouped_result = await _forecast_or_500("Grouped forecast", forecast_executor.forecast_groups(
+        data, group_by, mode, engine=engine, **interval_options
+    ))
+    
+    print(f"✅ Grouped forecast complete: {len(grouped_result['groups'])} groups, "
+          f"{len(grouped_result['errors'])} skipped")
+    
+    return grouped_result
+
+@app.post("/api/spending-forecast/batch")
+async def spending_forecast_batch(request: Dict[str, Any]):
+    """
+    Forecast many users/filters in one call
+    
+    Accepts {"items": [payload, ...]} or one payload with "filters": [...].
+    Streams one NDJSON line per item as it finishes; failed items carry an
+    "error" instead of a "result".
+    """
+    from src.prediction import expand_batch_request
+    
+    try:
+        items = expand_batch_request(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
+    
+    print(f"📈 Batch forecast: {len(items)} items")
+    
+    async def stream_results():
+        succeeded = 0
+        async for batch_result in forecast_executor.forecast_batch(items):
+            if batch_result["status"] == "ok":
+                succeeded += 1
+            yield json.dumps(batch_result) + "\n"
+        print(f"✅ Batch forecast complete: {succeeded}/{len(items)} succeeded")
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+# 📊 SPENDING ROLLUP (CHART) ENDPOINTS
+
+def _rollup_chart_params(grain: str, group_by: Optional[str]) -> None:
+    if grain not in ROLLUP_GRAINS:
+        raise HTTPException(status_code=400, detail={"error": f"Invalid grain: {grain}"})
+    if group_by is not None and group_by not in ROLLUP_FIELDS:
+        raise HTTPException(status_code=400, detail={"error": f"Invalid group_by: {group_by}"})
+
+@app.post("/api/spending-rollup")
+async def spending_rollup(request: Dict[str, Any]):
+    """
+    Spending totals and counts per day/week/month, optionally per group
+    
+    Body: UserData (with an id), optional Transactions (synced into the
+    user's rollup; only new ids are processed), "grain" ("day", "week" or
+    "month", default "week") and optional "group_by" (category/location/type).
+    """
+    grain = request.get('grain', 'week')
+    group_by = request.get('group_by')
+    _rollup_chart_params(grain, group_by)
+    
+    user_id = rollup_user_id(request)
+    if user_id is None:
+        raise HTTPException(status_code=400, detail={"error": "UserData needs an id"})
+    
+    transactions = request.get('Transactions') or []
+    if transactions:
+        rollup = await asyncio.to_thread(rollup_store.sync, user_id, transactions)
+    else:
+        rollup = rollup_store.get(user_id)
+        if rollup is None:
+            raise HTTPException(status_code=404, detail={"error": f"No rollup for user {user_id}"})
+    
+    return rollup.chart(grain, group_by)
+
+@app.get("/api/spending-rollup/{user_id}")
+async def get_spending_rollup(user_id: str, grain: str = "week", group_by: Optional[str] = None):
+    """Read an existing rollup (no transactions needed) for charts"""
+    _rollup_chart_params(grain, group_by)
+    
+    rollup = rollup_store.get(user_id)
+    if rollup is None:
+        raise HTTPException(status_code=404, detail={"error": f"No rollup for user {user_id}"})
+    
+    return rollup.chart(grain, group_by)
+
+@app.post("/api/spending-rollup/append")
+async def append_spending_rollup(request: Dict[str, Any]):
+    """
+    Add newly recorded transactions to a user's rollup
+    
+    Already-counted transactions (same id) are skipped, so retries are safe;
+    transactions without an id are always counted. Changing a counted
+    transaction needs the full history (POST /api/spending-rollup).
+    """
+    user_id = rollup_user_id(request)
+    if user_id is None:
+        raise HTTPException(status_code=400, detail={"error": "UserData needs an id"})
+    
+    transactions = request.get('Transactions') or []
+    try:
+        rollup, added = await asyncio.to_thread(rollup_store.append, user_id, transactions)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail={"error": f"Invalid transactions: {e}"})
+    
+    print(f"📊 Rollup append for {user_id}: +{added} ({rollup.transaction_count} total)")
+    
+    return {
+        "user_id": user_id,
+        "added": added,
+        "transactions": rollup.transaction_count
+    }
+
 # 🏦 VISA API ENDPOINTS
 
 @app.post("/api/merchant-search")
@@ -358,10 +761,15 @@ async def merchant_search(request: MerchantSearchRequest):
     try:
         print(f"🔍 Searching merchant: {request.merchant_name}")
         
-        merchant_data = search_merchant(
-            request.merchant_name,
-            request.latitude,
-            request.longitude
+        # Blocking Visa client runs in a thread; identical concurrent searches share it
+        merchant_data = await visa_flight.do(
+            ("merchant-search", request.merchant_name, request.latitude, request.longitude),
+            lambda: asyncio.to_thread(
+                search_merchant,
+                request.merchant_name,
+                request.latitude,
+                request.longitude
+            )
         )
         
         if merchant_data:
@@ -384,10 +792,14 @@ async def visa_offers(request: OffersRequest):
     try:
         print(f"🎁 Fetching Visa offers near ({request.latitude}, {request.longitude})")
         
-        offers = get_merchant_offers(
-            request.latitude,
-            request.longitude,
-            request.radius
+        offers = await visa_flight.do(
+            ("offers", request.latitude, request.longitude, request.radius),
+            lambda: asyncio.to_thread(
+                get_merchant_offers,
+                request.latitude,
+                request.longitude,
+                request.radius
+            )
         )
         
         print(f"✅ Found {len(offers)} Visa offers")
@@ -429,10 +841,20 @@ if __name__ == "__main__":
     print("  ✅ Prophet ML Forecasting")
     print("\nEndpoints:")
     print("  GET  /health")
+    print("  GET  /ready")
+    print("  GET  /metrics")
     print("  POST /api/analyze")
     print("  POST /api/recommendations")
+    print("  POST /api/recommendations/stream")
     print("  POST /api/query")
+    print("  POST /api/query/stream")
     print("  POST /api/spending-forecast")
+    print("  POST /api/spending-forecast/horizons")
+    print("  POST /api/spending-forecast/groups")
+    print("  POST /api/spending-forecast/batch")
+    print("  POST /api/spending-rollup")
+    print("  GET  /api/spending-rollup/{user_id}")
+    print("  POST /api/spending-rollup/append")
     print("\nDocs: http://localhost:8000/docs")
     print("="*60 + "\n")
     
@@ -0,0 +1,198 @@
+"""
+Persisted Prophet model registry
+Stores fitted models per user/filter on disk so refits can warm-start from them
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev servers only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Registry configuration (override via .env)
+MODEL_REGISTRY_DIR = Path(
+    os.getenv("MODEL_REGISTRY_DIR", Path(__file__).resolve().parent.parent / ".model_registry")
+)
+MODEL_REGISTRY_MAX_MODELS = int(os.getenv("MODEL_REGISTRY_MAX_MODELS", "500"))
+MODEL_REGISTRY_MAX_AGE_DAYS = float(os.getenv("MODEL_REGISTRY_MAX_AGE_DAYS", "30"))
+
+WARM_START_SCALARS = ("k", "m", "sigma_obs")
+WARM_START_VECTORS = ("delta", "beta")
+
+
+def model_key(user_id: str, filter_type: Optional[str] = None, filter_value: Optional[str] = None) -> str:
+    """Registry key for one user's series (optionally filtered)"""
+    raw = f"{user_id}|{filter_type or ''}|{filter_value or ''}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ModelRegistry:
+    """
+    On-disk store of fitted Prophet models
+
+    Layout under root:
+        index.json          key -> {created_at, last_used, history_points, size_bytes}
+        models/<key>.json   full model (prophet.serialize.model_to_json)
+        models/<key>.init   warm-start parameters (k, m, sigma_obs, delta, beta)
+
+    Files are written atomically and the index is updated under an exclusive
+    file lock, so every forecast worker process (and restarts) share one
+    registry. Least recently used models are evicted past max_models, and
+    models unused for max_age_days are dropped.
+    """
+
+    def __init__(self, root: Path, max_models: int = 500, max_age_days: float = 30.0):
+        self.root = Path(root)
+        self.max_models = max_models
+        self.max_age_seconds = max_age_days * 86400
+
+        self._models_dir = self.root / "models"
+        self._index_path = self.root / "index.json"
+        self._lock_path = self.root / "index.lock"
+
+        self._warm_starts = 0
+        self._cold_starts = 0
+        self._saves = 0
+
+    @contextmanager
+    def _locked_index(self) -> Iterator[Dict[str, Dict[str, Any]]]:
+        """Read-modify-write the index under an exclusive cross-process lock"""
+        self._models_dir.mkdir(parents=True, exist_ok=True)
+
+        with open(self._lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                index = self._read_index()
+                yield index
+                self._atomic_write(self._index_path, json.dumps(index))
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def _atomic_write(path: Path, content: str) -> None:
+        tmp_path = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def _remove_files(self, key: str) -> None:
+        for suffix in (".json", ".init"):
+            try:
+                (self._models_dir / f"{key}{suffix}").unlink()
+            except FileNotFoundError:
+                pass
+
+    def warm_start_params(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Stored parameters to initialise a refit with, or None if there is no model
+
+        Vectors whose length no longer matches (e.g. more changepoints after new
+        data arrives) are replaced with defaults by Prophet itself.
+        """
+        init_path = self._models_dir / f"{key}.init"
+        try:
+            with open(init_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._cold_starts += 1
+            return None
+
+        self._warm_starts += 1
+        params: Dict[str, Any] = {name: float(stored[name]) for name in WARM_START_SCALARS}
+        for name in WARM_START_VECTORS:
+            params[name] = np.asarray(stored[name], dtype=np.float64)
+        return params
+
+    def load(self, key: str) -> Optional[Any]:
+        """Deserialise the full stored Prophet model, or None if absent"""
+        from prophet.serialize import model_from_json
+
+        try:
+            with open(self._models_dir / f"{key}.json", "r", encoding="utf-8") as f:
+                return model_from_json(f.read())
+        except FileNotFoundError:
+            return None
+
+    def save(self, key: str, model: Any) -> None:
+        """Persist a fitted model and its warm-start parameters, then apply eviction"""
+        from prophet.serialize import model_to_json
+
+        self._models_dir.mkdir(parents=True, exist_ok=True)
+
+        model_json = model_to_json(model)
+        init = {name: float(model.params[name][0][0]) for name in WARM_START_SCALARS}
+        for name in WARM_START_VECTORS:
+            init[name] = [float(v) for v in model.params[name][0]]
+
+        self._atomic_write(self._models_dir / f"{key}.json", model_json)
+        self._atomic_write(self._models_dir / f"{key}.init", json.dumps(init))
+        self._saves += 1
+
+        now = time.time()
+        with self._locked_index() as index:
+            created_at = index.get(key, {}).get("created_at", now)
+            index[key] = {
+                "created_at": created_at,
+                "last_used": now,
+                "history_points": int(len(model.history)),
+                "size_bytes": len(model_json)
+            }
+            self._evict(index, now)
+
+    def _evict(self, index: Dict[str, Dict[str, Any]], now: float) -> None:
+        """Drop expired entries, then least recently used ones past max_models"""
+        expired = [k for k, entry in index.items() if now - entry["last_used"] > self.max_age_seconds]
+
+        by_age = sorted(
+            (k for k in index if k not in expired),
+            key=lambda k: index[k]["last_used"]
+        )
+        overflow = by_age[:max(0, len(by_age) - self.max_models)]
+
+        for key in expired + overflow:
+            index.pop(key, None)
+            self._remove_files(key)
+
+        if expired or overflow:
+            logger.info(f"Model registry evicted {len(expired)} expired, {len(overflow)} LRU models")
+
+    def stats(self) -> Dict[str, Any]:
+        """Registry size and warm/cold start counters for /metrics (counters are per process)"""
+        index = self._read_index()
+        return {
+            "path": str(self.root),
+            "models": len(index),
+            "max_models": self.max_models,
+            "size_bytes": sum(entry.get("size_bytes", 0) for entry in index.values()),
+            "warm_starts": self._warm_starts,
+            "cold_starts": self._cold_starts,
+            "saves": self._saves
+        }
+
+
+model_registry = ModelRegistry(
+    root=MODEL_REGISTRY_DIR,
+    max_models=MODEL_REGISTRY_MAX_MODELS,
+    max_age_days=MODEL_REGISTRY_MAX_AGE_DAYS
+)
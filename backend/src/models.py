@@ -22,6 +22,7 @@ class Transaction(BaseModel):
     amount: float
     type: str  # 'swipe' or 'flex'
     timestamp: str  # Changed from datetime to str for easier JSON handling
+    category: Optional[str] = None  # 'breakfast', 'lunch', 'dinner', 'coffee', 'snack', ...
 
 class DiningHall(BaseModel):
     """Dining hall information"""
@@ -6,15 +6,33 @@ Python: >=3.9, Prophet: -=1.1
 """
 
 import json
+import os
+import copy
+import hashlib
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Literal, Tuple, Any, Union
-from prophet import Prophet
-from prophet.forecaster import Prophet as ProphetType
+from statistics import NormalDist
+from typing import TYPE_CHECKING, Dict, List, Optional, Literal, Tuple, Any, Union, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, as_completed
 import logging
 from pathlib import Path
 
+from src.cache import LRUCache
+from src.forecast_types import (
+    ForecastMode, FilterType, FrequencyType, ForecastEngine, IntervalStrategy,
+    TransactionDict, UserDataDict, DiningHallDict, InputDataDict, ForecastItemDict,
+    SummaryDict, MetadataDict, ResultDict, BatchItemDict, BatchResultDict,
+    GroupedResultDict, HorizonResultDict
+)
+from src.model_registry import model_registry, model_key as registry_model_key
+from src.rollup import has_ids, parse_days, rollup_store, rollup_user_id
+
+if TYPE_CHECKING:
+    # Prophet (and matplotlib behind it) is imported on first fit, not at startup
+    from prophet.forecaster import Prophet as ProphetType
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,26 +40,45 @@ logging.basicConfig(
 )
 logger: logging.Logger = logging.getLogger(__name__)
 
-# Type definitions
-ForecastMode = Literal["daily", "weekly", "monthly"]
-FilterType = Literal["category", "location", "type"]
-FrequencyType = Literal["D", "W", "MS"]
-
-# Data structure types
-TransactionDict = Dict[str, Union[str, float, int]]
-UserDataDict = Dict[str, Union[str, float, int, Dict[str, List[str]]]]
-DiningHallDict = Dict[str, Union[str, Dict[str, str], List[str], bool]]
-InputDataDict = Dict[str, Union[UserDataDict, List[TransactionDict], List[DiningHallDict]]]
-ForecastItemDict = Dict[str, Union[str, float]]
-SummaryDict = Dict[str, Union[str, float, int]]
-MetadataDict = Dict[str, Union[str, int, Dict[str, str]]]
-ResultDict = Dict[str, Union[List[ForecastItemDict], SummaryDict, MetadataDict]]
+
+# Forecast result cache (override via .env)
+FORECAST_CACHE_SIZE: int = int(os.getenv('FORECAST_CACHE_SIZE', '256'))
+FORECAST_CACHE_TTL: float = float(os.getenv('FORECAST_CACHE_TTL', '3600'))
+
+forecast_cache: LRUCache = LRUCache(
+    max_entries=FORECAST_CACHE_SIZE,
+    ttl_seconds=FORECAST_CACHE_TTL
+)
+
+# NumPy engine settings
+HOLT_ALPHA_GRID: np.ndarray = np.array([0.1, 0.2, 0.3, 0.5, 0.7])
+HOLT_BETA_GRID: np.ndarray = np.array([0.01, 0.05, 0.1, 0.2])
+HOLT_DAMPING: float = 0.9
+DOW_SHRINKAGE: float = 3.0  # pseudo-observations pulling weekday effects to zero
+
+# Prophet model settings (override per call with prophet_params, e.g. from benchmarks/backtest.py)
+PROPHET_DEFAULT_PARAMS: Dict[str, Any] = {
+    'daily_seasonality': True,
+    'weekly_seasonality': True,
+    'yearly_seasonality': False,  # Not enough data typically
+    'changepoint_prior_scale': 0.5  # Moderate flexibility
+}
+
+# Prophet interval strategies: posterior-predictive draws per predict (override via .env)
+FULL_UNCERTAINTY_SAMPLES: int = 1000  # Prophet's default
+REDUCED_UNCERTAINTY_SAMPLES: int = int(os.getenv('REDUCED_UNCERTAINTY_SAMPLES', '100'))
+
+# Engine auto-selection: Prophet only for long, dense histories
+AUTO_PROPHET_MIN_POINTS: int = 60
+AUTO_PROPHET_MIN_DENSITY: float = 0.5  # observed days / calendar days
 
 __all__ = [
     # Type aliases
     'ForecastMode',
     'FilterType',
     'FrequencyType',
+    'ForecastEngine',
+    'IntervalStrategy',
     'TransactionDict',
     'UserDataDict',
     'DiningHallDict',
@@ -50,11 +87,34 @@ __all__ = [
     'SummaryDict',
     'MetadataDict',
     'ResultDict',
+    'BatchItemDict',
+    'BatchResultDict',
+    'GroupedResultDict',
+    'HorizonResultDict',
+    # Cache and settings
+    'forecast_cache',
+    'PROPHET_DEFAULT_PARAMS',
     # Functions
     'load_data',
     'preprocess_data',
+    'preprocess_groups',
+    'load_series',
+    'load_groups',
+    'forecast_cache_key',
     'forecast_expenditure',
+    'forecast_expenditure_numpy',
+    'select_engine',
+    'series_model_key',
+    'forecast_series',
     'forecast_from_json',
+    'forecast_horizons',
+    'forecast_horizons_from_json',
+    'forecast_by_group',
+    'expand_batch_request',
+    'batch_item_label',
+    'forecast_batch_item',
+    'forecast_batch',
+    'warm_up',
 ]
 
 
@@ -105,6 +165,58 @@ def load_data(filepath: Union[str, Path]) -> InputDataDict:
         raise
 
 
+def _extract_columns(
+    transactions: List[TransactionDict],
+    field: Optional[str] = None
+) -> Tuple[np.ndarray, np.ndarray, Optional[List[Any]]]:
+    """
+    Pull only the fields we need out of transaction dicts into typed arrays
+    
+    Args:
+        transactions: Transaction dicts
+        field: Optional extra field (filter/group column) to extract
+        
+    Returns:
+        Tuple of (day numbers, amounts, extra field values or None)
+    """
+    days: np.ndarray = parse_days([t['date'] for t in transactions])
+    
+    # Missing amounts count as zero, matching a pandas groupby sum
+    amounts: np.ndarray = np.array([t.get('amount') for t in transactions], dtype=np.float64)
+    amounts = np.nan_to_num(amounts, nan=0.0)
+    
+    values: Optional[List[Any]] = None
+    if field is not None:
+        values = [t.get(field) for t in transactions]
+    
+    return days, amounts, values
+
+
+def _daily_series(days: np.ndarray, amounts: np.ndarray) -> pd.DataFrame:
+    """
+    Sum amounts per day with a bincount over day offsets
+    
+    Args:
+        days: Day numbers (one per transaction)
+        amounts: Transaction amounts
+        
+    Returns:
+        DataFrame with 'ds' and 'y', one row per day that had transactions, sorted
+    """
+    first_day: int = int(days.min())
+    offsets: np.ndarray = days - first_day
+    
+    totals: np.ndarray = np.bincount(offsets, weights=amounts)
+    counts: np.ndarray = np.bincount(offsets)
+    active: np.ndarray = np.flatnonzero(counts)
+    
+    daily_agg: pd.DataFrame = pd.DataFrame({
+        'ds': (active + first_day).astype('datetime64[D]').astype('datetime64[ns]'),
+        'y': totals[active]
+    })
+    return daily_agg
+
+
 def preprocess_data(
     data: InputDataDict,
     filter_type: Optional[FilterType] = None,
@@ -113,6 +225,10 @@ def preprocess_data(
     """
     Preprocess transaction data for Prophet modeling
     
+    Only 'date', 'amount' and the filter field are read from each transaction;
+    timestamps are parsed in one fixed-format pass and days are aggregated
+    with a vectorised bincount.
+    
     Args:
         data: Dictionary containing 'Transactions' list
         filter_type: Optional filter field (category/location/type)
@@ -134,47 +250,40 @@ def preprocess_data(
         transaction_count: int = len(transactions)
         logger.info(f"Processing {transaction_count} transactions")
         
-        # Convert to DataFrame
-        df: pd.DataFrame = pd.DataFrame(transactions)
+        filtering: bool = filter_type is not None and filter_value is not None
+        if filtering and not any(filter_type in t for t in transactions):
+            error_msg = f"Invalid filter_type: {filter_type}"
+            raise ValueError(error_msg)
         
-        # Parse timestamps to datetime
-        df['date'] = pd.to_datetime(df['date'], utc=True)
+        # Extract typed columns (and parse timestamps) in one pass
+        days: np.ndarray
+        amounts: np.ndarray
+        values: Optional[List[Any]]
+        days, amounts, values = _extract_columns(transactions, filter_type if filtering else None)
         
         # Apply filtering if specified
-        if filter_type is not None and filter_value is not None:
-            if filter_type not in df.columns:
-                error_msg = f"Invalid filter_type: {filter_type}"
-                raise ValueError(error_msg)
-            
-            original_count: int = len(df)
-            df = df[df[filter_type] == filter_value]
-            filtered_count: int = len(df)
+        if values is not None:
+            mask: np.ndarray = np.fromiter(
+                (value == filter_value for value in values), dtype=bool, count=transaction_count
+            )
+            days = days[mask]
+            amounts = amounts[mask]
+            filtered_count: int = int(mask.sum())
             
             logger.info(f"Filtered by {filter_type}={filter_value}: "
-                       f"{original_count} → {filtered_count} transactions")
+                       f"{transaction_count} → {filtered_count} transactions")
             
-            if df.empty:
+            if filtered_count == 0:
                 error_msg = f"No transactions match filter: {filter_type}={filter_value}"
                 raise ValueError(error_msg)
         
-        # Aggregate daily expenditure
-        daily_agg: pd.DataFrame = df.groupby(df['date'].dt.date).agg({
-            'amount': 'sum'
-        }).reset_index()
-        
-        # Rename columns for Prophet (requires 'ds' and 'y')
-        daily_agg.columns = ['ds', 'y']
-        
-        # Convert date back to datetime
-        daily_agg['ds'] = pd.to_datetime(daily_agg['ds'])
-        
-        # Sort by date
-        daily_agg = daily_agg.sort_values('ds').reset_index(drop=True)
+        # Aggregate daily expenditure into Prophet's 'ds'/'y' columns
+        daily_agg: pd.DataFrame = _daily_series(days, amounts)
         
         num_days: int = len(daily_agg)
-        min_date: pd.Timestamp = daily_agg['ds'].min()
-        max_date: pd.Timestamp = daily_agg['ds'].max()
-        total_expenditure: float = float(daily_agg['y'].sum())
+        min_date: pd.Timestamp = daily_agg['ds'].iloc[0]
+        max_date: pd.Timestamp = daily_agg['ds'].iloc[-1]
+        total_expenditure: float = float(amounts.sum())
         
         logger.info(f"Aggregated to {num_days} daily data points")
         logger.info(f"Date range: {min_date} to {max_date}")
@@ -187,19 +296,190 @@ def preprocess_data(
         raise
 
 
-def _calculate_trend(forecast_df: pd.DataFrame) -> str:
+def preprocess_groups(
+    data: InputDataDict,
+    group_by: FilterType
+) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """
+    Build the total series and one series per group value in a single pass
+    
+    Timestamps are parsed once; every (group, day) total comes from one
+    bincount over a combined group/day index.
+    
+    Args:
+        data: Dictionary containing 'Transactions' list
+        group_by: Field to split by (category/location/type)
+        
+    Returns:
+        Tuple of (total series, {group value: series}); every series has
+        'ds' and 'y' columns like preprocess_data's output
+        
+    Raises:
+        ValueError: If there are no transactions or group_by is not a field
+    """
+    try:
+        transactions: List[TransactionDict] = data.get('Transactions', [])
+        
+        if not transactions:
+            error_msg: str = "No transactions found in data"
+            raise ValueError(error_msg)
+        
+        if not any(group_by in t for t in transactions):
+            error_msg = f"Invalid group_by: {group_by}"
+            raise ValueError(error_msg)
+        
+        days: np.ndarray
+        amounts: np.ndarray
+        values: Optional[List[Any]]
+        days, amounts, values = _extract_columns(transactions, group_by)
+        
+        total: pd.DataFrame = _daily_series(days, amounts)
+        
+        # Transactions without a group value only count towards the total
+        present: np.ndarray = np.array([value is not None for value in values], dtype=bool)
+        group_labels: np.ndarray = np.array([str(value) for value in values], dtype=object)[present]
+        group_names: np.ndarray
+        group_index: np.ndarray
+        group_names, group_index = np.unique(group_labels, return_inverse=True)
+        
+        first_day: int = int(days.min())
+        num_days: int = int(days.max()) - first_day + 1
+        cell: np.ndarray = group_index * num_days + (days[present] - first_day)
+        cell_count: int = len(group_names) * num_days
+        
+        totals: np.ndarray = np.bincount(cell, weights=amounts[present], minlength=cell_count)
+        counts: np.ndarray = np.bincount(cell, minlength=cell_count)
+        totals = totals.reshape(len(group_names), num_days)
+        counts = counts.reshape(len(group_names), num_days)
+        
+        groups: Dict[str, pd.DataFrame] = {}
+        row: int
+        group_name: str
+        for row, group_name in enumerate(group_names.tolist()):
+            active: np.ndarray = np.flatnonzero(counts[row])
+            groups[group_name] = pd.DataFrame({
+                'ds': (active + first_day).astype('datetime64[D]').astype('datetime64[ns]'),
+                'y': totals[row, active]
+            })
+        
+        logger.info(f"Grouped {len(transactions)} transactions by {group_by}: "
+                    f"{len(groups)} groups, {len(total)} days")
+        
+        return total, groups
+        
+    except Exception as e:
+        logger.error(f"Grouped preprocessing failed: {e}")
+        raise
+
+
+def load_series(
+    data: InputDataDict,
+    filter_type: Optional[FilterType] = None,
+    filter_value: Optional[str] = None,
+    use_rollup: bool = True
+) -> pd.DataFrame:
+    """
+    Daily series for a payload, read from the user's rollup when possible
+    
+    Payloads with a UserData id whose transactions all have ids extend the
+    user's rollup in rollup_store (only unseen transactions are parsed) and
+    the series is read in the same step; a payload with no Transactions
+    reuses the user's existing rollup. Anonymous payloads, transactions
+    without ids (which can't be told apart from repeats) and histories that
+    drop or edit a counted transaction (a truncated backtest fold, say) go
+    through preprocess_data and leave the rollup as it is.
+    
+    Args:
+        data: Dictionary with UserData and Transactions
+        filter_type: Optional filter field (category/location/type)
+        filter_value: Optional filter value to match
+        use_rollup: Read through rollup_store (False forces a full rescan)
+        
+    Returns:
+        DataFrame with 'ds' (date) and 'y' (daily expenditure) columns
+        
+    Raises:
+        ValueError: If no transactions remain after filtering
+    """
+    user_id: Optional[str] = rollup_user_id(data) if use_rollup else None
+    transactions: List[TransactionDict] = data.get('Transactions', [])
+    if user_id is None or not has_ids(transactions):
+        return preprocess_data(data, filter_type, filter_value)
+    
+    filtering: bool = filter_type is not None and filter_value is not None
+    field: Optional[str] = filter_type if filtering else None
+    value: Optional[str] = filter_value if filtering else None
+    
+    df: Optional[pd.DataFrame]
+    if transactions:
+        df = rollup_store.sync_frame(user_id, transactions, field, value)
+        if df is None:
+            return preprocess_data(data, filter_type, filter_value)
+    else:
+        rollup: Any = rollup_store.get(user_id)
+        if rollup is None:
+            error_msg: str = "No transactions found in data"
+            raise ValueError(error_msg)
+        df = rollup.daily_frame(field, value)
+    
+    logger.info(f"Read {len(df)} daily data points from rollup for {user_id}")
+    return df
+
+
+def load_groups(
+    data: InputDataDict,
+    group_by: FilterType,
+    use_rollup: bool = True
+) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """
+    Total and per-group series for a payload, read from the user's rollup when possible
+    
+    Same rules as load_series; anonymous payloads go through preprocess_groups.
+    
+    Args:
+        data: Dictionary with UserData and Transactions
+        group_by: Field to split by (category/location/type)
+        use_rollup: Read through rollup_store (False forces a full rescan)
+        
+    Returns:
+        Tuple of (total series, {group value: series})
+    """
+    user_id: Optional[str] = rollup_user_id(data) if use_rollup else None
+    transactions: List[TransactionDict] = data.get('Transactions', [])
+    if user_id is None or not has_ids(transactions):
+        return preprocess_groups(data, group_by)
+    
+    if transactions:
+        frames: Optional[Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]] = rollup_store.sync_groups(
+            user_id, transactions, group_by
+        )
+        return preprocess_groups(data, group_by) if frames is None else frames
+    
+    rollup: Any = rollup_store.get(user_id)
+    if rollup is None:
+        error_msg: str = "No transactions found in data"
+        raise ValueError(error_msg)
+    
+    return rollup.group_frames(group_by)
+
+
+def _calculate_trend(yhat: np.ndarray) -> str:
     """
     Calculate overall trend direction from forecast
     
     Args:
-        forecast_df: Prophet forecast DataFrame
+        yhat: Predicted values in date order
         
     Returns:
         Trend description: 'increasing', 'decreasing', or 'stable'
     """
     # Compare first and last predicted values
-    first_val: float = float(forecast_df['yhat'].iloc[0])
-    last_val: float = float(forecast_df['yhat'].iloc[-1])
+    first_val: float = float(yhat[0])
+    last_val: float = float(yhat[-1])
+    
+    # A forecast clipped to zero at the start has no meaningful percentage change
+    if first_val == 0:
+        return "increasing" if last_val > 0 else "stable"
     
     change_pct: float = ((last_val - first_val) / first_val) * 100
     
@@ -234,10 +514,318 @@ def _determine_forecast_params(mode: ForecastMode) -> Tuple[int, FrequencyType]:
     return result
 
 
+def _validate_series(df: pd.DataFrame) -> None:
+    """
+    Check a series is usable by any forecasting engine
+    
+    Raises:
+        ValueError: If DataFrame is empty or lacks 'ds'/'y' columns
+    """
+    if df.empty:
+        error_msg: str = "Cannot forecast with empty DataFrame"
+        raise ValueError(error_msg)
+    
+    required_columns: set = {'ds', 'y'}
+    actual_columns: set = set(df.columns)
+    if not required_columns.issubset(actual_columns):
+        error_msg = "DataFrame must contain 'ds' and 'y' columns"
+        raise ValueError(error_msg)
+
+
+def _future_dates(last_date: pd.Timestamp, periods: int, freq: FrequencyType) -> pd.DatetimeIndex:
+    """
+    Future forecast dates, generated exactly like Prophet's make_future_dataframe
+    
+    Args:
+        last_date: Last historical date
+        periods: Number of future periods
+        freq: Pandas frequency string
+        
+    Returns:
+        DatetimeIndex of the next `periods` dates strictly after last_date
+    """
+    dates: pd.DatetimeIndex = pd.date_range(start=last_date, periods=periods + 1, freq=freq)
+    dates = dates[dates > last_date]
+    future: pd.DatetimeIndex = dates[:periods]
+    return future
+
+
+def _interval_label(width: float) -> str:
+    """Suffix used for an extra interval width, e.g. 0.8 -> '80'"""
+    return f"{width * 100:g}"
+
+
+def _validate_interval_options(
+    interval_strategy: str,
+    interval_widths: Tuple[float, ...]
+) -> None:
+    """
+    Check interval settings before any fitting work is done
+    
+    Raises:
+        ValueError: If the strategy is unknown or a width is outside (0, 1)
+    """
+    if interval_strategy not in ('full', 'reduced', 'analytic'):
+        error_msg: str = f"Unknown interval strategy: {interval_strategy}"
+        raise ValueError(error_msg)
+    
+    width: float
+    for width in interval_widths:
+        if not 0 < width < 1:
+            error_msg = f"Interval widths must be between 0 and 1, got {width}"
+            raise ValueError(error_msg)
+
+
+def _build_result(
+    df: pd.DataFrame,
+    future_forecast: pd.DataFrame,
+    mode: ForecastMode,
+    periods: int,
+    confidence_interval: float,
+    engine: str,
+    interval_widths: Tuple[float, ...] = ()
+) -> ResultDict:
+    """
+    Assemble the ResultDict shared by every forecasting engine
+    
+    Args:
+        df: Historical DataFrame with 'ds' and 'y' columns
+        future_forecast: Future rows with 'ds', 'yhat', 'yhat_lower', 'yhat_upper'
+            (plus 'yhat_lower_<label>'/'yhat_upper_<label>' per extra width)
+        mode: Forecast mode
+        periods: Number of forecast periods
+        confidence_interval: Width of uncertainty intervals
+        engine: Engine that produced the forecast (recorded in metadata)
+        interval_widths: Extra widths, added to each forecast item as
+            'lower_bound_<label>'/'upper_bound_<label>'
+        
+    Returns:
+        Dictionary with forecast, summary and metadata
+    """
+    # Ensure non-negative predictions
+    yhat: np.ndarray = np.clip(future_forecast['yhat'].to_numpy(dtype=np.float64), 0, None)
+    yhat_lower: np.ndarray = np.clip(future_forecast['yhat_lower'].to_numpy(dtype=np.float64), 0, None)
+    yhat_upper: np.ndarray = np.clip(future_forecast['yhat_upper'].to_numpy(dtype=np.float64), 0, None)
+    date_strs: np.ndarray = np.datetime_as_string(
+        future_forecast['ds'].to_numpy(dtype='datetime64[D]'), unit='D'
+    )
+    
+    # Build forecast list from the column arrays
+    forecast_list: List[ForecastItemDict] = [
+        {
+            'date': date_str,
+            'predicted_amount': round(predicted_amount, 2),
+            'lower_bound': round(lower_bound, 2),
+            'upper_bound': round(upper_bound, 2)
+        }
+        for date_str, predicted_amount, lower_bound, upper_bound in zip(
+            date_strs.tolist(), yhat.tolist(), yhat_lower.tolist(), yhat_upper.tolist()
+        )
+    ]
+    
+    width: float
+    for width in interval_widths:
+        label: str = _interval_label(width)
+        extra_lower: List[float] = np.clip(
+            future_forecast[f'yhat_lower_{label}'].to_numpy(dtype=np.float64), 0, None
+        ).tolist()
+        extra_upper: List[float] = np.clip(
+            future_forecast[f'yhat_upper_{label}'].to_numpy(dtype=np.float64), 0, None
+        ).tolist()
+        for item, lower_bound, upper_bound in zip(forecast_list, extra_lower, extra_upper):
+            item[f'lower_bound_{label}'] = round(lower_bound, 2)
+            item[f'upper_bound_{label}'] = round(upper_bound, 2)
+    
+    # Calculate summary statistics
+    total_forecasted: float = float(yhat.sum())
+    mean_expenditure: float = float(yhat.mean())
+    trend: str = _calculate_trend(yhat)
+    
+    # Calculate historical baseline for comparison
+    historical_mean: float = float(df['y'].mean())
+    forecast_vs_historical: float = ((mean_expenditure - historical_mean) / historical_mean) * 100
+    
+    confidence_pct: str = f"{int(confidence_interval * 100)}%"
+    change_str: str = f"{forecast_vs_historical:+.1f}%"
+    
+    summary: SummaryDict = {
+        'total_forecasted': round(total_forecasted, 2),
+        'mean_daily_expenditure': round(mean_expenditure, 2),
+        'trend': trend,
+        'forecast_periods': periods,
+        'mode': mode,
+        'confidence_interval': confidence_pct,
+        'historical_mean': round(historical_mean, 2),
+        'forecast_vs_historical_change': change_str
+    }
+    
+    logger.info(f"Forecast complete: ${total_forecasted:.2f} over {periods} {mode} periods")
+    logger.info(f"Trend: {trend}, Mean: ${mean_expenditure:.2f}/day")
+    
+    # Build metadata
+    now: datetime = datetime.now()
+    generated_at: str = now.isoformat()
+    historical_count: int = len(df)
+    start_date: str = df['ds'].min().strftime('%Y-%m-%d')
+    end_date: str = df['ds'].max().strftime('%Y-%m-%d')
+    
+    date_range: Dict[str, str] = {
+        'start': start_date,
+        'end': end_date
+    }
+    
+    metadata: MetadataDict = {
+        'forecast_generated_at': generated_at,
+        'historical_data_points': historical_count,
+        'historical_date_range': date_range,
+        'engine': engine
+    }
+    
+    # Build result
+    result: ResultDict = {
+        'forecast': forecast_list,
+        'summary': summary,
+        'metadata': metadata
+    }
+    
+    return result
+
+
+def _fit_prophet(
+    df: pd.DataFrame,
+    confidence_interval: float = 0.95,
+    model_key: Optional[str] = None,
+    prophet_params: Optional[Dict[str, Any]] = None
+) -> Tuple['ProphetType', bool]:
+    """
+    Fit a Prophet model, warm-starting from the registry when possible
+    
+    Args:
+        df: DataFrame with 'ds' (date) and 'y' (amount) columns
+        confidence_interval: Width of uncertainty intervals
+        model_key: Optional model_registry key (refitted model is saved back)
+        prophet_params: Overrides for PROPHET_DEFAULT_PARAMS; fits with
+            overrides never read from or write to the registry
+        
+    Returns:
+        Tuple of (fitted model, whether the fit was warm-started)
+    """
+    from prophet import Prophet
+    
+    if prophet_params:
+        model_key = None
+    
+    # Initialize Prophet model
+    model: ProphetType = Prophet(
+        interval_width=confidence_interval,
+        **{**PROPHET_DEFAULT_PARAMS, **(prophet_params or {})}
+    )
+    
+    # Suppress Prophet's verbose output
+    import logging as prophet_logging
+    prophet_logger: logging.Logger = prophet_logging.getLogger('prophet')
+    cmdstan_logger: logging.Logger = prophet_logging.getLogger('cmdstanpy')
+    prophet_logger.setLevel(prophet_logging.WARNING)
+    cmdstan_logger.setLevel(prophet_logging.WARNING)
+    
+    # Fit model (warm-started from the registry when we've seen this series before)
+    warm_start: Optional[Dict[str, Any]] = None
+    if model_key is not None:
+        warm_start = model_registry.warm_start_params(model_key)
+    
+    logger.info(f"Fitting Prophet model ({'warm' if warm_start else 'cold'} start)...")
+    if warm_start is not None:
+        model.fit(df, init=warm_start)
+    else:
+        model.fit(df)
+    
+    if model_key is not None:
+        try:
+            model_registry.save(model_key, model)
+        except OSError as e:
+            logger.warning(f"Could not persist model {model_key}: {e}")
+    
+    return model, warm_start is not None
+
+
+def _predict_prophet(
+    model: 'ProphetType',
+    future_dates: pd.DatetimeIndex,
+    interval_strategy: IntervalStrategy = 'full',
+    interval_widths: Tuple[float, ...] = ()
+) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """
+    Predict a fitted Prophet model at the given future dates only
+    
+    The point forecast is computed without Prophet's built-in sampling, then
+    intervals are added according to the strategy:
+        full:     FULL_UNCERTAINTY_SAMPLES posterior-predictive draws (Prophet's default)
+        reduced:  REDUCED_UNCERTAINTY_SAMPLES draws
+        analytic: no draws; normal intervals from the fitted residual scale
+                  (sigma_obs), ignoring trend uncertainty
+    Every width (model.interval_width plus interval_widths) is read off the
+    same set of draws.
+    
+    Args:
+        model: Fitted Prophet model
+        future_dates: Dates to predict
+        interval_strategy: 'full', 'reduced' or 'analytic'
+        interval_widths: Extra widths, returned as 'yhat_lower_<label>'/'yhat_upper_<label>'
+        
+    Returns:
+        Tuple of (DataFrame with 'ds', 'yhat', 'yhat_lower', 'yhat_upper',
+        seconds spent per stage: 'predict' and 'intervals')
+    """
+    future: pd.DataFrame = pd.DataFrame({'ds': future_dates})
+    timings: Dict[str, float] = {}
+    
+    started: float = time.perf_counter()
+    model.uncertainty_samples = 0
+    point_forecast: pd.DataFrame = model.predict(future)
+    yhat: np.ndarray = point_forecast['yhat'].to_numpy(dtype=np.float64)
+    timings['predict'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    widths: List[Tuple[str, float]] = [('', model.interval_width)] + [
+        (f'_{_interval_label(width)}', width) for width in interval_widths
+    ]
+    columns: Dict[str, Any] = {'ds': future_dates, 'yhat': yhat}
+    
+    suffix: str
+    width: float
+    if interval_strategy == 'analytic':
+        sigma: float = float(model.params['sigma_obs'][0][0]) * model.y_scale
+        for suffix, width in widths:
+            z_score: float = NormalDist().inv_cdf(0.5 + width / 2)
+            columns[f'yhat_lower{suffix}'] = yhat - z_score * sigma
+            columns[f'yhat_upper{suffix}'] = yhat + z_score * sigma
+    else:
+        model.uncertainty_samples = (
+            REDUCED_UNCERTAINTY_SAMPLES if interval_strategy == 'reduced' else FULL_UNCERTAINTY_SAMPLES
+        )
+        samples: np.ndarray = model.predictive_samples(future)['yhat']
+        for suffix, width in widths:
+            columns[f'yhat_lower{suffix}'] = np.nanpercentile(samples, 100 * (1 - width) / 2, axis=1)
+            columns[f'yhat_upper{suffix}'] = np.nanpercentile(samples, 100 * (1 + width) / 2, axis=1)
+    timings['intervals'] = time.perf_counter() - started
+    
+    future_forecast: pd.DataFrame = pd.DataFrame(columns)
+    return future_forecast, timings
+
+
+def _timings_ms(timings: Dict[str, float]) -> Dict[str, float]:
+    """Stage timings in seconds -> rounded milliseconds for metadata"""
+    return {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}
+
+
 def forecast_expenditure(
     df: pd.DataFrame,
     mode: ForecastMode = 'daily',
-    confidence_interval: float = 0.95
+    confidence_interval: float = 0.95,
+    model_key: Optional[str] = None,
+    interval_strategy: IntervalStrategy = 'full',
+    interval_widths: Tuple[float, ...] = (),
+    prophet_params: Optional[Dict[str, Any]] = None
 ) -> ResultDict:
     """
     Forecast future expenditure using Prophet
@@ -246,12 +834,19 @@ def forecast_expenditure(
         df: DataFrame with 'ds' (date) and 'y' (amount) columns
         mode: Forecast mode - 'daily', 'weekly', or 'monthly'
         confidence_interval: Width of uncertainty intervals (default 0.95)
+        model_key: Optional model_registry key; the fit is warm-started from
+            the stored model and the refitted model is saved back
+        interval_strategy: 'full' (1000 draws), 'reduced' (fewer draws) or
+            'analytic' (no draws) - trades interval fidelity for latency
+        interval_widths: Extra interval widths computed from the same draws
+        prophet_params: Overrides for PROPHET_DEFAULT_PARAMS (tuning/backtests)
         
     Returns:
-        Dictionary with forecast and summary statistics
+        Dictionary with forecast and summary statistics; metadata records the
+        interval strategy and per-stage timings ('timings_ms')
         
     Raises:
-        ValueError: If DataFrame is invalid
+        ValueError: If DataFrame or interval options are invalid
         
     Example:
         >>> result: ResultDict = forecast_expenditure(df, mode='weekly')
@@ -262,155 +857,364 @@ def forecast_expenditure(
         logger.info(f"Starting {mode} forecast with {num_rows} historical data points")
         
         # Validate input
-        if df.empty:
-            error_msg: str = "Cannot forecast with empty DataFrame"
-            raise ValueError(error_msg)
-        
-        required_columns: set = {'ds', 'y'}
-        actual_columns: set = set(df.columns)
-        if not required_columns.issubset(actual_columns):
-            error_msg = "DataFrame must contain 'ds' and 'y' columns"
-            raise ValueError(error_msg)
-        
-        # Initialize Prophet model
-        model: ProphetType = Prophet(
-            interval_width=confidence_interval,
-            daily_seasonality=True,
-            weekly_seasonality=True,
-            yearly_seasonality=False,  # Not enough data typically
-            changepoint_prior_scale=0.5  # Moderate flexibility
-        )
-        
-        # Suppress Prophet's verbose output
-        import logging as prophet_logging
-        prophet_logger: logging.Logger = prophet_logging.getLogger('prophet')
-        cmdstan_logger: logging.Logger = prophet_logging.getLogger('cmdstanpy')
-        prophet_logger.setLevel(prophet_logging.WARNING)
-        cmdstan_logger.setLevel(prophet_logging.WARNING)
+        _validate_series(df)
+        _validate_interval_options(interval_strategy, interval_widths)
         
-        # Fit model
-        logger.info("Fitting Prophet model...")
-        model.fit(df)
+        fit_started: float = time.perf_counter()
+        model: ProphetType
+        warm_start: bool
+        model, warm_start = _fit_prophet(df, confidence_interval, model_key, prophet_params)
+        fit_seconds: float = time.perf_counter() - fit_started
         
         # Determine forecast parameters
         periods: int
         freq: FrequencyType
         periods, freq = _determine_forecast_params(mode)
         
-        # Create future dataframe
-        future: pd.DataFrame = model.make_future_dataframe(periods=periods, freq=freq)
-        
-        # Generate forecast
+        # Generate forecast for future dates only
         logger.info(f"Generating forecast for next {periods} {mode} periods...")
-        forecast: pd.DataFrame = model.predict(future)
-        
-        # Extract future predictions only
         last_historical_date: pd.Timestamp = df['ds'].max()
-        future_forecast: pd.DataFrame = forecast[forecast['ds'] > last_historical_date].copy()
-        
-        # Ensure non-negative predictions
-        future_forecast['yhat'] = future_forecast['yhat'].clip(lower=0)
-        future_forecast['yhat_lower'] = future_forecast['yhat_lower'].clip(lower=0)
-        future_forecast['yhat_upper'] = future_forecast['yhat_upper'].clip(lower=0)
-        
-        # Build forecast list
-        forecast_list: List[ForecastItemDict] = []
-        row: pd.Series
-        for _, row in future_forecast.iterrows():
-            date_str: str = row['ds'].strftime('%Y-%m-%d')
-            predicted_amount: float = round(float(row['yhat']), 2)
-            lower_bound: float = round(float(row['yhat_lower']), 2)
-            upper_bound: float = round(float(row['yhat_upper']), 2)
-            
-            forecast_item: ForecastItemDict = {
-                'date': date_str,
-                'predicted_amount': predicted_amount,
-                'lower_bound': lower_bound,
-                'upper_bound': upper_bound
-            }
-            forecast_list.append(forecast_item)
-        
-        # Calculate summary statistics
-        total_forecasted: float = float(future_forecast['yhat'].sum())
-        mean_expenditure: float = float(future_forecast['yhat'].mean())
-        trend: str = _calculate_trend(future_forecast)
-        
-        # Calculate historical baseline for comparison
-        historical_mean: float = float(df['y'].mean())
-        forecast_vs_historical: float = ((mean_expenditure - historical_mean) / historical_mean) * 100
-        
-        confidence_pct: str = f"{int(confidence_interval * 100)}%"
-        change_str: str = f"{forecast_vs_historical:+.1f}%"
-        
-        summary: SummaryDict = {
-            'total_forecasted': round(total_forecasted, 2),
-            'mean_daily_expenditure': round(mean_expenditure, 2),
-            'trend': trend,
-            'forecast_periods': periods,
-            'mode': mode,
-            'confidence_interval': confidence_pct,
-            'historical_mean': round(historical_mean, 2),
-            'forecast_vs_historical_change': change_str
-        }
+        future_dates: pd.DatetimeIndex = _future_dates(last_historical_date, periods, freq)
+        future_forecast: pd.DataFrame
+        timings: Dict[str, float]
+        future_forecast, timings = _predict_prophet(model, future_dates, interval_strategy, interval_widths)
         
-        logger.info(f"Forecast complete: ${total_forecasted:.2f} over {periods} {mode} periods")
-        logger.info(f"Trend: {trend}, Mean: ${mean_expenditure:.2f}/day")
+        result: ResultDict = _build_result(
+            df, future_forecast, mode, periods, confidence_interval, 'prophet', interval_widths
+        )
+        metadata: MetadataDict = result['metadata']  # type: ignore
+        metadata['warm_start'] = warm_start
+        metadata['interval_strategy'] = interval_strategy
+        metadata['timings_ms'] = _timings_ms({'fit': fit_seconds, **timings})
+        return result
         
-        # Build metadata
-        now: datetime = datetime.now()
-        generated_at: str = now.isoformat()
-        historical_count: int = len(df)
-        start_date: str = df['ds'].min().strftime('%Y-%m-%d')
-        end_date: str = df['ds'].max().strftime('%Y-%m-%d')
+    except Exception as e:
+        logger.error(f"Forecasting failed: {e}", exc_info=True)
+        raise
+
+
+def _holt_damped_fit(z: np.ndarray) -> Dict[str, Any]:
+    """
+    Fit a damped-trend Holt model, searching the smoothing grid in one vectorised pass
+    
+    Every (alpha, beta) combination is run side by side as one NumPy vector, so
+    the only Python loop is over time steps.
+    
+    Args:
+        z: Deseasonalised observations in time order
         
-        date_range: Dict[str, str] = {
-            'start': start_date,
-            'end': end_date
-        }
+    Returns:
+        Dict with the chosen 'alpha', 'beta', final 'level' and 'trend', and
+        'sigma' (RMSE of one-step-ahead errors)
+    """
+    alphas: np.ndarray
+    betas: np.ndarray
+    alphas, betas = np.meshgrid(HOLT_ALPHA_GRID, HOLT_BETA_GRID)
+    alphas = alphas.ravel()
+    betas = betas.ravel()
+    phi: float = HOLT_DAMPING
+    
+    level: np.ndarray = np.full(alphas.shape, z[0])
+    trend: np.ndarray = np.zeros(alphas.shape)
+    sse: np.ndarray = np.zeros(alphas.shape)
+    
+    value: float
+    for value in z[1:]:
+        one_step: np.ndarray = level + phi * trend
+        error: np.ndarray = value - one_step
+        sse += error * error
+        new_level: np.ndarray = one_step + alphas * error
+        trend = phi * trend + alphas * betas * error
+        level = new_level
+    
+    best: int = int(np.argmin(sse))
+    steps: int = max(len(z) - 1, 1)
+    
+    fit: Dict[str, Any] = {
+        'alpha': float(alphas[best]),
+        'beta': float(betas[best]),
+        'level': float(level[best]),
+        'trend': float(trend[best]),
+        'sigma': float(np.sqrt(sse[best] / steps))
+    }
+    return fit
+
+
+def _fit_numpy(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Fit the NumPy engine: shrunk day-of-week effects plus a damped Holt model
+    
+    Args:
+        df: DataFrame with 'ds' (date) and 'y' (amount) columns
         
-        metadata: MetadataDict = {
-            'forecast_generated_at': generated_at,
-            'historical_data_points': historical_count,
-            'historical_date_range': date_range
-        }
+    Returns:
+        Model state consumed by _predict_numpy
+    """
+    history: pd.DataFrame = df.sort_values('ds')
+    y: np.ndarray = history['y'].to_numpy(dtype=np.float64)
+    day_index: np.ndarray = history['ds'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    weekdays: np.ndarray = history['ds'].dt.dayofweek.to_numpy()
+    
+    # Day-of-week effects, shrunk by how often each weekday was observed
+    overall_mean: float = float(y.mean())
+    weekday_counts: np.ndarray = np.bincount(weekdays, minlength=7).astype(np.float64)
+    weekday_sums: np.ndarray = np.bincount(weekdays, weights=y, minlength=7)
+    weekday_means: np.ndarray = np.divide(
+        weekday_sums, weekday_counts,
+        out=np.full(7, overall_mean), where=weekday_counts > 0
+    )
+    shrinkage: np.ndarray = weekday_counts / (weekday_counts + DOW_SHRINKAGE)
+    dow_effect: np.ndarray = (weekday_means - overall_mean) * shrinkage
+    
+    # Holt model on the deseasonalised observations
+    z: np.ndarray = y - dow_effect[weekdays]
+    state: Dict[str, Any] = _holt_damped_fit(z)
+    
+    # Observations are irregular; measure horizons in typical gaps between them
+    gaps: np.ndarray = np.diff(day_index)
+    typical_gap: float = float(np.median(gaps)) if len(gaps) else 1.0
+    
+    if len(y) < 2:
+        state['sigma'] = abs(overall_mean) * 0.25
+    
+    state['dow_effect'] = dow_effect
+    state['typical_gap'] = max(typical_gap, 1.0)
+    state['last_day'] = int(day_index[-1])
+    return state
+
+
+def _predict_numpy(
+    state: Dict[str, Any],
+    future_dates: pd.DatetimeIndex,
+    confidence_interval: float = 0.95,
+    interval_widths: Tuple[float, ...] = ()
+) -> pd.DataFrame:
+    """
+    Predict the NumPy engine at future dates with analytic ETS(A,Ad,N) intervals
+    
+    Args:
+        state: Output of _fit_numpy
+        future_dates: Dates to predict
+        confidence_interval: Width of uncertainty intervals
+        interval_widths: Extra widths, returned as 'yhat_lower_<label>'/'yhat_upper_<label>'
         
-        # Build result
-        result: ResultDict = {
-            'forecast': forecast_list,
-            'summary': summary,
-            'metadata': metadata
-        }
+    Returns:
+        DataFrame with 'ds', 'yhat', 'yhat_lower', 'yhat_upper'
+    """
+    future_day_index: np.ndarray = future_dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+    horizon_steps: np.ndarray = np.maximum((future_day_index - state['last_day']) / state['typical_gap'], 1.0)
+    
+    # Damped trend contribution: sum_{i=1..h} phi^i
+    phi: float = HOLT_DAMPING
+    damped_sum: np.ndarray = phi * (1 - phi ** horizon_steps) / (1 - phi)
+    future_weekdays: np.ndarray = future_dates.dayofweek.to_numpy()
+    yhat: np.ndarray = state['level'] + damped_sum * state['trend'] + state['dow_effect'][future_weekdays]
+    
+    # Analytic interval: var_h = sigma^2 * (1 + sum_{j<h} c_j^2), c_j = alpha * (1 + beta * phi_sum_j)
+    max_steps: int = int(np.ceil(horizon_steps.max()))
+    j: np.ndarray = np.arange(1, max_steps)
+    c_j: np.ndarray = state['alpha'] * (1 + state['beta'] * phi * (1 - phi ** j) / (1 - phi))
+    cumulative: np.ndarray = np.concatenate([[0.0], np.cumsum(c_j ** 2)])
+    step_index: np.ndarray = np.ceil(horizon_steps).astype(np.int64) - 1
+    std_h: np.ndarray = state['sigma'] * np.sqrt(1 + cumulative[step_index])
+    
+    columns: Dict[str, Any] = {'ds': future_dates, 'yhat': yhat}
+    widths: List[Tuple[str, float]] = [('', confidence_interval)] + [
+        (f'_{_interval_label(width)}', width) for width in interval_widths
+    ]
+    suffix: str
+    width: float
+    for suffix, width in widths:
+        z_score: float = NormalDist().inv_cdf(0.5 + width / 2)
+        columns[f'yhat_lower{suffix}'] = yhat - z_score * std_h
+        columns[f'yhat_upper{suffix}'] = yhat + z_score * std_h
+    
+    future_forecast: pd.DataFrame = pd.DataFrame(columns)
+    return future_forecast
+
+
+def forecast_expenditure_numpy(
+    df: pd.DataFrame,
+    mode: ForecastMode = 'daily',
+    confidence_interval: float = 0.95,
+    interval_widths: Tuple[float, ...] = ()
+) -> ResultDict:
+    """
+    Forecast future expenditure with a lightweight NumPy model
+    
+    Day-of-week effects (shrunk towards zero for sparsely observed weekdays)
+    plus a damped-trend Holt model on the deseasonalised series, with analytic
+    ETS(A,Ad,N) prediction intervals. Returns the same shape as
+    forecast_expenditure in milliseconds, which suits short histories.
+    
+    Args:
+        df: DataFrame with 'ds' (date) and 'y' (amount) columns
+        mode: Forecast mode - 'daily', 'weekly', or 'monthly'
+        confidence_interval: Width of uncertainty intervals (default 0.95)
+        interval_widths: Extra interval widths (intervals are always analytic)
+        
+    Returns:
+        Dictionary with forecast and summary statistics
+        
+    Raises:
+        ValueError: If DataFrame or interval widths are invalid
+    """
+    try:
+        num_rows: int = len(df)
+        logger.info(f"Starting {mode} NumPy forecast with {num_rows} historical data points")
+        
+        _validate_series(df)
+        _validate_interval_options('analytic', interval_widths)
         
+        fit_started: float = time.perf_counter()
+        state: Dict[str, Any] = _fit_numpy(df)
+        fit_seconds: float = time.perf_counter() - fit_started
+        
+        periods: int
+        freq: FrequencyType
+        periods, freq = _determine_forecast_params(mode)
+        last_historical_date: pd.Timestamp = df['ds'].max()
+        future_dates: pd.DatetimeIndex = _future_dates(last_historical_date, periods, freq)
+        predict_started: float = time.perf_counter()
+        future_forecast: pd.DataFrame = _predict_numpy(state, future_dates, confidence_interval, interval_widths)
+        predict_seconds: float = time.perf_counter() - predict_started
+        
+        result: ResultDict = _build_result(
+            df, future_forecast, mode, periods, confidence_interval, 'numpy', interval_widths
+        )
+        metadata: MetadataDict = result['metadata']  # type: ignore
+        metadata['interval_strategy'] = 'analytic'
+        metadata['timings_ms'] = _timings_ms({'fit': fit_seconds, 'predict': predict_seconds})
         return result
         
     except Exception as e:
-        logger.error(f"Forecasting failed: {e}", exc_info=True)
+        logger.error(f"NumPy forecasting failed: {e}", exc_info=True)
         raise
 
 
-def forecast_from_json(
-    data: InputDataDict,
+def select_engine(df: pd.DataFrame) -> Literal['prophet', 'numpy']:
+    """
+    Pick the cheapest engine that is still appropriate for a series
+    
+    Prophet only adds value once there is enough history, densely enough
+    observed, for its changepoints and seasonalities to be identifiable.
+    
+    Args:
+        df: DataFrame with 'ds' and 'y' columns
+        
+    Returns:
+        'prophet' for long, dense histories, otherwise 'numpy'
+    """
+    num_points: int = len(df)
+    if num_points == 0:
+        return 'numpy'
+    
+    span_days: int = int((df['ds'].max() - df['ds'].min()).days) + 1
+    density: float = num_points / span_days
+    
+    if num_points >= AUTO_PROPHET_MIN_POINTS and density >= AUTO_PROPHET_MIN_DENSITY:
+        return 'prophet'
+    return 'numpy'
+
+
+def forecast_cache_key(
+    df: pd.DataFrame,
+    mode: ForecastMode,
+    filter_type: Optional[FilterType] = None,
+    filter_value: Optional[str] = None,
+    confidence_interval: float = 0.95,
+    engine: str = 'prophet',
+    interval_strategy: IntervalStrategy = 'full',
+    interval_widths: Tuple[float, ...] = (),
+    prophet_params: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Stable content hash of an aggregated series plus forecast settings
+    
+    Two requests with the same daily totals (regardless of transaction order,
+    ids or intra-day timestamps) map to the same key.
+    
+    Args:
+        df: DataFrame with 'ds' and 'y' columns (output of preprocess_data)
+        mode: Forecast mode
+        filter_type: Optional filter field
+        filter_value: Optional filter value
+        confidence_interval: Width of uncertainty intervals
+        engine: Resolved forecasting engine
+        interval_strategy: Prophet interval strategy
+        interval_widths: Extra interval widths
+        prophet_params: Prophet setting overrides
+        
+    Returns:
+        Hex digest usable as a cache key
+    """
+    digest: Any = hashlib.sha256()
+    
+    ds_values: np.ndarray = df['ds'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    # Round to cents so float summation order doesn't change the key
+    y_values: np.ndarray = np.round(df['y'].to_numpy(dtype=np.float64), 2)
+    digest.update(ds_values.tobytes())
+    digest.update(y_values.tobytes())
+    
+    widths: str = ",".join(f"{width:.6f}" for width in interval_widths)
+    settings: str = (
+        f"{mode}|{filter_type}|{filter_value}|{confidence_interval:.6f}|{engine}|{interval_strategy}|{widths}"
+    )
+    digest.update(settings.encode('utf-8'))
+    if prophet_params:
+        digest.update(json.dumps(prophet_params, sort_keys=True, default=str).encode('utf-8'))
+    
+    key: str = digest.hexdigest()
+    return key
+
+
+def forecast_series(
+    df: pd.DataFrame,
     mode: ForecastMode = 'daily',
+    confidence_interval: float = 0.95,
     filter_type: Optional[FilterType] = None,
-    filter_value: Optional[str] = None
+    filter_value: Optional[str] = None,
+    engine: ForecastEngine = 'auto',
+    model_key: Optional[str] = None,
+    interval_strategy: IntervalStrategy = 'full',
+    interval_widths: Tuple[float, ...] = (),
+    prophet_params: Optional[Dict[str, Any]] = None
 ) -> ResultDict:
     """
-    End-to-end forecasting from JSON data
+    Forecast an already-aggregated series and tag the result with its filter
+    
+    This is the unit of work the forecast pool runs; preprocessing and cache
+    lookups stay with the caller.
     
     Args:
-        data: Dictionary with UserData and Transactions
+        df: DataFrame with 'ds' and 'y' columns
         mode: Forecast mode (daily/weekly/monthly)
-        filter_type: Optional filter field
-        filter_value: Optional filter value
+        confidence_interval: Width of uncertainty intervals
+        filter_type: Optional filter field (recorded in metadata)
+        filter_value: Optional filter value (recorded in metadata)
+        engine: 'prophet', 'numpy', or 'auto' to choose with select_engine
+        model_key: Optional model_registry key for Prophet warm starts
+        interval_strategy: Prophet interval strategy ('full', 'reduced', 'analytic')
+        interval_widths: Extra interval widths
+        prophet_params: Overrides for PROPHET_DEFAULT_PARAMS
         
     Returns:
         Forecast result dictionary
     """
-    # Preprocess data
-    df: pd.DataFrame = preprocess_data(data, filter_type, filter_value)
+    if engine == 'auto':
+        engine = select_engine(df)
     
     # Generate forecast
-    result: ResultDict = forecast_expenditure(df, mode)
+    result: ResultDict
+    if engine == 'numpy':
+        result = forecast_expenditure_numpy(df, mode, confidence_interval, interval_widths)
+    elif engine == 'prophet':
+        result = forecast_expenditure(
+            df, mode, confidence_interval, model_key, interval_strategy, interval_widths, prophet_params
+        )
+    else:
+        error_msg: str = f"Unknown forecast engine: {engine}"
+        raise ValueError(error_msg)
     
     # Add filter info to metadata if applied
     if filter_type is not None and filter_value is not None:
@@ -424,6 +1228,562 @@ def forecast_from_json(
     return result
 
 
+def series_model_key(
+    data: InputDataDict,
+    filter_type: Optional[FilterType] = None,
+    filter_value: Optional[str] = None
+) -> Optional[str]:
+    """
+    Model registry key for a user's (optionally filtered) series
+    
+    Args:
+        data: Dictionary with UserData
+        filter_type: Optional filter field
+        filter_value: Optional filter value
+        
+    Returns:
+        Registry key, or None if the payload doesn't identify a user
+    """
+    user_data: Any = data.get('UserData') or {}
+    user_id: Any = user_data.get('id') or user_data.get('name')
+    if not user_id:
+        return None
+    
+    key: str = registry_model_key(str(user_id), filter_type, filter_value)
+    return key
+
+
+def forecast_from_json(
+    data: InputDataDict,
+    mode: ForecastMode = 'daily',
+    filter_type: Optional[FilterType] = None,
+    filter_value: Optional[str] = None,
+    confidence_interval: float = 0.95,
+    use_cache: bool = True,
+    engine: ForecastEngine = 'auto',
+    use_registry: bool = True,
+    interval_strategy: IntervalStrategy = 'full',
+    interval_widths: Tuple[float, ...] = (),
+    prophet_params: Optional[Dict[str, Any]] = None
+) -> ResultDict:
+    """
+    End-to-end forecasting from JSON data
+    
+    Args:
+        data: Dictionary with UserData and Transactions
+        mode: Forecast mode (daily/weekly/monthly)
+        filter_type: Optional filter field
+        filter_value: Optional filter value
+        confidence_interval: Width of uncertainty intervals
+        use_cache: Serve repeated forecasts of unchanged data from forecast_cache
+        engine: 'prophet', 'numpy', or 'auto' to pick by history length/sparsity
+        use_registry: Warm-start Prophet from (and save to) the model registry
+        interval_strategy: Prophet interval strategy ('full', 'reduced', 'analytic')
+        interval_widths: Extra interval widths computed from the same draws
+        prophet_params: Overrides for PROPHET_DEFAULT_PARAMS (tuning/backtests)
+        
+    Returns:
+        Forecast result dictionary
+    """
+    # Daily series (from the user's rollup when the payload identifies one)
+    df: pd.DataFrame = load_series(data, filter_type, filter_value)
+    
+    if engine == 'auto':
+        engine = select_engine(df)
+    
+    cache_key: Optional[str] = None
+    if use_cache:
+        cache_key = forecast_cache_key(
+            df, mode, filter_type, filter_value, confidence_interval, engine, interval_strategy, interval_widths,
+            prophet_params
+        )
+        cached: Optional[ResultDict] = forecast_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Forecast cache hit ({mode}, {len(df)} data points)")
+            return copy.deepcopy(cached)
+    
+    # Generate forecast
+    model_key: Optional[str] = series_model_key(data, filter_type, filter_value) if use_registry else None
+    result: ResultDict = forecast_series(
+        df, mode, confidence_interval, filter_type, filter_value, engine, model_key,
+        interval_strategy, interval_widths, prophet_params
+    )
+    
+    if cache_key is not None:
+        forecast_cache.put(cache_key, copy.deepcopy(result))
+    
+    return result
+
+
+def forecast_horizons(
+    df: pd.DataFrame,
+    modes: Tuple[ForecastMode, ...] = ('daily', 'weekly', 'monthly'),
+    confidence_interval: float = 0.95,
+    engine: ForecastEngine = 'auto',
+    model_key: Optional[str] = None,
+    filter_type: Optional[FilterType] = None,
+    filter_value: Optional[str] = None,
+    interval_strategy: IntervalStrategy = 'full',
+    interval_widths: Tuple[float, ...] = ()
+) -> HorizonResultDict:
+    """
+    Fit once, then forecast every requested mode from the same model
+    
+    The future dates of all modes are predicted in a single call and split per
+    mode, so the daily/weekly/monthly views cost one fit and one predict.
+    
+    Args:
+        df: DataFrame with 'ds' (date) and 'y' (amount) columns
+        modes: Forecast modes to produce
+        confidence_interval: Width of uncertainty intervals
+        engine: 'prophet', 'numpy', or 'auto' to choose with select_engine
+        model_key: Optional model_registry key for Prophet warm starts
+        filter_type: Optional filter field (recorded in metadata)
+        filter_value: Optional filter value (recorded in metadata)
+        interval_strategy: Prophet interval strategy ('full', 'reduced', 'analytic')
+        interval_widths: Extra interval widths computed from the same draws
+        
+    Returns:
+        Dictionary mapping each mode to its ResultDict
+        
+    Example:
+        >>> views: HorizonResultDict = forecast_horizons(df)
+        >>> views['weekly']['summary']['total_forecasted']
+    """
+    try:
+        logger.info(f"Starting multi-horizon forecast {list(modes)} with {len(df)} historical data points")
+        
+        _validate_series(df)
+        _validate_interval_options(interval_strategy, interval_widths)
+        
+        if engine == 'auto':
+            engine = select_engine(df)
+        
+        last_historical_date: pd.Timestamp = df['ds'].max()
+        mode_params: Dict[ForecastMode, Tuple[int, pd.DatetimeIndex]] = {}
+        mode: ForecastMode
+        for mode in modes:
+            periods: int
+            freq: FrequencyType
+            periods, freq = _determine_forecast_params(mode)
+            mode_params[mode] = (periods, _future_dates(last_historical_date, periods, freq))
+        
+        all_dates: pd.DatetimeIndex = pd.DatetimeIndex(
+            sorted(set().union(*[dates for _, dates in mode_params.values()]))
+        )
+        
+        # One fit, one predict over the union of every mode's dates
+        warm_start: Optional[bool] = None
+        strategy: str = interval_strategy
+        timings: Dict[str, float] = {}
+        combined: pd.DataFrame
+        fit_started: float = time.perf_counter()
+        if engine == 'prophet':
+            model: ProphetType
+            model, warm_start = _fit_prophet(df, confidence_interval, model_key)
+            timings['fit'] = time.perf_counter() - fit_started
+            predict_timings: Dict[str, float]
+            combined, predict_timings = _predict_prophet(model, all_dates, interval_strategy, interval_widths)
+            timings.update(predict_timings)
+        elif engine == 'numpy':
+            state: Dict[str, Any] = _fit_numpy(df)
+            timings['fit'] = time.perf_counter() - fit_started
+            predict_started: float = time.perf_counter()
+            combined = _predict_numpy(state, all_dates, confidence_interval, interval_widths)
+            timings['predict'] = time.perf_counter() - predict_started
+            strategy = 'analytic'
+        else:
+            error_msg: str = f"Unknown forecast engine: {engine}"
+            raise ValueError(error_msg)
+        
+        results: HorizonResultDict = {}
+        for mode, (periods, dates) in mode_params.items():
+            future_forecast: pd.DataFrame = combined[combined['ds'].isin(dates)]
+            result: ResultDict = _build_result(
+                df, future_forecast, mode, periods, confidence_interval, engine, interval_widths
+            )
+            metadata: MetadataDict = result['metadata']  # type: ignore
+            if warm_start is not None:
+                metadata['warm_start'] = warm_start
+            metadata['interval_strategy'] = strategy
+            metadata['timings_ms'] = _timings_ms(timings)
+            if filter_type is not None and filter_value is not None:
+                metadata['filter'] = {'type': filter_type, 'value': filter_value}
+            results[mode] = result
+        
+        return results
+        
+    except Exception as e:
+        logger.error(f"Multi-horizon forecasting failed: {e}", exc_info=True)
+        raise
+
+
+def forecast_horizons_from_json(
+    data: InputDataDict,
+    modes: Tuple[ForecastMode, ...] = ('daily', 'weekly', 'monthly'),
+    filter_type: Optional[FilterType] = None,
+    filter_value: Optional[str] = None,
+    confidence_interval: float = 0.95,
+    engine: ForecastEngine = 'auto',
+    use_cache: bool = True,
+    use_registry: bool = True,
+    interval_strategy: IntervalStrategy = 'full',
+    interval_widths: Tuple[float, ...] = ()
+) -> HorizonResultDict:
+    """
+    End-to-end multi-horizon forecasting from JSON data
+    
+    Each mode's result is also written to forecast_cache, so later single-mode
+    requests for the same data are cache hits (and vice versa).
+    
+    Args:
+        data: Dictionary with UserData and Transactions
+        modes: Forecast modes to produce
+        filter_type: Optional filter field
+        filter_value: Optional filter value
+        confidence_interval: Width of uncertainty intervals
+        engine: 'prophet', 'numpy', or 'auto'
+        use_cache: Read/write forecast_cache
+        use_registry: Warm-start Prophet from (and save to) the model registry
+        interval_strategy: Prophet interval strategy ('full', 'reduced', 'analytic')
+        interval_widths: Extra interval widths computed from the same draws
+        
+    Returns:
+        Dictionary mapping each mode to its ResultDict
+    """
+    df: pd.DataFrame = load_series(data, filter_type, filter_value)
+    
+    if engine == 'auto':
+        engine = select_engine(df)
+    
+    cache_keys: Dict[ForecastMode, str] = {
+        mode: forecast_cache_key(
+            df, mode, filter_type, filter_value, confidence_interval, engine, interval_strategy, interval_widths
+        )
+        for mode in modes
+    }
+    
+    if use_cache:
+        cached: Dict[ForecastMode, Optional[ResultDict]] = {
+            mode: forecast_cache.get(key) for mode, key in cache_keys.items()
+        }
+        if all(result is not None for result in cached.values()):
+            logger.info(f"Multi-horizon cache hit ({len(df)} data points)")
+            return copy.deepcopy(cached)  # type: ignore
+    
+    model_key: Optional[str] = series_model_key(data, filter_type, filter_value) if use_registry else None
+    results: HorizonResultDict = forecast_horizons(
+        df, modes, confidence_interval, engine, model_key, filter_type, filter_value,
+        interval_strategy, interval_widths
+    )
+    
+    if use_cache:
+        for mode, result in results.items():
+            forecast_cache.put(cache_keys[mode], copy.deepcopy(result))
+    
+    return results
+
+
+def forecast_by_group(
+    data: InputDataDict,
+    group_by: FilterType,
+    mode: ForecastMode = 'daily',
+    confidence_interval: float = 0.95,
+    engine: ForecastEngine = 'auto',
+    max_workers: Optional[int] = None,
+    interval_strategy: IntervalStrategy = 'full',
+    interval_widths: Tuple[float, ...] = ()
+) -> GroupedResultDict:
+    """
+    Forecast the total and every group value of one field in one call
+    
+    Transactions are aggregated once (load_groups) and all series are
+    forecast concurrently. Prophet fits run inside cmdstan subprocesses, so a
+    thread pool is enough to overlap them. A group that cannot be forecast
+    (e.g. a single data point) is reported under 'errors' instead of failing
+    the whole call.
+    
+    Args:
+        data: Dictionary with UserData and Transactions
+        group_by: Field to split by (category/location/type)
+        mode: Forecast mode (daily/weekly/monthly)
+        confidence_interval: Width of uncertainty intervals
+        engine: 'prophet', 'numpy', or 'auto' (chosen per series)
+        max_workers: Concurrent forecasts (defaults to CPU count)
+        interval_strategy: Prophet interval strategy ('full', 'reduced', 'analytic')
+        interval_widths: Extra interval widths computed from the same draws
+        
+    Returns:
+        Dictionary with 'group_by', 'total', 'groups' and 'errors'
+    """
+    total_df: pd.DataFrame
+    group_dfs: Dict[str, pd.DataFrame]
+    total_df, group_dfs = load_groups(data, group_by)
+    
+    def run_group(group_value: Optional[str], series: pd.DataFrame) -> ResultDict:
+        series_engine: ForecastEngine = select_engine(series) if engine == 'auto' else engine
+        filter_type: Optional[FilterType] = group_by if group_value is not None else None
+        
+        cache_key: str = forecast_cache_key(
+            series, mode, filter_type, group_value, confidence_interval, series_engine,
+            interval_strategy, interval_widths
+        )
+        cached: Optional[ResultDict] = forecast_cache.get(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
+        model_key: Optional[str] = series_model_key(data, filter_type, group_value)
+        result: ResultDict = forecast_series(
+            series, mode, confidence_interval, filter_type, group_value, series_engine, model_key,
+            interval_strategy, interval_widths
+        )
+        forecast_cache.put(cache_key, copy.deepcopy(result))
+        return result
+    
+    worker_count: int = max_workers or os.cpu_count() or 1
+    grouped_result: GroupedResultDict = {
+        'group_by': group_by,
+        'total': {},
+        'groups': {},
+        'errors': {}
+    }
+    
+    pool: ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=worker_count) as pool:
+        total_future: Future = pool.submit(run_group, None, total_df)
+        group_futures: Dict[str, Future] = {
+            group_value: pool.submit(run_group, group_value, series)
+            for group_value, series in group_dfs.items()
+        }
+        
+        grouped_result['total'] = total_future.result()
+        
+        group_value: str
+        future: Future
+        for group_value, future in group_futures.items():
+            try:
+                grouped_result['groups'][group_value] = future.result()
+            except Exception as e:
+                logger.warning(f"Forecast for {group_by}={group_value} failed: {e}")
+                grouped_result['errors'][group_value] = str(e)
+    
+    return grouped_result
+
+
+def expand_batch_request(payload: Dict[str, Any]) -> List[BatchItemDict]:
+    """
+    Normalise a batch request into one work item per forecast
+    
+    Two shapes are accepted:
+        {"items": [{UserData, Transactions, mode?, engine?, filter_type?, filter_value?, interval_*?}, ...]}
+        {UserData, Transactions, mode?, engine?, interval_*?, "filters": [{filter_type?, filter_value?, mode?, engine?, interval_*?}, ...]}
+    
+    interval_* are "interval_strategy" ('full', 'reduced' or 'analytic') and
+    "interval_widths" (extra widths), as for a single forecast.
+    
+    Args:
+        payload: Raw request body
+        
+    Returns:
+        List of items with 'index', 'data', 'mode', 'engine', 'filter_type',
+        'filter_value', 'interval_strategy', 'interval_widths' and 'error' (set
+        when the entry is malformed; such an item is reported as failed instead
+        of forecast)
+        
+    Raises:
+        ValueError: If the payload matches neither shape
+    """
+    specs: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+    
+    if 'items' in payload:
+        raw_items: Any = payload['items']
+        if not isinstance(raw_items, list):
+            error_msg: str = "'items' must be a list"
+            raise ValueError(error_msg)
+        item: Any
+        for item in raw_items:
+            specs.append((item, item))
+    elif 'filters' in payload:
+        raw_filters: Any = payload['filters']
+        if not isinstance(raw_filters, list):
+            error_msg = "'filters' must be a list"
+            raise ValueError(error_msg)
+        filter_spec: Any
+        for filter_spec in raw_filters:
+            if isinstance(filter_spec, dict):
+                inherited: Dict[str, Any] = {
+                    key: payload.get(key) for key in ('mode', 'engine', 'interval_strategy', 'interval_widths')
+                }
+                filter_spec = {**inherited, **filter_spec}
+            specs.append((payload, filter_spec))
+    else:
+        error_msg = "Batch request needs either 'items' or 'filters'"
+        raise ValueError(error_msg)
+    
+    batch_items: List[BatchItemDict] = []
+    index: int
+    source: Any
+    options: Any
+    for index, (source, options) in enumerate(specs):
+        error: Optional[str] = None
+        if not isinstance(options, dict):
+            error = f"Batch entry must be an object, got {type(options).__name__}"
+        elif not isinstance(source.get('UserData', {}), dict):
+            error = "UserData must be an object"
+        else:
+            interval_strategy: Any = options.get('interval_strategy') or 'full'
+            interval_widths: Any = options.get('interval_widths') or []
+            try:
+                if not isinstance(interval_widths, list) or not all(
+                    isinstance(width, (int, float)) for width in interval_widths
+                ):
+                    error_msg = "interval_widths must be a list of numbers between 0 and 1"
+                    raise ValueError(error_msg)
+                _validate_interval_options(interval_strategy, tuple(interval_widths))
+            except ValueError as e:
+                error = str(e)
+        if error:
+            source = options = {}
+        
+        data: InputDataDict = {
+            'UserData': source.get('UserData', {}),
+            'Transactions': source.get('Transactions', []),
+            'DiningHalls': source.get('DiningHalls', [])
+        }
+        batch_items.append({
+            'index': index,
+            'data': data,
+            'mode': options.get('mode') or 'weekly',
+            'engine': options.get('engine') or 'auto',
+            'filter_type': options.get('filter_type') or None,
+            'filter_value': options.get('filter_value') or None,
+            'interval_strategy': options.get('interval_strategy') or 'full',
+            'interval_widths': tuple(options.get('interval_widths') or ()),
+            'error': error
+        })
+    
+    return batch_items
+
+
+def batch_item_label(item: BatchItemDict) -> Dict[str, Any]:
+    """Identify a batch item in its streamed result line"""
+    user_data: Any = item['data'].get('UserData', {})
+    label: Dict[str, Any] = {
+        'index': item['index'],
+        'user': user_data.get('id') or user_data.get('name'),
+        'mode': item['mode'],
+        'engine': item['engine'],
+        'filter_type': item['filter_type'],
+        'filter_value': item['filter_value']
+    }
+    return label
+
+
+def forecast_batch_item(item: BatchItemDict) -> BatchResultDict:
+    """
+    Forecast a single batch item, capturing any failure in the result
+    
+    Args:
+        item: Work item from expand_batch_request
+        
+    Returns:
+        Label fields plus 'status' and either 'result' or 'error'
+    """
+    batch_result: BatchResultDict = batch_item_label(item)
+    if item['error']:
+        batch_result['status'] = 'error'
+        batch_result['error'] = item['error']
+        return batch_result
+    
+    try:
+        result: ResultDict = forecast_from_json(
+            data=item['data'],
+            mode=item['mode'],
+            filter_type=item['filter_type'],
+            filter_value=item['filter_value'],
+            engine=item['engine'],
+            interval_strategy=item['interval_strategy'],
+            interval_widths=item['interval_widths']
+        )
+        batch_result['status'] = 'ok'
+        batch_result['result'] = result
+    except Exception as e:
+        logger.warning(f"Batch item {item['index']} failed: {e}")
+        batch_result['status'] = 'error'
+        batch_result['error'] = str(e)
+    
+    return batch_result
+
+
+def forecast_batch(
+    items: List[BatchItemDict],
+    max_workers: Optional[int] = None
+) -> Iterator[BatchResultDict]:
+    """
+    Forecast many items in parallel across cores
+    
+    Results are yielded as each item finishes (not in input order); use the
+    'index' field to match them up. A failing item only fails itself.
+    
+    Args:
+        items: Work items from expand_batch_request
+        max_workers: Worker processes to use (defaults to CPU count)
+        
+    Yields:
+        One BatchResultDict per item
+        
+    Example:
+        >>> for line in forecast_batch(expand_batch_request(payload)):
+        ...     print(line['index'], line['status'])
+    """
+    if not items:
+        return
+    
+    worker_count: int = min(max_workers or os.cpu_count() or 1, len(items))
+    logger.info(f"Forecasting batch of {len(items)} items on {worker_count} workers")
+    
+    pool: ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=worker_count) as pool:
+        futures: Dict[Future, BatchItemDict] = {
+            pool.submit(forecast_batch_item, item): item
+            for item in items
+        }
+        
+        future: Future
+        for future in as_completed(futures):
+            try:
+                batch_result: BatchResultDict = future.result()
+            except Exception as e:
+                # Worker crashed before it could report (e.g. killed process)
+                batch_result = batch_item_label(futures[future])
+                batch_result['status'] = 'error'
+                batch_result['error'] = str(e)
+            yield batch_result
+
+
+def warm_up(engine: Literal['prophet', 'numpy'] = 'prophet') -> None:
+    """
+    Run one tiny fit so the forecasting code paths are loaded
+    
+    Called once per forecast worker process (Prophet: imports cmdstanpy and
+    loads the Stan model) and, with engine='numpy', in the API process by
+    src.warmup, so real requests never pay the cold start
+    
+    Args:
+        engine: Which engine to exercise
+    """
+    start_date: pd.Timestamp = pd.Timestamp('2024-01-01')
+    warm_df: pd.DataFrame = pd.DataFrame({
+        'ds': pd.date_range(start_date, periods=14, freq='D'),
+        'y': np.linspace(10.0, 20.0, 14)
+    })
+    
+    if engine == 'numpy':
+        forecast_expenditure_numpy(warm_df, mode='daily')
+    else:
+        forecast_expenditure(warm_df, mode='daily')
+
+
 def main() -> None:
     """
     Example usage and testing
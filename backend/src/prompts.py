@@ -1,7 +1,14 @@
 """
 System prompts for the MealPrep IQ AI agent
+Plus the precompiled user prompt templates and prompt size accounting
 """
 
+from string import Formatter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# System prompts hold everything that is the same on every call, so the whole
+# system block is a stable prefix the Messages API can cache (see agent.message_params)
+
 ANALYZER_PROMPT = """You are a college meal plan spending analyzer. You identify waste, missed opportunities, and spending patterns.
 
 Your analysis should:
@@ -11,6 +18,14 @@ Your analysis should:
 - Be encouraging, not judgmental
 - Use clear, scannable language
 
+Assume an average meal swipe is worth $12. Identify the BIGGEST waste and
+quantify exactly how much money is being lost. Focus on the mismatch between
+swipe usage and flex spending.
+
+The spending metrics you receive are computed from the student's FULL
+transaction history (rates, projections, concentration). Use those numbers
+as given rather than re-deriving them.
+
 Format your response as a JSON object with:
 {
   "main_insight": "One sentence summary of biggest waste",
@@ -21,21 +36,72 @@ Format your response as a JSON object with:
 
 CRITICAL: Return ONLY the JSON object, no other text."""
 
-RECOMMENDER_PROMPT = """You are a college dining recommendation engine. Generate personalized meal suggestions based on context.
+# Dietary restriction -> meaning, sent once in RECOMMENDER_PROMPT instead of per request
+DIETARY_DEFINITIONS = {
+    'Vegetarian': 'No meat (beef, pork, chicken, fish, seafood) - dairy and eggs OK',
+    'Vegan': 'No animal products at all (no meat, dairy, eggs, honey)',
+    'Pescatarian': 'Fish and seafood OK - but NO other meat (no beef, pork, chicken)',
+    'Gluten-Free': 'No wheat, barley, rye, or gluten-containing grains',
+    'Dairy-Free': 'No milk, cheese, yogurt, butter, or dairy products',
+    'Nut Allergy': 'AVOID all nuts and nut products (life-threatening)'
+}
+
+# ENHANCED RECOMMENDER PROMPT WITH PREFERENCES
+RECOMMENDER_PROMPT = """You are a college dining recommendation engine. Generate personalized meal suggestions based on context AND user preferences.
 
 Consider:
 - Time of day (breakfast/lunch/dinner timing)
 - Meal swipe vs flex dollar efficiency
-- User dietary preferences
+- User dietary restrictions (STRICTLY enforce these)
 - Wait times and convenience
 - Expiring swipes (prioritize using them)
+- **User priority weights (0-100 scale):**
+  - Speed: How much they value quick service
+  - Budget: How much they want to save money
+  - Health: Preference for nutritious options
+  - Social: Preference for busy vs quiet dining halls
+- **Cuisine ratings (1-5 stars):**
+  - Prioritize cuisines with 4-5 stars
+  - Avoid cuisines with 1-2 stars unless no other options
+- **Ingredients to avoid:** Never suggest meals with these ingredients
+
+**CRITICAL DIETARY RULES:**
+1. PESCATARIAN means: Fish and seafood ARE allowed, but NO beef, pork, or chicken
+   - Suggest: Salmon, tuna, shrimp, fish tacos, poke bowls
+   - DO NOT suggest: Just vegetarian options without fish
+2. VEGETARIAN means: NO meat or fish at all (dairy and eggs OK)
+3. VEGAN means: NO animal products whatsoever
+4. If speed priority > 70: Only suggest options with wait time < 10 min
+5. If budget priority > 70: Strongly emphasize savings and swipe usage
+6. If health priority > 70: Focus on salads, grain bowls, lean proteins
+7. Match cuisine preferences - suggest 4-5 star cuisines first
+8. NEVER suggest foods with restricted ingredients
+
+**DIETARY DEFINITIONS:**
+""" + "\n".join(f"- {name}: {meaning}" for name, meaning in DIETARY_DEFINITIONS.items()) + """
+
+The options you receive are RANKED from the current menus, best match first.
+Dishes whose names show a conflict are already left out, but menu names do not
+list every ingredient: check every option against the dietary restrictions and
+avoided ingredients yourself and skip any that could violate them. Options
+marked "diet unverified" may contain restricted ingredients; if you recommend
+one, tell the student to confirm the ingredients with staff. Only recommend
+dining halls from those options.
+
+IMPORTANT RULES:
+1. If swipes are expiring soon, STRONGLY prioritize using them
+2. Show exact savings compared to alternatives
+3. Match user's preferences and priorities
+4. Consider wait times based on speed priority
+5. Each recommendation should be unique and compelling
+6. STRICTLY honor dietary restrictions and avoided ingredients
 
 Format each recommendation as JSON array of 3 recommendations:
 [
   {
     "dining_hall": "Name",
     "meal": "Specific dish to order",
-    "reasoning": "Why this is smart right now (mention savings/swipes)",
+    "reasoning": "Why this matches their priorities and preferences (mention specific priority matches)",
     "emoji": "One relevant emoji",
     "savings_amount": 12.50,
     "use_swipe": true
@@ -61,4 +127,212 @@ Context you'll receive:
 - Available dining options
 - User preferences
 
-Respond in plain text (not JSON) with a friendly recommendation."""
\ No newline at end of file
+Give ONE perfect recommendation that:
+1. Directly answers their query
+2. Mentions a specific dining hall and dish
+3. Explains why it's smart (savings, swipes, matches their preferences and priorities)
+4. Includes dollar amount saved if relevant
+5. Feels natural and friendly
+
+If the user is Pescatarian, suggest fish/seafood dishes, not just vegetarian!
+Never suggest a dish that could break their dietary restrictions or avoided
+ingredients; if the menu name doesn't settle it, say to check with staff.
+
+Respond in plain text (not JSON) with a friendly recommendation."""
+
+PARSER_PROMPT = """You are a transaction parser. Extract structured data from natural language.
+
+Extract:
+1. Merchant name (e.g., "Starbucks", "Chipotle", "Costco")
+2. Amount in dollars (convert cents to dollars if needed: 150 cents = $1.50)
+3. Payment type: "swipe" (dining hall meal swipe), "flex" (flex dollars), or "external" (off-campus cash/card)
+
+Return ONLY a JSON object:
+{
+  "merchant": "Merchant Name",
+  "amount": 1.50,
+  "type": "swipe|flex|external"
+}
+
+Rules:
+- If they mention cents, divide by 100 to get dollars
+- If they mention a dining hall or swipe, type is "swipe"
+- If they mention flex, type is "flex"
+- Otherwise type is "external"
+- Merchant should be properly capitalized
+- Amount should be a number (float)"""
+
+
+class PromptTemplate:
+    """
+    User prompt template parsed once at import
+
+    The text uses str.format field names ({name} only, no format specs); it is
+    split into literal/field pairs up front, so render() just joins strings.
+    """
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self._parts: List[Tuple[str, Optional[str]]] = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if spec or conversion:
+                raise ValueError(f"Template {name}: format specs are not supported ({field})")
+            self._parts.append((literal, field))
+        self.fields = frozenset(field for _, field in self._parts if field)
+
+    def render(self, **values: Any) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Template {self.name} is missing {', '.join(sorted(missing))}")
+        return "".join(
+            literal + (str(values[field]) if field else "") for literal, field in self._parts
+        )
+
+
+ANALYSIS_TEMPLATE = PromptTemplate("analysis", """
+Analyze this student's meal plan spending:
+
+MEAL PLAN STATUS:
+- Total budget: ${total_budget}
+- Spent so far: ${total_spent} ({spent_percentage}%)
+- Meal swipes: {swipes_used}/{total_swipes} used ({swipes_percentage}%)
+- Flex dollars: ${flex_spent}/${total_flex} spent
+- Weeks remaining: {weeks_remaining}
+
+SPENDING METRICS (full history):
+{metrics}
+
+Student preferences: {dietary}
+""")
+
+RECOMMENDATIONS_TEMPLATE = PromptTemplate("recommendations", """
+Generate 3 meal recommendations for RIGHT NOW.
+
+USER CONTEXT:
+- Time: {time} ({meal})
+- Meal swipes left: {swipes_remaining} ({swipes_unused} unused this week)
+- Flex dollars left: ${flex_remaining}
+- Dietary restrictions: {dietary}
+- Favorite cuisines: {cuisines}
+- Priorities: {priorities}
+{preferences}
+RANKED OPTIONS (best match first):
+{options}
+""")
+
+RECOMMENDATION_PREFERENCES_TEMPLATE = PromptTemplate("recommendation_preferences", """
+USER PREFERENCES (IMPORTANT - MATCH THESE!):
+- Priorities (0-100): {priorities}
+- Preferred cuisines: {liked}; avoid: {disliked}
+- Dietary restrictions (STRICT): {dietary}
+- Ingredients to AVOID: {avoid}
+""")
+
+QUERY_TEMPLATE = PromptTemplate("query", """
+User asked: "{query}"
+
+CONTEXT:
+- Current time: {time} ({meal})
+- Meal swipes remaining: {swipes_remaining}
+- Flex dollars remaining: ${flex_remaining}
+- Dietary preferences: {dietary}
+- Favorite cuisines: {cuisines}
+{preferences}
+DINING OPTIONS RIGHT NOW:
+{dining_options}
+""")
+
+QUERY_PREFERENCES_TEMPLATE = PromptTemplate("query_preferences", """
+User Priorities:
+- Speed importance: {speed}/100
+- Budget importance: {budget}/100
+- Health importance: {health}/100
+
+Top Cuisine Preferences: {cuisines}
+Dietary Restrictions: {dietary}
+""")
+
+QUERY_HALL_TEMPLATE = PromptTemplate("query_hall", """
+{name} ({wait_time} min wait):
+Menu: {menu}
+{payment}
+""")
+
+PARSE_TRANSACTION_TEMPLATE = PromptTemplate("parse_transaction", """Parse this transaction description into structured data:
+
+"{text}"
+""")
+
+
+class PromptStats:
+    """
+    Prompt sizes per call kind, plus the token usage Claude reports back
+
+    Bytes are measured on every request; est_tokens is bytes / 4. The usage
+    totals come from the API response (input_tokens excludes cached tokens,
+    which are counted in cache_read_tokens / cache_write_tokens).
+
+    A kind whose response reports neither a cache read nor a cache write has
+    a system prompt below the model's minimum cacheable length; cacheable()
+    then turns the cache breakpoint off for it.
+    """
+
+    USAGE_FIELDS = {
+        "input_tokens": "input_tokens",
+        "cache_read_input_tokens": "cache_read_tokens",
+        "cache_creation_input_tokens": "cache_write_tokens",
+        "output_tokens": "output_tokens",
+    }
+
+    def __init__(self):
+        self._kinds: Dict[str, Dict[str, float]] = {}
+        self._uncacheable: Set[str] = set()
+
+    def _kind(self, kind: str) -> Dict[str, float]:
+        if kind not in self._kinds:
+            self._kinds[kind] = {
+                "calls": 0, "system_bytes": 0, "user_bytes": 0,
+                **{name: 0 for name in self.USAGE_FIELDS.values()}
+            }
+        return self._kinds[kind]
+
+    def record_request(self, kind: str, system_prompt: str, user_prompt: str) -> None:
+        counters = self._kind(kind)
+        counters["calls"] += 1
+        counters["system_bytes"] += len(system_prompt.encode("utf-8"))
+        counters["user_bytes"] += len(user_prompt.encode("utf-8"))
+
+    def record_usage(self, kind: str, usage: Optional[Dict[str, Any]]) -> None:
+        """Add a Messages API "usage" object (any subset of its fields)"""
+        usage = usage or {}
+        counters = self._kind(kind)
+        for field, name in self.USAGE_FIELDS.items():
+            counters[name] += usage.get(field) or 0
+        if "input_tokens" in usage and not (
+            usage.get("cache_read_input_tokens") or usage.get("cache_creation_input_tokens")
+        ):
+            self._uncacheable.add(kind)
+
+    def cacheable(self, kind: str) -> bool:
+        """False once Claude has answered a request of this kind without caching its system prompt"""
+        return kind not in self._uncacheable
+
+    def stats(self) -> Dict[str, Any]:
+        """Average prompt size and cumulative token usage per kind for /metrics"""
+        result = {}
+        for kind, counters in self._kinds.items():
+            calls = counters["calls"] or 1
+            prompt_tokens = counters["input_tokens"] + counters["cache_read_tokens"] + counters["cache_write_tokens"]
+            result[kind] = {
+                "calls": counters["calls"],
+                "avg_system_bytes": round(counters["system_bytes"] / calls),
+                "avg_user_bytes": round(counters["user_bytes"] / calls),
+                "avg_est_tokens": round((counters["system_bytes"] + counters["user_bytes"]) / calls / 4),
+                **{name: counters[name] for name in self.USAGE_FIELDS.values()},
+                "prompt_cached": kind not in self._uncacheable,
+                "cache_read_rate": round(counters["cache_read_tokens"] / prompt_tokens, 3) if prompt_tokens else 0.0
+            }
+        return result
+
+
+prompt_stats = PromptStats()
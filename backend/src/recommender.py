@@ -0,0 +1,525 @@
+"""
+Rule-based meal ranking - dietary/menu index over DiningHall.current_menu
+Filters and scores every (dining hall, menu item) locally so the LLM only sees the best few,
+and can answer on its own when the LLM is unavailable or slow
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from src.models import DiningHall, Recommendation, UserProfile
+
+# Candidates passed to the LLM prompt / recommendations returned in local mode (override via .env)
+RECOMMENDER_PROMPT_CANDIDATES = int(os.getenv("RECOMMENDER_PROMPT_CANDIDATES", "6"))
+RECOMMENDER_TOP_K = int(os.getenv("RECOMMENDER_TOP_K", "3"))
+
+# "If speed priority > 70: only suggest options with wait time < 10 min"
+SPEED_PRIORITY_STRICT = 70
+SPEED_MAX_WAIT = 10
+
+# Ingredient categories each dietary restriction rules out
+DIET_EXCLUDES: Dict[str, FrozenSet[str]] = {
+    "vegetarian": frozenset({"meat", "poultry", "fish", "shellfish"}),
+    "vegan": frozenset({"meat", "poultry", "fish", "shellfish", "dairy", "egg", "honey"}),
+    "pescatarian": frozenset({"meat", "poultry"}),
+    "gluten-free": frozenset({"gluten"}),
+    "dairy-free": frozenset({"dairy"}),
+    "nut allergy": frozenset({"nuts"}),
+}
+
+# Menu vocabulary: term -> what a dish named with it contains and how it rates
+# (contains = ingredient categories, health 0-1, price = typical off-campus cost in $;
+# meal False marks drinks and snacks, ranked after meals)
+MENU_TERMS: Dict[str, Dict[str, Any]] = {
+    "pasta": {"contains": {"gluten"}, "may_contain": {"meat", "dairy", "egg", "nuts"}, "cuisine": "Italian", "health": 0.5, "emoji": "🍝", "price": 11.0},
+    "pizza": {"contains": {"gluten", "dairy"}, "may_contain": {"meat"}, "cuisine": "Italian", "health": 0.3, "emoji": "🍕", "price": 10.0},
+    "lasagna": {"contains": {"gluten", "dairy", "meat"}, "cuisine": "Italian", "health": 0.3, "emoji": "🍝", "price": 12.0},
+    "salad": {"contains": set(), "may_contain": {"meat", "poultry", "fish", "dairy", "egg", "nuts"}, "cuisine": None, "health": 0.95, "emoji": "🥗", "price": 12.0},
+    "grain bowl": {"contains": set(), "may_contain": {"meat", "poultry", "fish", "dairy", "egg"}, "cuisine": None, "health": 0.85, "emoji": "🥗", "price": 12.0},
+    "buddha bowl": {"contains": {"soy"}, "may_contain": {"nuts"}, "cuisine": None, "health": 0.9, "emoji": "🥗", "price": 12.0},
+    "quinoa": {"contains": set(), "cuisine": None, "health": 0.9, "emoji": "🥗", "price": 11.0},
+    "smoothie": {"contains": set(), "may_contain": {"dairy", "honey", "nuts"}, "cuisine": None, "health": 0.75, "emoji": "🥤", "price": 7.0, "meal": False},
+    "soup": {"contains": set(), "may_contain": {"meat", "poultry", "fish", "shellfish", "dairy", "gluten"}, "cuisine": None, "health": 0.7, "emoji": "🍲", "price": 8.0},
+    "coffee": {"contains": set(), "may_contain": {"dairy"}, "cuisine": None, "health": 0.5, "emoji": "☕", "price": 5.0, "meal": False},
+    "bagel": {"contains": {"gluten"}, "may_contain": {"dairy", "egg"}, "cuisine": "American", "health": 0.35, "emoji": "🥯", "price": 5.0},
+    "wrap": {"contains": {"gluten"}, "may_contain": {"meat", "poultry", "fish", "dairy", "egg"}, "cuisine": None, "health": 0.6, "emoji": "🌯", "price": 10.0},
+    "sandwich": {"contains": {"gluten"}, "may_contain": {"meat", "poultry", "fish", "dairy", "egg"}, "cuisine": "American", "health": 0.5, "emoji": "🥪", "price": 10.0},
+    "burger": {"contains": {"meat", "gluten", "dairy"}, "cuisine": "American", "health": 0.2, "emoji": "🍔", "price": 13.0},
+    "fries": {"contains": set(), "may_contain": {"gluten"}, "cuisine": "American", "health": 0.1, "emoji": "🍟", "price": 5.0, "meal": False},
+    "grill": {"contains": {"meat"}, "cuisine": "American", "health": 0.35, "emoji": "🍔", "price": 13.0},
+    "taco": {"contains": set(), "may_contain": {"meat", "poultry", "fish", "dairy", "gluten"}, "cuisine": "Mexican", "health": 0.55, "emoji": "🌮", "price": 10.0},
+    "fish taco": {"contains": {"fish"}, "cuisine": "Mexican", "health": 0.7, "emoji": "🌮", "price": 12.0},
+    "burrito": {"contains": {"gluten"}, "may_contain": {"meat", "poultry", "dairy"}, "cuisine": "Mexican", "health": 0.45, "emoji": "🌯", "price": 11.0},
+    "quesadilla": {"contains": {"gluten", "dairy"}, "may_contain": {"meat", "poultry"}, "cuisine": "Mexican", "health": 0.35, "emoji": "🌮", "price": 10.0},
+    "sushi": {"contains": {"fish", "soy"}, "may_contain": {"shellfish", "egg"}, "cuisine": "Asian", "health": 0.75, "emoji": "🍣", "price": 14.0},
+    "poke": {"contains": {"fish", "soy"}, "may_contain": {"shellfish"}, "cuisine": "Asian", "health": 0.85, "emoji": "🍣", "price": 14.0},
+    "salmon": {"contains": {"fish"}, "cuisine": None, "health": 0.9, "emoji": "🐟", "price": 15.0},
+    "tuna": {"contains": {"fish"}, "cuisine": None, "health": 0.85, "emoji": "🐟", "price": 13.0},
+    "fish": {"contains": {"fish"}, "cuisine": None, "health": 0.8, "emoji": "🐟", "price": 13.0},
+    "shrimp": {"contains": {"shellfish"}, "cuisine": None, "health": 0.75, "emoji": "🍤", "price": 14.0},
+    "chicken": {"contains": {"poultry"}, "cuisine": None, "health": 0.65, "emoji": "🍗", "price": 12.0},
+    "turkey": {"contains": {"poultry"}, "cuisine": "American", "health": 0.65, "emoji": "🦃", "price": 11.0},
+    "beef": {"contains": {"meat"}, "cuisine": None, "health": 0.35, "emoji": "🥩", "price": 14.0},
+    "steak": {"contains": {"meat"}, "cuisine": "American", "health": 0.4, "emoji": "🥩", "price": 16.0},
+    "pork": {"contains": {"meat"}, "cuisine": None, "health": 0.35, "emoji": "🥓", "price": 13.0},
+    "bacon": {"contains": {"meat"}, "cuisine": "American", "health": 0.15, "emoji": "🥓", "price": 8.0},
+    "tofu": {"contains": {"soy"}, "cuisine": "Asian", "health": 0.85, "emoji": "🥢", "price": 11.0},
+    "stir fry": {"contains": {"soy"}, "may_contain": {"meat", "poultry", "shellfish", "nuts", "egg"}, "cuisine": "Asian", "health": 0.7, "emoji": "🍜", "price": 11.0},
+    "noodle": {"contains": {"gluten"}, "may_contain": {"meat", "poultry", "shellfish", "egg", "nuts"}, "cuisine": "Asian", "health": 0.45, "emoji": "🍜", "price": 11.0},
+    "ramen": {"contains": {"gluten", "egg"}, "may_contain": {"meat", "poultry", "fish"}, "cuisine": "Asian", "health": 0.35, "emoji": "🍜", "price": 13.0},
+    "pad thai": {"contains": {"nuts", "egg"}, "may_contain": {"poultry", "shellfish", "fish"}, "cuisine": "Thai", "health": 0.5, "emoji": "🍜", "price": 13.0},
+    "bibimbap": {"contains": {"egg", "soy"}, "may_contain": {"meat"}, "cuisine": "Korean", "health": 0.75, "emoji": "🍚", "price": 13.0},
+    "curry": {"contains": set(), "may_contain": {"meat", "poultry", "fish", "shellfish", "dairy", "nuts"}, "cuisine": "Indian", "health": 0.6, "emoji": "🍛", "price": 12.0},
+    "falafel": {"contains": set(), "may_contain": {"gluten"}, "cuisine": "Mediterranean", "health": 0.7, "emoji": "🧆", "price": 10.0},
+    "hummus": {"contains": set(), "cuisine": "Mediterranean", "health": 0.8, "emoji": "🧆", "price": 8.0, "meal": False},
+    "gyro": {"contains": {"meat", "gluten", "dairy"}, "cuisine": "Mediterranean", "health": 0.4, "emoji": "🥙", "price": 11.0},
+    "rice": {"contains": set(), "may_contain": {"meat", "poultry", "egg"}, "cuisine": None, "health": 0.55, "emoji": "🍚", "price": 9.0},
+    "vegetable": {"contains": set(), "cuisine": None, "health": 0.9, "emoji": "🥦", "price": 10.0},
+    "veggie": {"contains": set(), "cuisine": None, "health": 0.9, "emoji": "🥦", "price": 10.0},
+    "egg": {"contains": {"egg"}, "cuisine": "American", "health": 0.6, "emoji": "🍳", "price": 8.0},
+    "omelette": {"contains": {"egg", "dairy"}, "cuisine": "American", "health": 0.6, "emoji": "🍳", "price": 9.0},
+    "pancake": {"contains": {"gluten", "egg", "dairy"}, "cuisine": "American", "health": 0.2, "emoji": "🥞", "price": 9.0},
+    "waffle": {"contains": {"gluten", "egg", "dairy"}, "cuisine": "American", "health": 0.2, "emoji": "🧇", "price": 9.0},
+    "oatmeal": {"contains": set(), "may_contain": {"dairy", "nuts"}, "cuisine": None, "health": 0.9, "emoji": "🥣", "price": 6.0},
+    "yogurt": {"contains": {"dairy"}, "cuisine": None, "health": 0.75, "emoji": "🥣", "price": 6.0, "meal": False},
+    "fruit": {"contains": set(), "cuisine": None, "health": 0.95, "emoji": "🍓", "price": 6.0, "meal": False},
+    "pastry": {"contains": {"gluten", "dairy", "egg"}, "may_contain": {"nuts"}, "cuisine": None, "health": 0.2, "emoji": "🥐", "price": 5.0, "meal": False},
+    "muffin": {"contains": {"gluten", "dairy", "egg"}, "may_contain": {"nuts"}, "cuisine": "American", "health": 0.2, "emoji": "🧁", "price": 4.0, "meal": False},
+    "dessert": {"contains": {"dairy", "gluten", "egg"}, "may_contain": {"nuts"}, "cuisine": None, "health": 0.1, "emoji": "🍰", "price": 6.0, "meal": False},
+    "ice cream": {"contains": {"dairy"}, "may_contain": {"nuts", "egg"}, "cuisine": None, "health": 0.1, "emoji": "🍦", "price": 6.0, "meal": False},
+    "cheese": {"contains": {"dairy"}, "cuisine": None, "health": 0.4, "emoji": "🧀", "price": 8.0},
+    "peanut": {"contains": {"nuts"}, "cuisine": None, "health": 0.5, "emoji": "🥜", "price": 6.0},
+    "pesto": {"contains": {"nuts", "dairy"}, "cuisine": "Italian", "health": 0.5, "emoji": "🍝", "price": 12.0},
+    "satay": {"contains": {"nuts"}, "may_contain": {"meat", "poultry"}, "cuisine": "Thai", "health": 0.5, "emoji": "🍢", "price": 12.0},
+    "pepperoni": {"contains": {"meat"}, "cuisine": "Italian", "health": 0.2, "emoji": "🍕", "price": 10.0},
+    "sausage": {"contains": {"meat"}, "cuisine": None, "health": 0.2, "emoji": "🌭", "price": 9.0},
+    "ham": {"contains": {"meat"}, "cuisine": None, "health": 0.35, "emoji": "🥪", "price": 10.0},
+    "meatball": {"contains": {"meat", "gluten", "egg"}, "cuisine": "Italian", "health": 0.3, "emoji": "🍝", "price": 12.0},
+    "lamb": {"contains": {"meat"}, "cuisine": None, "health": 0.4, "emoji": "🍖", "price": 15.0},
+    "crab": {"contains": {"shellfish"}, "cuisine": None, "health": 0.7, "emoji": "🦀", "price": 15.0},
+    "lobster": {"contains": {"shellfish"}, "cuisine": None, "health": 0.7, "emoji": "🦞", "price": 18.0},
+    "bean": {"contains": set(), "cuisine": None, "health": 0.8, "emoji": "🫘", "price": 9.0},
+}
+
+# Scoring defaults for an unrecognised menu item; its ingredients are unknown ("unverified")
+UNKNOWN_ITEM = {"contains": set(), "cuisine": None, "health": 0.5, "emoji": "🍽️", "price": 10.0, "meal": True}
+
+# Labels on an item name that rule out what its dish "may_contain" (e.g. "Veggie wrap")
+ANIMAL_CATEGORIES = frozenset({"meat", "poultry", "fish", "shellfish", "dairy", "egg", "honey"})
+MEAT_CATEGORIES = frozenset({"meat", "poultry", "fish", "shellfish"})
+QUALIFIERS: Dict[str, FrozenSet[str]] = {
+    "vegan": ANIMAL_CATEGORIES,
+    "vegetarian": MEAT_CATEGORIES,
+    "veggie": MEAT_CATEGORIES,
+    "meatless": MEAT_CATEGORIES,
+    "plant based": MEAT_CATEGORIES,
+    "gluten free": frozenset({"gluten"}),
+    "dairy free": frozenset({"dairy"}),
+    "nut free": frozenset({"nuts"}),
+    "egg free": frozenset({"egg"}),
+}
+
+# Item name words that say nothing about ingredients; any other unrecognised word
+# leaves the item "unverified" for strict diets and allergies
+NEUTRAL_WORDS = frozenset({
+    "a", "an", "and", "the", "with", "of", "on", "in", "or", "to", "style",
+    "bar", "station", "corner", "bowl", "plate", "platter", "cup", "side", "special", "daily", "combo",
+    "fresh", "house", "classic", "homemade", "seasonal", "hot", "cold", "mini", "small", "large",
+    "grilled", "roasted", "baked", "fried", "steamed", "toasted", "spicy", "mixed",
+    "build", "your", "own", "garden", "green",
+})
+
+# Diets whose violations are dangerous, not just unwanted: items that may contain the
+# allergen, and unverified items, are left out while anything safer is on the menu
+ALLERGY_DIETS = frozenset({"nut allergy"})
+
+# avoid_ingredients words that name a whole ingredient category
+AVOID_CATEGORIES = {
+    "nut": "nuts", "nuts": "nuts", "peanut": "nuts", "peanuts": "nuts", "almond": "nuts", "almonds": "nuts",
+    "dairy": "dairy", "milk": "dairy", "cheese": "dairy", "lactose": "dairy", "butter": "dairy",
+    "gluten": "gluten", "wheat": "gluten", "bread": "gluten",
+    "egg": "egg", "eggs": "egg",
+    "soy": "soy", "tofu": "soy",
+    "fish": "fish", "seafood": "fish", "shellfish": "shellfish", "shrimp": "shellfish",
+    "meat": "meat", "beef": "meat", "pork": "meat", "chicken": "poultry", "poultry": "poultry",
+    "honey": "honey",
+}
+
+# Profile priority words (UserProfile.preferences["priorities"] list) -> priority weight key
+PRIORITY_WORDS = {
+    "speed": "speed", "quick": "speed", "fast": "speed", "convenience": "speed",
+    "budget": "budget", "cheap": "budget", "savings": "budget", "save": "budget",
+    "health": "health", "healthy": "health", "nutrition": "health",
+    "social": "social",
+}
+
+CROWD_SCORES = {"low": 0.2, "medium": 0.6, "high": 1.0}
+
+_TOKEN = re.compile(r"[a-z]+")
+
+
+def _singular(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")) else word
+
+
+def _tokens(text: str) -> List[str]:
+    return [_singular(word) for word in _TOKEN.findall(text.lower())]
+
+
+@lru_cache(maxsize=1024)
+def item_facts(item: str) -> Dict[str, Any]:
+    """
+    Merge the MENU_TERMS entries found in a menu item name ("Fish tacos" -> fish taco)
+
+    contains is what the dish certainly has, may_contain what it has in some
+    recipes (less what a label like "veggie" rules out). An item with no
+    recognised term, or with a word that is neither a term, a label nor a
+    NEUTRAL_WORDS filler, is "unverified": its name does not tell us everything
+    it contains.
+    """
+    tokens = _tokens(item)
+    phrases = [" ".join(tokens[i:i + 2]) for i in range(len(tokens) - 1)] + tokens
+    terms = [phrase for phrase in phrases if phrase in MENU_TERMS]
+    qualifiers = [phrase for phrase in phrases if phrase in QUALIFIERS]
+    covered = {word for phrase in terms + qualifiers for word in phrase.split()}
+    unverified = not terms or any(token not in covered and token not in NEUTRAL_WORDS for token in tokens)
+    if not terms:
+        return {
+            **UNKNOWN_ITEM, "may_contain": set(), "terms": (), "tokens": tuple(tokens),
+            "known": False, "unverified": unverified
+        }
+
+    # Two-word terms come first, so "fish taco" decides emoji/cuisine over "taco"
+    entries = [MENU_TERMS[term] for term in terms]
+    contains = set().union(*(entry["contains"] for entry in entries))
+    ruled_out = set().union(*(QUALIFIERS[qualifier] for qualifier in qualifiers))
+    return {
+        "contains": contains,
+        "may_contain": set().union(*(entry.get("may_contain", set()) for entry in entries)) - contains - ruled_out,
+        "cuisine": next((entry["cuisine"] for entry in entries if entry["cuisine"]), None),
+        "health": sum(entry["health"] for entry in entries) / len(entries),
+        "emoji": entries[0]["emoji"],
+        "price": max(entry["price"] for entry in entries),
+        "meal": any(entry.get("meal", True) for entry in entries),
+        "terms": tuple(terms),
+        "tokens": tuple(tokens),
+        "known": True,
+        "unverified": unverified,
+    }
+
+
+class MenuIndex:
+    """
+    Inverted index over every (dining hall, menu item) of one dining hall snapshot
+
+    by_category maps an ingredient category ("dairy") to the entries that
+    contain it and by_possible to those that may contain it, by_cuisine a
+    cuisine to its entries and by_token every word of an item name, so dietary
+    and avoid filters are set differences instead of a scan of every menu.
+    unverified holds the entries whose names don't tell us every ingredient.
+    """
+
+    def __init__(self, menus: Tuple[Tuple[str, Tuple[str, ...]], ...]):
+        self.entries: List[Tuple[str, str, Dict[str, Any]]] = []
+        self.by_category: Dict[str, Set[int]] = {}
+        self.by_possible: Dict[str, Set[int]] = {}
+        self.by_cuisine: Dict[str, Set[int]] = {}
+        self.by_token: Dict[str, Set[int]] = {}
+        self.unverified: Set[int] = set()
+
+        for hall_name, menu in menus:
+            for item in menu:
+                position = len(self.entries)
+                facts = item_facts(item)
+                self.entries.append((hall_name, item, facts))
+                for category in facts["contains"]:
+                    self.by_category.setdefault(category, set()).add(position)
+                for category in facts["may_contain"]:
+                    self.by_possible.setdefault(category, set()).add(position)
+                if facts["unverified"]:
+                    self.unverified.add(position)
+                if facts["cuisine"]:
+                    self.by_cuisine.setdefault(facts["cuisine"], set()).add(position)
+                for token in facts["tokens"]:
+                    self.by_token.setdefault(token, set()).add(position)
+
+    def excluded(self, categories: Iterable[str], words: Iterable[str], allergies: Iterable[str] = ()) -> Set[int]:
+        """
+        Entries containing any category, or whose name mentions any word
+
+        For allergy categories, entries that may contain one, and every
+        unverified entry, are excluded as well.
+        """
+        hits: Set[int] = set()
+        for category in categories:
+            hits |= self.by_category.get(category, set())
+        for word in words:
+            hits |= self.by_token.get(_singular(word), set())
+        allergies = set(allergies)
+        for category in allergies:
+            hits |= self.by_category.get(category, set()) | self.by_possible.get(category, set())
+        if allergies:
+            hits |= self.unverified
+        return hits
+
+    def diet_verified(self, position: int, categories: Set[str]) -> bool:
+        """Whether the entry's name rules out every category (trivially so with none)"""
+        facts = self.entries[position][2]
+        return not categories or not (facts["unverified"] or facts["may_contain"] & categories)
+
+
+@lru_cache(maxsize=64)
+def menu_index(menus: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> MenuIndex:
+    """MenuIndex for a dining hall snapshot, built once per distinct set of menus"""
+    return MenuIndex(menus)
+
+
+def user_taste(user_data: UserProfile, user_preferences: Optional[dict]) -> Dict[str, Any]:
+    """
+    Normalise both preference shapes into weights, exclusions and cuisine ratings
+
+    Accepts the Supabase preferences (priorities dict 0-100, cuisine_ratings,
+    dietary_restrictions, avoid_ingredients) and the profile's own lists
+    (dietary, favorite_cuisines, priorities as words).
+    """
+    prefs = {**(user_data.preferences or {}), **(user_preferences or {})}
+
+    weights = {"speed": 50.0, "budget": 50.0, "health": 50.0, "social": 50.0}
+    priorities = prefs.get("priorities") or {}
+    if isinstance(priorities, dict):
+        weights.update({key: float(value) for key, value in priorities.items() if key in weights})
+    else:
+        for word in priorities:
+            key = PRIORITY_WORDS.get(str(word).lower())
+            if key:
+                weights[key] = 80.0
+
+    diets = {
+        str(diet).strip().lower()
+        for diet in [*(prefs.get("dietary_restrictions") or []), *(prefs.get("dietary") or [])]
+    }
+    diets = {diet for diet in diets if diet in DIET_EXCLUDES}
+
+    avoid_categories: Set[str] = set().union(*(DIET_EXCLUDES[diet] for diet in diets)) if diets else set()
+    allergy_categories: Set[str] = set().union(*(DIET_EXCLUDES[diet] for diet in diets & ALLERGY_DIETS))
+    avoid_words: Set[str] = set()
+    for ingredient in prefs.get("avoid_ingredients") or []:
+        word = str(ingredient).strip().lower()
+        if word in AVOID_CATEGORIES:
+            avoid_categories.add(AVOID_CATEGORIES[word])
+        elif word:
+            avoid_words.add(word)
+
+    cuisine_ratings = {str(k): int(v) for k, v in (prefs.get("cuisine_ratings") or {}).items()}
+    for cuisine in prefs.get("favorite_cuisines") or []:
+        cuisine_ratings.setdefault(str(cuisine), 4)
+
+    return {
+        "weights": weights,
+        "diets": diets,
+        "avoid_categories": avoid_categories,
+        "allergy_categories": allergy_categories,
+        "avoid_words": avoid_words,
+        "cuisine_ratings": cuisine_ratings,
+    }
+
+
+class Recommender:
+    """
+    Filters every dining hall menu item against the user's diet and avoided
+    ingredients, then ranks what is left by their priority weights
+
+    Each candidate gets 0-1 component scores:
+        speed   shorter wait (0 at 30+ min)
+        budget  meal-swipe savings, boosted when many swipes go unused
+        health  the dish's health rating
+        social  crowd level (busy halls for social eaters)
+        cuisine the user's star rating for the dish's cuisine
+    combined as a weighted mean using the 0-100 priorities (cuisine counts
+    as a fixed 50). Speed > 70 keeps only halls under a 10 minute wait when
+    any qualify. Pescatarians get a bonus for fish dishes.
+
+    Meals rank before drinks and snacks. Menu names rarely list every
+    ingredient: dishes that may contain an allergen (ALLERGY_DIETS) or whose
+    names aren't fully understood are left out for those users unless nothing
+    else is left; otherwise such dishes are kept but marked
+    diet_verified=False and ranked after the verified ones.
+    """
+
+    def __init__(self, top_k: int, prompt_candidates: int):
+        self.top_k = top_k
+        self.prompt_candidates = prompt_candidates
+
+        self._ranked = 0
+        self._local_served = 0
+        self._llm_fallbacks = 0
+        self._filtered_out = 0
+
+    def rank(
+        self,
+        user_data: UserProfile,
+        dining_halls: List[DiningHall],
+        user_preferences: Optional[dict] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Eligible (hall, item) candidates, best first, at most one per hall
+        until every hall has been used
+
+        Returns:
+            Dicts with hall, item, facts, score, components, use_swipe and savings
+        """
+        halls = {hall.name: hall for hall in dining_halls}
+        index = menu_index(tuple((hall.name, tuple(hall.current_menu)) for hall in dining_halls))
+        taste = user_taste(user_data, user_preferences)
+        weights = taste["weights"]
+
+        excluded = index.excluded(taste["avoid_categories"], taste["avoid_words"], taste["allergy_categories"])
+        eligible = [position for position in range(len(index.entries)) if position not in excluded]
+        if not eligible and taste["allergy_categories"]:
+            # Nothing is certainly safe: offer the dishes that only might not be (flagged unverified)
+            excluded = index.excluded(taste["avoid_categories"], taste["avoid_words"])
+            eligible = [position for position in range(len(index.entries)) if position not in excluded]
+        self._ranked += 1
+        self._filtered_out += len(excluded)
+
+        if weights["speed"] > SPEED_PRIORITY_STRICT:
+            quick = [p for p in eligible if halls[index.entries[p][0]].wait_time < SPEED_MAX_WAIT]
+            eligible = quick or eligible
+
+        # Many unused swipes per remaining week -> using one is worth more
+        swipes_per_week = user_data.swipes_remaining / max(user_data.weeks_remaining, 1)
+        swipe_urgency = min(1.0, swipes_per_week / 14)
+
+        candidates = []
+        for position in eligible:
+            hall_name, item, facts = index.entries[position]
+            hall = halls[hall_name]
+            use_swipe = hall.accepts_swipes and user_data.swipes_remaining > 0
+            savings = facts["price"] if use_swipe else 0.0
+
+            rating = taste["cuisine_ratings"].get(facts["cuisine"] or "", 3)
+            components = {
+                "speed": max(0.0, 1 - hall.wait_time / 30),
+                "budget": (0.6 + 0.4 * swipe_urgency) * savings / 16 if use_swipe else 0.0,
+                "health": facts["health"],
+                "social": CROWD_SCORES.get(hall.crowd_level, 0.5),
+                "cuisine": (rating - 1) / 4,
+            }
+            total_weight = sum(weights.values()) + 50
+            score = (sum(weights[key] * components[key] for key in weights) + 50 * components["cuisine"]) / total_weight
+
+            if "pescatarian" in taste["diets"] and "fish" in facts["contains"]:
+                score += 0.1
+            if not facts["known"]:
+                score *= 0.85
+
+            candidates.append({
+                "hall": hall_name,
+                "item": item,
+                "facts": facts,
+                "score": round(score, 4),
+                "components": components,
+                "use_swipe": use_swipe,
+                "savings": savings,
+                "wait_time": hall.wait_time,
+                "diet_verified": index.diet_verified(position, taste["avoid_categories"]),
+            })
+
+        candidates.sort(key=lambda c: (c["facts"]["meal"], c["diet_verified"], c["score"]), reverse=True)
+
+        # Spread across halls first, then fill with the remaining best
+        seen_halls: Set[str] = set()
+        diverse, rest = [], []
+        for candidate in candidates:
+            (rest if candidate["hall"] in seen_halls else diverse).append(candidate)
+            seen_halls.add(candidate["hall"])
+        ordered = diverse + rest
+        return ordered[:limit] if limit else ordered
+
+    def prompt_options(self, candidates: List[Dict[str, Any]], dining_halls: List[DiningHall]) -> str:
+        """Compact prompt listing of the top candidates, one line each"""
+        halls = {hall.name: hall for hall in dining_halls}
+        lines = []
+        for number, candidate in enumerate(candidates[:self.prompt_candidates], start=1):
+            hall = halls[candidate["hall"]]
+            cuisine = f" ({candidate['facts']['cuisine']})" if candidate["facts"]["cuisine"] else ""
+            payment = f"swipe saves ${candidate['savings']:.0f}" if candidate["use_swipe"] else "flex only"
+            unverified = "" if candidate["diet_verified"] else " | diet unverified"
+            lines.append(
+                f"{number}. {candidate['hall']}: {candidate['item']}{cuisine} | {hall.wait_time} min wait | "
+                f"{hall.crowd_level} crowd | {hall.distance} | {payment} | match {candidate['score']:.2f}{unverified}"
+            )
+        return "\n".join(lines)
+
+    def recommend(
+        self,
+        user_data: UserProfile,
+        dining_halls: List[DiningHall],
+        user_preferences: Optional[dict] = None,
+        fallback: bool = False
+    ) -> List[Recommendation]:
+        """
+        Top-k Recommendations built locally, no LLM involved
+
+        Args:
+            fallback: True when standing in for a failed/slow LLM call (counted separately)
+        """
+        if fallback:
+            self._llm_fallbacks += 1
+        else:
+            self._local_served += 1
+
+        taste = user_taste(user_data, user_preferences)
+        return [
+            Recommendation(
+                dining_hall=candidate["hall"],
+                meal=candidate["item"],
+                reasoning=self._reasoning(candidate, taste),
+                emoji=candidate["facts"]["emoji"],
+                savings_amount=candidate["savings"],
+                use_swipe=candidate["use_swipe"]
+            )
+            for candidate in self.rank(user_data, dining_halls, user_preferences, limit=self.top_k)
+        ]
+
+    @staticmethod
+    def _reasoning(candidate: Dict[str, Any], taste: Dict[str, Any]) -> str:
+        weights = taste["weights"]
+        facts = candidate["facts"]
+        reasons = []
+
+        if candidate["use_swipe"]:
+            reasons.append(f"Use a meal swipe here - saves about ${candidate['savings']:.0f} vs eating off-campus.")
+        else:
+            reasons.append("Flex only, but still a solid pick for you right now.")
+        if weights["speed"] > 60 and candidate["wait_time"] < SPEED_MAX_WAIT:
+            reasons.append(f"Just {candidate['wait_time']} min wait right now, which fits your speed priority.")
+        if weights["health"] > 60 and facts["health"] >= 0.7:
+            reasons.append("A lighter, healthy option that matches your health priority.")
+        rating = taste["cuisine_ratings"].get(facts["cuisine"] or "", 0)
+        if rating >= 4:
+            reasons.append(f"{facts['cuisine']} is one of your favorite cuisines.")
+        if not candidate["diet_verified"]:
+            restrictions = f"{', '.join(sorted(taste['diets']))} diet" if taste["diets"] else "avoided ingredients"
+            reasons.append(f"The menu doesn't list every ingredient - check with staff that it suits your {restrictions}.")
+        elif taste["diets"]:
+            reasons.append(f"Fits your {', '.join(sorted(taste['diets']))} diet.")
+
+        return " ".join(reasons)
+
+    def stats(self) -> Dict[str, Any]:
+        """Ranking counters and index cache usage for /metrics"""
+        index_cache = menu_index.cache_info()
+        return {
+            "ranked": self._ranked,
+            "local_served": self._local_served,
+            "llm_fallbacks": self._llm_fallbacks,
+            "filtered_out": self._filtered_out,
+            "index_cache": {"hits": index_cache.hits, "misses": index_cache.misses, "size": index_cache.currsize},
+        }
+
+
+recommender = Recommender(top_k=RECOMMENDER_TOP_K, prompt_candidates=RECOMMENDER_PROMPT_CANDIDATES)
@@ -0,0 +1,326 @@
+"""
+Circuit breakers, bounded retries and hedged requests for upstream calls
+A slow or failing upstream is answered by the caller's fallback in microseconds
+instead of holding a worker for the full HTTP timeout
+"""
+
+import asyncio
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from src import deadline
+from src.deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Retry backoff: full jitter, uniform(0, min(max, base * 2**attempt)) seconds (override via .env)
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.2"))
+RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "2.0"))
+
+# Latency window for the p95 SLO check, and the samples needed before it applies
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "50"))
+BREAKER_MIN_SAMPLES = int(os.getenv("BREAKER_MIN_SAMPLES", "10"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Per-upstream breaker: closed -> open -> half-open -> closed
+
+    The breaker opens after failure_threshold consecutive failures, or when
+    the p95 latency of the last BREAKER_WINDOW calls exceeds slo_p95_ms. While
+    open every call is rejected; after reset_seconds one probe call is let
+    through (half-open) and its outcome closes or re-opens the breaker. The
+    latency window is cleared on opening, so the SLO is judged on fresh calls.
+    Thread-safe (Visa calls run in worker threads).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float, slo_p95_ms: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slo_p95_ms = slo_p95_ms
+
+        self.state = self.CLOSED
+        self.reason: Optional[str] = None
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=BREAKER_WINDOW)
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._opened = 0
+        self._rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (claims the probe slot when half-open)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self._opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_started = None
+
+            # One probe at a time; a probe that never reported back is replaced after reset_seconds
+            if self.state == self.HALF_OPEN and (
+                self._probe_started is None or now - self._probe_started >= self.reset_seconds
+            ):
+                self._probe_started = now
+                return True
+
+            self._rejected += 1
+            return False
+
+    def record(self, ok: bool, seconds: float) -> None:
+        """Report the outcome and latency of a call that allow() let through"""
+        with self._lock:
+            if not ok:
+                self._consecutive_failures += 1
+                if self.state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                    self._open(f"{self._consecutive_failures} consecutive failures")
+                return
+
+            self._consecutive_failures = 0
+            if self.state == self.HALF_OPEN:
+                if seconds * 1000 > self.slo_p95_ms:
+                    self._open(f"probe took {seconds * 1000:.0f} ms")
+                    return
+                self.state = self.CLOSED
+                self.reason = None
+                logger.info(f"{self.name} circuit closed")
+
+            self._latencies.append(seconds * 1000)
+            p95 = self.p95_ms()
+            if p95 is not None and p95 > self.slo_p95_ms:
+                self._open(f"p95 {p95:.0f} ms over the {self.slo_p95_ms:.0f} ms SLO")
+
+    def p95_ms(self) -> Optional[float]:
+        """p95 of the latency window, or None until it has BREAKER_MIN_SAMPLES calls"""
+        if len(self._latencies) < BREAKER_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[math.ceil(0.95 * len(ordered)) - 1]
+
+    def _open(self, reason: str) -> None:
+        if self.state != self.OPEN:
+            self._opened += 1
+            logger.warning(f"{self.name} circuit opened: {reason}")
+        self.state = self.OPEN
+        self.reason = reason
+        self._opened_at = time.monotonic()
+        self._probe_started = None
+        self._latencies.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state for /metrics"""
+        with self._lock:
+            p95 = self.p95_ms()
+            return {
+                "state": self.state,
+                "reason": self.reason,
+                "consecutive_failures": self._consecutive_failures,
+                "p95_ms": round(p95, 1) if p95 is not None else None,
+                "slo_p95_ms": self.slo_p95_ms,
+                "samples": len(self._latencies),
+                "opened": self._opened,
+                "rejected": self._rejected
+            }
+
+
+class Upstream:
+    """
+    Resilience policy for one upstream service
+
+    Every call passes its circuit breaker (CircuitOpenError when open, so the
+    caller serves its fallback at once). Failed attempts are retried up to
+    `retries` times with full-jitter backoff when retryable(exc) says the error
+    is transient (or resend(exc), when given: for requests that aren't
+    idempotent, only errors where the upstream provably did not process
+    them should be sent again). With hedge_after > 0,
+    async calls still running after hedge_after seconds get a second, parallel
+    attempt and the first success wins.
+
+    Errors for which retryable() is False (e.g. a 401) mean the upstream is
+    reachable, so they do not count against the breaker.
+
+    Attempts run within the request deadline (see src.deadline): an attempt
+    still running when it passes is cancelled, an error after it has passed is
+    reported as DeadlineExceeded, and no retry is started whose backoff would
+    outlast the budget. Missed deadlines do not count against the breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        retryable: Callable[[BaseException], bool],
+        retries: int = 0,
+        resend: Optional[Callable[[BaseException], bool]] = None,
+        hedge_after: float = 0.0,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        slo_p95_ms: float = 10000.0
+    ):
+        self.name = name
+        self.retryable = retryable
+        self.retries = retries
+        self.resend = resend or retryable
+        self.hedge_after = hedge_after
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_seconds, slo_p95_ms)
+
+        self._calls = 0
+        self._attempts = 0
+        self._retries = 0
+        self._failures = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+
+    def admit(self) -> float:
+        """
+        Start one attempt: returns its start time for record()
+
+        Raises:
+            CircuitOpenError: If the breaker rejects the call
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit open ({self.breaker.reason})")
+        self._attempts += 1
+        return time.perf_counter()
+
+    def record(self, error: Optional[BaseException], started: float) -> None:
+        """Finish an attempt begun with admit() (error=None on success)"""
+        failed = error is not None and self.retryable(error)
+        if failed:
+            self._failures += 1
+        self.breaker.record(not failed, time.perf_counter() - started)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
+
+    def _retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """Backoff before the next attempt, or None if error should be raised"""
+        if attempt >= self.retries or isinstance(error, CircuitOpenError) or not self.resend(error):
+            return None
+        if self.breaker.state == CircuitBreaker.OPEN:
+            # This failure tripped the breaker: report it rather than a CircuitOpenError
+            return None
+        delay = self._backoff(attempt)
+        left = deadline.remaining()
+        if left is not None and delay >= left:
+            return None
+        self._retries += 1
+        return delay
+
+    def _failed(self, error: Exception, started: float) -> Exception:
+        """Record a failed attempt; returns the exception to raise"""
+        if isinstance(error, DeadlineExceeded):
+            return error
+        if deadline.expired():
+            # Most likely a timeout sized from the budget; not the upstream's fault
+            return deadline.exceeded(self.name)
+        self.record(error, started)
+        return error
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await fn() under the breaker, retry and hedging policy"""
+        self._calls += 1
+        attempt = 0
+        while True:
+            try:
+                if self.hedge_after > 0:
+                    return await self._hedged(fn)
+                return await self._attempt(fn)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def call_sync(self, fn: Callable[[], T]) -> T:
+        """call() for blocking functions (no hedging); run it in a worker thread"""
+        self._calls += 1
+        attempt = 0
+        while True:
+            deadline.check(self.name)
+            started = self.admit()
+            try:
+                result = fn()
+            except Exception as e:
+                error = self._failed(e, started)
+                if error is not e:
+                    raise error from e
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.record(None, started)
+            return result
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]]) -> T:
+        deadline.check(self.name)
+        started = self.admit()
+        try:
+            result = await deadline.within(fn(), self.name)
+        except asyncio.CancelledError:
+            # A lost hedge or a cancelled caller says nothing about the upstream
+            raise
+        except Exception as e:
+            error = self._failed(e, started)
+            if error is not e:
+                raise error from e
+            raise
+        self.record(None, started)
+        return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        primary = asyncio.ensure_future(self._attempt(fn))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        self._hedges += 1
+        hedge = asyncio.ensure_future(self._attempt(fn))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._hedge_wins += 1
+                        return task.result()
+            # Both attempts failed: report the primary's error
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state and retry / hedge counters for /metrics"""
+        return {
+            **self.breaker.stats(),
+            "calls": self._calls,
+            "attempts": self._attempts,
+            "failures": self._failures,
+            "retries": self._retries,
+            "hedges": self._hedges,
+            "hedge_wins": self._hedge_wins
+        }
@@ -0,0 +1,513 @@
+"""
+Per-user spending rollup cube
+Daily/weekly/monthly totals and counts by category, location and type,
+maintained incrementally as transactions arrive
+"""
+
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.cache import LRUCache
+
+if TYPE_CHECKING:
+    # pandas is only needed for non-'Z' timestamps and forecast frames; import it on first use
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Rollup store configuration (override via .env)
+ROLLUP_MAX_USERS = int(os.getenv("ROLLUP_MAX_USERS", "1000"))
+ROLLUP_TTL = float(os.getenv("ROLLUP_TTL", "86400"))
+
+ROLLUP_FIELDS = ("category", "location", "type")
+ROLLUP_GRAINS = ("day", "week", "month")
+
+# (grain, field, value) -> {period start day number: [total, count]}; field/value None = all spending
+CellKey = Tuple[str, Optional[str], Optional[str]]
+
+
+def parse_days(dates: List[Any]) -> np.ndarray:
+    """
+    Parse transaction timestamps to UTC day numbers (days since 1970-01-01)
+
+    UTC 'Z' stamps (what the app and mock_data produce) only need their
+    YYYY-MM-DD prefix, which NumPy parses directly. Anything else goes
+    through pandas' fixed-format ISO 8601 parser (timezone-naive stamps are
+    taken as UTC), falling back to format inference for non-ISO input.
+
+    Args:
+        dates: Timestamp strings
+
+    Returns:
+        int64 array of day numbers
+    """
+    if all(isinstance(date, str) and date.endswith('Z') for date in dates):
+        try:
+            day_prefixes: np.ndarray = np.array([date[:10] for date in dates], dtype='datetime64[D]')
+            return day_prefixes.astype(np.int64)
+        except ValueError:
+            pass
+
+    import pandas as pd
+
+    parsed: pd.DatetimeIndex
+    try:
+        parsed = pd.to_datetime(dates, format='ISO8601', utc=True)
+    except (ValueError, TypeError):
+        parsed = pd.to_datetime(dates, utc=True)
+
+    days: np.ndarray = parsed.tz_localize(None).to_numpy(dtype='datetime64[D]').astype(np.int64)
+    return days
+
+
+def period_starts(days: np.ndarray, grain: str) -> np.ndarray:
+    """Map day numbers to the first day of their day/week (Monday)/month"""
+    if grain == "day":
+        return days
+    if grain == "week":
+        # 1970-01-01 was a Thursday, so Monday-based weekday is (day + 3) % 7
+        return days - (days + 3) % 7
+    if grain == "month":
+        return days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    raise ValueError(f"Unknown grain: {grain}")
+
+
+def transaction_key(transaction: Dict[str, Any]) -> Optional[str]:
+    """
+    Identity used to skip transactions the rollup has already counted: the
+    transaction id, or None for id-less transactions (which are never deduplicated)
+    """
+    transaction_id = transaction.get("id")
+    return None if transaction_id is None else str(transaction_id)
+
+
+def transaction_content(transaction: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Everything the rollup counts for a transaction, to notice one edited in place"""
+    return (transaction.get("date"), transaction.get("amount")) + tuple(
+        transaction.get(name) for name in ROLLUP_FIELDS
+    )
+
+
+def has_ids(transactions: List[Dict[str, Any]]) -> bool:
+    """Whether every transaction has an id (so a rollup can be synced incrementally)"""
+    return all(transaction.get("id") is not None for transaction in transactions)
+
+
+def rollup_user_id(data: Dict[str, Any]) -> Optional[str]:
+    """Rollup owner for a request payload (UserData id), or None"""
+    user_id = (data.get("UserData") or {}).get("id")
+    return str(user_id) if user_id else None
+
+
+class UserRollup:
+    """
+    One user's spending cube
+
+    Every append parses only the unseen transactions and folds them into
+    per-period (total, count) cells for the overall series and for each
+    value of category/location/type, at day, week and month grain, so
+    updates cost O(new rows) and reads never rescan the history.
+
+    Transactions are told apart by id only; the content counted for each id
+    is kept so a transaction edited in place is noticed.
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.version = 0
+
+        self._lock = threading.Lock()
+        self._seen: Dict[str, Tuple[Any, ...]] = {}
+        self._anonymous = 0
+        self._fields_seen: set = set()
+        self._cells: Dict[CellKey, Dict[int, List[float]]] = {}
+        self._frames: Dict[Tuple[Optional[str], Optional[str]], 'pd.DataFrame'] = {}
+
+    @property
+    def transaction_count(self) -> int:
+        return len(self._seen) + self._anonymous
+
+    def append(self, transactions: List[Dict[str, Any]]) -> int:
+        """
+        Fold in new transactions; returns how many were added
+
+        Ids already counted are skipped (so retries are safe); id-less
+        transactions are always added.
+
+        Raises:
+            ValueError: If an id already counted arrives with different content
+                (an edit needs the full history, see sync)
+        """
+        with self._lock:
+            rows: Dict[str, Dict[str, Any]] = {}
+            anonymous: List[Dict[str, Any]] = []
+            for transaction in transactions:
+                key = transaction_key(transaction)
+                if key is None:
+                    anonymous.append(transaction)
+                    continue
+                counted = self._seen.get(key)
+                if counted is not None and counted != transaction_content(transaction):
+                    raise ValueError(f"transaction {key} was already counted with different content")
+                if counted is None:
+                    rows.setdefault(key, transaction)
+
+            self._fold_locked(list(rows.values()) + anonymous)
+            self._seen.update((key, transaction_content(t)) for key, t in rows.items())
+            self._anonymous += len(anonymous)
+            return len(rows) + len(anonymous)
+
+    def sync(self, transactions: List[Dict[str, Any]]) -> int:
+        """
+        Bring the rollup in line with a full transaction history
+
+        Transactions with unseen ids are appended. If the history no longer
+        holds every counted id with the same content (deleted or edited rows),
+        or has id-less transactions that can't be matched, the cube is rebuilt
+        from scratch.
+
+        Returns:
+            Number of transactions folded in
+        """
+        with self._lock:
+            added = self._extend_locked(transactions)
+            if added is not None:
+                return added
+
+            logger.info(f"Rollup for {self.user_id} out of date, rebuilding")
+            self._reset_locked()
+            if not has_ids(transactions):
+                self._fold_locked(transactions)
+                self._anonymous = len(transactions)
+                return len(transactions)
+            added = self._extend_locked(transactions)
+            return added or 0
+
+    def sync_frame(
+        self,
+        transactions: List[Dict[str, Any]],
+        field: Optional[str] = None,
+        value: Optional[str] = None
+    ) -> Optional[Tuple[int, 'pd.DataFrame']]:
+        """
+        Extend the rollup with a history and read its daily series in one step
+
+        Unlike sync this never rebuilds: a history that isn't a superset of
+        what was counted (truncated, filtered or edited) returns None, so the
+        caller computes that payload on its own and the shared cube is left
+        as it is.
+
+        Returns:
+            (transactions folded in, daily_frame(field, value)), or None
+
+        Raises:
+            ValueError: As daily_frame
+        """
+        with self._lock:
+            added = self._extend_locked(transactions)
+            if added is None:
+                return None
+            return added, self._daily_frame_locked(field, value)
+
+    def sync_groups(
+        self,
+        transactions: List[Dict[str, Any]],
+        field: str
+    ) -> Optional[Tuple[int, Tuple['pd.DataFrame', Dict[str, 'pd.DataFrame']]]]:
+        """(transactions folded in, group_frames(field)) in one step; None as for sync_frame"""
+        with self._lock:
+            added = self._extend_locked(transactions)
+            if added is None:
+                return None
+            return added, self._group_frames_locked(field)
+
+    def _extend_locked(self, transactions: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Append the unseen ids of a history that holds every counted id unchanged
+
+        Returns:
+            Number of transactions folded in, or None (nothing changed) if the
+            history has id-less rows or misses or edits a counted transaction
+        """
+        if self._anonymous or not has_ids(transactions):
+            return None
+
+        latest: Dict[str, Dict[str, Any]] = {}
+        for transaction in transactions:
+            latest.setdefault(str(transaction["id"]), transaction)
+
+        if any(
+            key not in latest or transaction_content(latest[key]) != content
+            for key, content in self._seen.items()
+        ):
+            return None
+
+        rows = {key: t for key, t in latest.items() if key not in self._seen}
+        self._fold_locked(list(rows.values()))
+        self._seen.update((key, transaction_content(t)) for key, t in rows.items())
+        return len(rows)
+
+    def _reset_locked(self) -> None:
+        self._seen.clear()
+        self._anonymous = 0
+        self._fields_seen.clear()
+        self._cells.clear()
+        self._frames.clear()
+        self.version += 1
+
+    def _fold_locked(self, new_rows: List[Dict[str, Any]]) -> None:
+        """Add rows to the cells (no dedup; the caller records what was counted)"""
+        if not new_rows:
+            return
+
+        # Parse everything before touching a cell, so a bad batch leaves the cube untouched
+        days = parse_days([t["date"] for t in new_rows])
+        # Missing amounts count as zero, matching preprocess_data
+        amounts = np.nan_to_num(np.array([t.get("amount") for t in new_rows], dtype=np.float64), nan=0.0)
+
+        field_columns: List[Tuple[str, np.ndarray, np.ndarray, np.ndarray]] = []
+        for field in ROLLUP_FIELDS:
+            values = [t.get(field) for t in new_rows]
+            present = np.array([value is not None for value in values], dtype=bool)
+            if not present.any():
+                continue
+            self._fields_seen.add(field)
+            labels = np.array([str(value) for value in values], dtype=object)[present]
+            names, group_index = np.unique(labels, return_inverse=True)
+            field_columns.append((field, present, names, group_index.ravel()))
+
+        no_group = np.zeros(len(days), dtype=np.int64)
+        for grain in ROLLUP_GRAINS:
+            periods = period_starts(days, grain)
+            self._merge(grain, None, None, no_group, periods, amounts)
+            for field, present, names, group_index in field_columns:
+                self._merge(grain, field, names, group_index, periods[present], amounts[present])
+
+        self._frames.clear()
+        self.version += 1
+
+    def _merge(
+        self,
+        grain: str,
+        field: Optional[str],
+        names: Optional[np.ndarray],
+        group_index: np.ndarray,
+        periods: np.ndarray,
+        amounts: np.ndarray
+    ) -> None:
+        """Add one batch's (group, period) sums into the stored cells"""
+        cells, inverse = np.unique(np.stack([group_index, periods], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        totals = np.bincount(inverse, weights=amounts, minlength=len(cells))
+        counts = np.bincount(inverse, minlength=len(cells))
+
+        for (group, period), total, count in zip(cells.tolist(), totals.tolist(), counts.tolist()):
+            value = None if names is None else names[group]
+            cell = self._cells.setdefault((grain, field, value), {}).setdefault(period, [0.0, 0])
+            cell[0] += total
+            cell[1] += count
+
+    def values(self, field: str) -> List[str]:
+        """Every value seen for a field, sorted"""
+        with self._lock:
+            return self._values_locked(field)
+
+    def _values_locked(self, field: str) -> List[str]:
+        return sorted(value for (grain, f, value) in self._cells if grain == "day" and f == field)
+
+    def series(
+        self,
+        grain: str = "day",
+        field: Optional[str] = None,
+        value: Optional[str] = None
+    ) -> List[Tuple[int, float, int]]:
+        """(period start day number, total, count) rows for one slice, oldest first"""
+        if grain not in ROLLUP_GRAINS:
+            raise ValueError(f"Unknown grain: {grain}")
+        with self._lock:
+            cells = self._cells.get((grain, field, value), {})
+            return [(period, cell[0], int(cell[1])) for period, cell in sorted(cells.items())]
+
+    def daily_frame(self, field: Optional[str] = None, value: Optional[str] = None) -> 'pd.DataFrame':
+        """
+        Daily 'ds'/'y' series in the same shape as prediction.preprocess_data
+
+        Raises:
+            ValueError: If the rollup is empty, the field was never seen, or
+                no transaction matches the value
+        """
+        with self._lock:
+            return self._daily_frame_locked(field, value)
+
+    def _daily_frame_locked(self, field: Optional[str], value: Optional[str]) -> 'pd.DataFrame':
+        if not self.transaction_count:
+            raise ValueError("No transactions found in data")
+        if field is not None and field not in self._fields_seen:
+            raise ValueError(f"Invalid filter_type: {field}")
+
+        frame = self._frames.get((field, value))
+        if frame is None:
+            cells = self._cells.get(("day", field, value))
+            if not cells:
+                raise ValueError(f"No transactions match filter: {field}={value}")
+            import pandas as pd
+
+            days = np.fromiter(sorted(cells), dtype=np.int64, count=len(cells))
+            frame = pd.DataFrame({
+                "ds": days.astype("datetime64[D]").astype("datetime64[ns]"),
+                "y": np.array([cells[day][0] for day in days.tolist()], dtype=np.float64)
+            })
+            self._frames[(field, value)] = frame
+
+        return frame.copy()
+
+    def group_frames(self, field: str) -> Tuple['pd.DataFrame', Dict[str, 'pd.DataFrame']]:
+        """Total plus per-value daily series, like prediction.preprocess_groups"""
+        with self._lock:
+            return self._group_frames_locked(field)
+
+    def _group_frames_locked(self, field: str) -> Tuple['pd.DataFrame', Dict[str, 'pd.DataFrame']]:
+        if field not in self._fields_seen:
+            raise ValueError(f"Invalid group_by: {field}")
+        total = self._daily_frame_locked(None, None)
+        return total, {value: self._daily_frame_locked(field, value) for value in self._values_locked(field)}
+
+    def chart(self, grain: str = "week", group_by: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Chart-ready rollup: total and (optionally) per-group amount/count per period
+
+        Every group is reported over the same period axis, with zeros where
+        it had no spending, so charts can stack or switch periods directly.
+        """
+        if group_by is not None and group_by not in ROLLUP_FIELDS:
+            raise ValueError(f"Invalid group_by: {group_by}")
+
+        total = self.series(grain)
+        period_days = [period for period, _, _ in total]
+        periods = np.datetime_as_string(np.array(period_days, dtype="datetime64[D]"), unit="D").tolist()
+
+        def points(rows: List[Tuple[int, float, int]]) -> List[Dict[str, Any]]:
+            by_period = {period: (amount, count) for period, amount, count in rows}
+            return [
+                {
+                    "period": label,
+                    "amount": round(by_period.get(day, (0.0, 0))[0], 2),
+                    "count": by_period.get(day, (0.0, 0))[1]
+                }
+                for day, label in zip(period_days, periods)
+            ]
+
+        chart: Dict[str, Any] = {
+            "user_id": self.user_id,
+            "grain": grain,
+            "group_by": group_by,
+            "periods": periods,
+            "total": points(total)
+        }
+        if group_by is not None:
+            chart["groups"] = {
+                value: points(self.series(grain, group_by, value)) for value in self.values(group_by)
+            }
+        return chart
+
+
+class RollupStore:
+    """
+    Bounded set of per-user rollups
+
+    Least recently used users are evicted past max_users (and idle ones
+    after ttl_seconds); an evicted rollup is simply rebuilt from the next
+    full history it is synced with.
+    """
+
+    def __init__(self, max_users: int = 1000, ttl_seconds: float = 86400.0):
+        self._rollups = LRUCache(max_entries=max_users, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._rows_added = 0
+        self._syncs = 0
+        self._appends = 0
+
+    def get(self, user_id: str) -> Optional[UserRollup]:
+        """The user's rollup, or None if there isn't one"""
+        return self._rollups.get(user_id)
+
+    def _get_or_create(self, user_id: str) -> UserRollup:
+        with self._lock:
+            rollup = self._rollups.get(user_id)
+            if rollup is None:
+                rollup = UserRollup(user_id)
+            # Re-put on every access so an active user's TTL keeps sliding
+            self._rollups.put(user_id, rollup)
+            return rollup
+
+    def sync(self, user_id: str, transactions: List[Dict[str, Any]]) -> UserRollup:
+        """Sync a user's rollup with their full transaction history"""
+        rollup = self._get_or_create(user_id)
+        self._record_sync(rollup, rollup.sync(transactions))
+        return rollup
+
+    def sync_frame(
+        self,
+        user_id: str,
+        transactions: List[Dict[str, Any]],
+        field: Optional[str] = None,
+        value: Optional[str] = None
+    ) -> Optional['pd.DataFrame']:
+        """UserRollup.sync_frame on a user's rollup (None: compute the payload on its own)"""
+        rollup = self._get_or_create(user_id)
+        synced = rollup.sync_frame(transactions, field, value)
+        if synced is None:
+            return None
+        self._record_sync(rollup, synced[0])
+        return synced[1]
+
+    def sync_groups(
+        self,
+        user_id: str,
+        transactions: List[Dict[str, Any]],
+        field: str
+    ) -> Optional[Tuple['pd.DataFrame', Dict[str, 'pd.DataFrame']]]:
+        """UserRollup.sync_groups on a user's rollup (None: compute the payload on its own)"""
+        rollup = self._get_or_create(user_id)
+        synced = rollup.sync_groups(transactions, field)
+        if synced is None:
+            return None
+        self._record_sync(rollup, synced[0])
+        return synced[1]
+
+    def _record_sync(self, rollup: UserRollup, added: int) -> None:
+        with self._lock:
+            self._syncs += 1
+            self._rows_added += added
+        if added:
+            logger.info(f"Rollup for {rollup.user_id}: +{added} transactions ({rollup.transaction_count} total)")
+
+    def append(self, user_id: str, transactions: List[Dict[str, Any]]) -> Tuple[UserRollup, int]:
+        """Add new transactions to a user's rollup; returns (rollup, rows added)"""
+        rollup = self._get_or_create(user_id)
+        added = rollup.append(transactions)
+        with self._lock:
+            self._appends += 1
+            self._rows_added += added
+        return rollup, added
+
+    def stats(self) -> Dict[str, Any]:
+        """Store size and update counters for /metrics"""
+        cache_stats = self._rollups.stats()
+        with self._lock:
+            return {
+                "users": cache_stats["size"],
+                "max_users": cache_stats["max_entries"],
+                "lookups_hit_rate": cache_stats["hit_rate"],
+                "evictions": cache_stats["evictions"] + cache_stats["expirations"],
+                "syncs": self._syncs,
+                "appends": self._appends,
+                "rows_added": self._rows_added
+            }
+
+
+rollup_store = RollupStore(max_users=ROLLUP_MAX_USERS, ttl_seconds=ROLLUP_TTL)
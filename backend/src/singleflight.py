@@ -0,0 +1,94 @@
+"""
+Single-flight request coalescing for upstream calls
+Concurrent calls with the same key share one in-flight request and its result
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from src import deadline
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# In-flight keys listed individually in stats()
+STATS_TOP_KEYS = 10
+
+
+class SingleFlight:
+    """
+    Async coalescer: the first caller for a key starts the upstream call and
+    everyone who asks for the same key while it is running awaits that call
+
+    The call runs as its own task, so a caller that disconnects (is cancelled)
+    never cancels the request other waiters depend on. The result object is
+    shared by every waiter and must be treated as read-only. Errors propagate
+    to all waiters and are not remembered: the next call after a failure goes
+    upstream again.
+
+    The call runs with no request deadline (each stage's default timeout still
+    applies): it serves every waiter, so one caller's short deadline must not
+    cut it short for the others. Each waiter gives up at its own deadline.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+        self._flights: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self._calls = 0
+        self._executions = 0
+        self._coalesced = 0
+        self._errors = 0
+        self._max_waiters = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Return fn()'s result, sharing one execution among concurrent callers with this key
+
+        Args:
+            key: Identity of the upstream request (equal keys = interchangeable requests)
+            fn: Zero-argument coroutine function that performs the request
+        """
+        self._calls += 1
+
+        flight = self._flights.get(key)
+        if flight is None:
+            self._executions += 1
+            flight = asyncio.ensure_future(deadline.detached(fn))
+            self._flights[key] = flight
+            self._waiters[key] = 1
+            flight.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._coalesced += 1
+            self._waiters[key] += 1
+
+        # Each waiter gives up at its own request deadline; the shared call carries on
+        return await deadline.within(asyncio.shield(flight), self.name)
+
+    def _finish(self, key: Hashable, flight: "asyncio.Task[Any]") -> None:
+        waiters = self._waiters.pop(key, 0)
+        self._flights.pop(key, None)
+        self._max_waiters = max(self._max_waiters, waiters)
+
+        # Mark the exception retrieved even if every waiter went away
+        if not flight.cancelled() and flight.exception() is not None:
+            self._errors += 1
+            if waiters > 1:
+                logger.warning(f"{self.name}: shared call failed for {waiters} waiters: {flight.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing counters and current per-key waiter counts for /metrics"""
+        busiest = sorted(self._waiters.items(), key=lambda item: item[1], reverse=True)[:STATS_TOP_KEYS]
+        return {
+            "in_flight": len(self._flights),
+            "calls": self._calls,
+            "executions": self._executions,
+            "coalesced": self._coalesced,
+            "coalesced_rate": round(self._coalesced / self._calls, 3) if self._calls else 0.0,
+            "errors": self._errors,
+            "max_waiters": self._max_waiters,
+            "waiters": {str(key): count for key, count in busiest}
+        }
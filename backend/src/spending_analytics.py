@@ -0,0 +1,274 @@
+"""
+Local spending analytics - vectorised metrics over a student's full transaction history
+Feeds compact aggregates to the analysis prompt (instead of raw transactions),
+and can fill a SpendingAnalysis on its own when no LLM call is wanted
+"""
+
+import os
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.models import SpendingAnalysis, Transaction, UserProfile
+from src.rollup import parse_days
+
+SEMESTER_WEEKS = 16
+
+# Value of one meal swipe in $, and the largest non-swipe purchase counted as
+# "could have been a swipe" when a transaction has no meal category (override via .env)
+SWIPE_VALUE = float(os.getenv("SWIPE_VALUE", "12"))
+SWIPE_REPLACEABLE_MAX = float(os.getenv("SWIPE_REPLACEABLE_MAX", "20"))
+
+# Merchants / categories and trailing weeks listed in the prompt (keeps its size bounded)
+ANALYTICS_TOP_N = int(os.getenv("ANALYTICS_TOP_N", "5"))
+ANALYTICS_RECENT_WEEKS = int(os.getenv("ANALYTICS_RECENT_WEEKS", "8"))
+
+# Categories a dining hall swipe covers
+MEAL_CATEGORIES = frozenset({"breakfast", "brunch", "lunch", "dinner", "meal"})
+
+
+def _days(timestamps: List[str]) -> np.ndarray:
+    """Day numbers; weekly buckets only need the ISO date prefix, so offsets are ignored"""
+    try:
+        return np.array([ts[:10] for ts in timestamps], dtype="datetime64[D]").astype(np.int64)
+    except ValueError:
+        return parse_days(timestamps)
+
+
+def _money(value: float) -> float:
+    return round(float(value), 2)
+
+
+def _concentration(labels: np.ndarray, amounts: np.ndarray, top_n: int) -> Dict[str, Any]:
+    """Top labels by spend, their share of it, and the Herfindahl index over all labels"""
+    if not len(labels) or amounts.sum() <= 0:
+        return {"top": [], "hhi": 0.0}
+    names, index = np.unique(labels, return_inverse=True)
+    totals = np.bincount(index, weights=amounts)
+    counts = np.bincount(index)
+    shares = totals / totals.sum()
+    order = np.argsort(-totals, kind="stable")[:top_n]
+    return {
+        "top": [
+            {"name": str(names[i]), "total": _money(totals[i]), "count": int(counts[i]), "share": round(float(shares[i]), 3)}
+            for i in order
+        ],
+        "hhi": round(float((shares ** 2).sum()), 3)
+    }
+
+
+class SpendingAnalytics:
+    """
+    Spending metrics computed with NumPy over every transaction, not just the latest 20
+
+    compute() returns a JSON-friendly dict:
+      swipes      - plan pace vs actual swipes per week, unused swipes per week
+                    (overall and for the trailing weeks of history) and the
+                    swipes projected to be left at the end of the semester
+      flex        - flex burn rate per week against the rate that lasts for
+                    weeks_remaining, and the balance left (or missing) at the end
+      idle_swipe_spend - meal-sized flex / off-campus purchases made in weeks
+                    the student used fewer swipes than their plan allows
+      merchants / categories - where non-swipe money goes, top shares and HHI
+
+    Weeks of history are counted back from the latest transaction.
+    """
+
+    def __init__(self, top_n: int = ANALYTICS_TOP_N, recent_weeks: int = ANALYTICS_RECENT_WEEKS):
+        self.top_n = top_n
+        self.recent_weeks = recent_weeks
+
+        self._computed = 0
+        self._transactions = 0
+        self._compute_seconds = 0.0
+        self._local_served = 0
+        self._llm_fallbacks = 0
+
+    def compute(self, user_data: UserProfile, transactions: List[Transaction]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        n = len(transactions)
+
+        amounts = np.fromiter((t.amount for t in transactions), dtype=np.float64, count=n)
+        types = np.array([t.type for t in transactions], dtype=object)
+        is_swipe = types == "swipe"
+        is_flex = types == "flex"
+        off_swipe = ~is_swipe
+        categories = np.array([(t.category or "").lower() for t in transactions], dtype=object)
+        is_meal = np.fromiter((c in MEAL_CATEGORIES for c in categories), dtype=bool, count=n)
+        replaceable = off_swipe & np.where(categories == "", amounts <= SWIPE_REPLACEABLE_MAX, is_meal)
+
+        if n:
+            days = _days([t.timestamp for t in transactions])
+            week = (days.max() - days) // 7  # 0 = the latest week
+            history_weeks = int(week.max()) + 1
+        else:
+            week = np.zeros(0, dtype=np.int64)
+            history_weeks = 0
+
+        # Per-week series (index 0 = latest week)
+        swipes_by_week = np.bincount(week, weights=is_swipe.astype(np.float64), minlength=history_weeks)
+        flex_by_week = np.bincount(week, weights=amounts * is_flex, minlength=history_weeks)
+
+        # Swipes: plan pace vs actual use
+        weeks_elapsed = max(1, SEMESTER_WEEKS - user_data.weeks_remaining)
+        plan_per_week = user_data.total_swipes / SEMESTER_WEEKS
+        used_per_week = user_data.swipes_used / weeks_elapsed
+        projected_unused = max(0.0, user_data.swipes_remaining - used_per_week * user_data.weeks_remaining)
+        unused_by_week = np.clip(plan_per_week - swipes_by_week, 0, None)
+        idle_weeks = swipes_by_week < plan_per_week
+        recent = slice(0, min(self.recent_weeks, history_weeks))
+
+        # Flex: burn rate vs what lasts until the end of the semester
+        flex_burn = user_data.flex_spent / weeks_elapsed
+        flex_balance_at_end = user_data.flex_remaining - flex_burn * user_data.weeks_remaining
+        recent_flex = flex_by_week[recent]
+
+        # Meal-sized non-swipe purchases in weeks with swipes to spare
+        idle_spend = replaceable & idle_weeks[week] if n else replaceable
+
+        self._computed += 1
+        self._transactions += n
+        self._compute_seconds += time.perf_counter() - started
+
+        return {
+            "transactions": n,
+            "history_weeks": history_weeks,
+            "totals": {
+                "spent": _money(amounts.sum()),
+                "swipe": _money(amounts[is_swipe].sum()),
+                "flex": _money(amounts[is_flex].sum()),
+                "other": _money(amounts[off_swipe & ~is_flex].sum())
+            },
+            "swipes": {
+                "plan_per_week": round(plan_per_week, 1),
+                "used_per_week": round(used_per_week, 1),
+                "unused_per_week": round(max(0.0, plan_per_week - used_per_week), 1),
+                "projected_unused": round(projected_unused),
+                "projected_unused_value": _money(round(projected_unused) * SWIPE_VALUE),
+                "recent_used": [int(x) for x in swipes_by_week[recent][::-1]],
+                "recent_unused_per_week": round(float(unused_by_week[recent].mean()), 1) if history_weeks else 0.0
+            },
+            "flex": {
+                "spent": _money(user_data.flex_spent),
+                "remaining": _money(user_data.flex_remaining),
+                "burn_per_week": _money(flex_burn),
+                "recent_burn_per_week": _money(recent_flex.mean()) if history_weeks else 0.0,
+                "sustainable_per_week": _money(user_data.flex_remaining / max(1, user_data.weeks_remaining)),
+                "weeks_left": round(user_data.flex_remaining / flex_burn, 1) if flex_burn > 0 else None,
+                "weeks_remaining": user_data.weeks_remaining,
+                "balance_at_end": _money(flex_balance_at_end)
+            },
+            "idle_swipe_spend": {
+                "amount": _money(amounts[idle_spend].sum()),
+                "purchases": int(idle_spend.sum()),
+                "weeks": int(np.unique(week[idle_spend]).size)
+            },
+            "merchants": _concentration(
+                np.array([t.merchant for t in transactions], dtype=object)[off_swipe], amounts[off_swipe], self.top_n
+            ),
+            "categories": _concentration(categories[off_swipe & (categories != "")],
+                                         amounts[off_swipe & (categories != "")], self.top_n)
+        }
+
+    def prompt_summary(self, metrics: Dict[str, Any]) -> str:
+        """Metrics as prompt lines; at most top_n merchants / categories and recent_weeks weeks"""
+        swipes, flex, idle = metrics["swipes"], metrics["flex"], metrics["idle_swipe_spend"]
+        totals = metrics["totals"]
+
+        if flex["balance_at_end"] < 0:
+            flex_outlook = f"runs out with {flex['weeks_left']} of {flex['weeks_remaining']} weeks to go (${-flex['balance_at_end']:.2f} short)"
+        else:
+            flex_outlook = f"${flex['balance_at_end']:.2f} left over at semester end"
+
+        lines = [
+            f"- History: {metrics['transactions']} transactions over {metrics['history_weeks']} weeks, "
+            f"${totals['spent']:.2f} total (swipes ${totals['swipe']:.2f}, flex ${totals['flex']:.2f}, other ${totals['other']:.2f})",
+            f"- Swipes: {swipes['used_per_week']}/week used vs {swipes['plan_per_week']}/week in the plan "
+            f"({swipes['unused_per_week']} unused/week); {swipes['projected_unused']} projected unused at semester end "
+            f"(${swipes['projected_unused_value']:.2f} at ${SWIPE_VALUE:.0f}/swipe)",
+            f"- Swipes per week, last {len(swipes['recent_used'])} weeks (oldest first): "
+            f"{', '.join(str(x) for x in swipes['recent_used']) or 'none'}",
+            f"- Flex burn: ${flex['burn_per_week']:.2f}/week (last weeks ${flex['recent_burn_per_week']:.2f}/week) "
+            f"vs ${flex['sustainable_per_week']:.2f}/week sustainable; {flex_outlook}",
+            f"- Meal-sized flex/cash purchases in weeks with unused swipes: {idle['purchases']} "
+            f"(${idle['amount']:.2f} over {idle['weeks']} weeks)",
+        ]
+        for label, key in (("merchants", "merchants"), ("categories", "categories")):
+            top = metrics[key]["top"]
+            if top:
+                lines.append(
+                    f"- Top flex/cash {label}: "
+                    + ", ".join(f"{m['name']} ${m['total']:.2f} ({m['share']:.0%}, {m['count']}x)" for m in top)
+                    + f"; concentration HHI {metrics[key]['hhi']}"
+                )
+        return "\n".join(lines)
+
+    def analyze(self, metrics: Dict[str, Any], fallback: bool = False) -> SpendingAnalysis:
+        """
+        SpendingAnalysis built from the metrics alone (no LLM)
+
+        The main insight is the largest dollar leak among unused swipes, meal
+        purchases made while swipes sat idle, and a projected flex shortfall.
+        """
+        if fallback:
+            self._llm_fallbacks += 1
+        else:
+            self._local_served += 1
+
+        swipes, flex, idle = metrics["swipes"], metrics["flex"], metrics["idle_swipe_spend"]
+        top_merchant = metrics["merchants"]["top"][0] if metrics["merchants"]["top"] else None
+        swap_target = f"your {top_merchant['name']} runs" if top_merchant else "flex meals"
+
+        candidates = [(
+            swipes["projected_unused_value"],
+            f"At your current pace {swipes['projected_unused']} meal swipes "
+            f"(${swipes['projected_unused_value']:.2f}) will go unused by the end of the semester",
+            f"Use {swipes['unused_per_week']} more swipes a week - swap {swap_target} for a dining hall meal"
+        ), (
+            idle["amount"],
+            f"You spent ${idle['amount']:.2f} on {idle['purchases']} flex/cash meals in weeks your swipes went unused",
+            f"Before paying with flex, check your swipes - {swap_target} could have been a dining hall meal"
+        ), (
+            -flex["balance_at_end"],
+            f"At ${flex['burn_per_week']:.2f}/week your flex dollars run out "
+            f"{max(0.0, flex['weeks_remaining'] - (flex['weeks_left'] or 0)):.0f} weeks before the semester ends",
+            f"Keep flex spending under ${flex['sustainable_per_week']:.2f}/week and use swipes for full meals"
+        )]
+        dollar_amount, main_insight, recommendation = max(candidates, key=lambda c: c[0])
+        if dollar_amount <= 0:
+            dollar_amount, main_insight, recommendation = (
+                0.0,
+                "Your swipes and flex dollars are on pace to last the semester",
+                "Keep it up - use your swipes for full meals and save flex for snacks"
+            )
+
+        patterns = [
+            f"Using {swipes['used_per_week']} swipes/week vs {swipes['plan_per_week']} in your plan",
+            f"Flex burn ${flex['burn_per_week']:.2f}/week vs ${flex['sustainable_per_week']:.2f}/week to last the semester",
+        ]
+        if idle["purchases"]:
+            patterns.append(f"{idle['purchases']} flex/cash meals bought in weeks with swipes to spare")
+        if top_merchant:
+            patterns.append(f"{top_merchant['share']:.0%} of flex/cash spending goes to {top_merchant['name']}")
+
+        return SpendingAnalysis(
+            main_insight=main_insight,
+            dollar_amount=_money(dollar_amount),
+            patterns=patterns[:4],
+            recommendation=recommendation
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Computation counters for /metrics"""
+        computed = self._computed or 1
+        return {
+            "computed": self._computed,
+            "avg_transactions": round(self._transactions / computed, 1),
+            "avg_compute_ms": round(self._compute_seconds * 1000 / computed, 3),
+            "local_served": self._local_served,
+            "llm_fallbacks": self._llm_fallbacks
+        }
+
+
+spending_analytics = SpendingAnalytics()
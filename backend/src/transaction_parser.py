@@ -0,0 +1,341 @@
+"""
+Deterministic transaction parser - turns "chipotle 1250 cents flex" into
+{"merchant", "amount", "type"} locally, with a confidence score
+Only entries the grammar can't read confidently need to go to Claude
+"""
+
+import difflib
+import glob
+import json
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Below this confidence the entry goes to Claude instead (override via .env)
+PARSER_CONFIDENCE_THRESHOLD = float(os.getenv("PARSER_CONFIDENCE_THRESHOLD", "0.75"))
+# Minimum difflib similarity for a misspelled merchant to count as a match
+PARSER_FUZZY_CUTOFF = float(os.getenv("PARSER_FUZZY_CUTOFF", "0.8"))
+
+MOCK_DATA_DIR = os.path.join(os.path.dirname(__file__), "mock_data")
+
+# Canonical merchant -> lowercase aliases (the canonical name itself is always an alias)
+MERCHANT_LEXICON: Dict[str, List[str]] = {
+    "Starbucks": ["sbux", "starbies"],
+    "Chipotle": ["chipotle mexican grill"],
+    "Costco": ["costco wholesale"],
+    "Sweetgreen": ["sweet green"],
+    "Panera": ["panera bread"],
+    "Subway": [],
+    "McDonald's": ["mcdonalds", "mcdonald", "mickey d's", "mcd"],
+    "Taco Bell": ["tacobell"],
+    "Chick-fil-A": ["chick fil a", "chickfila", "chick-fil-a"],
+    "Panda Express": ["panda"],
+    "Domino's": ["dominos", "domino"],
+    "Peet's Coffee": ["peets", "peet's", "peets coffee"],
+    "Salad Stop": [],
+    "Green Bowl": [],
+    "Smoothie Shack": [],
+    "The Bistro": ["bistro"],
+    "Urban Table": [],
+    "Off-Campus Grill": ["off campus grill"],
+    "Food Truck": ["food truck friday"],
+}
+
+# Payment type keywords (matched as whole words, longer phrases first)
+TYPE_KEYWORDS: Dict[str, List[str]] = {
+    "swipe": ["meal swipe", "meal plan", "dining hall", "swipes", "swiped", "swipe"],
+    "flex": ["dining dollars", "flex dollars", "flex"],
+    "external": ["credit card", "debit card", "apple pay", "off campus", "off-campus",
+                 "venmo", "credit", "debit", "cash", "card"],
+}
+
+# Words that are never part of a merchant name
+STOPWORDS = {
+    "a", "an", "the", "at", "from", "for", "with", "on", "in", "to", "of", "and", "my", "i",
+    "spent", "spend", "paid", "pay", "bought", "buy", "got", "grabbed", "used", "use", "using",
+    "lunch", "dinner", "breakfast", "brunch", "snack", "coffee", "meal", "food", "today",
+    "yesterday", "dollars", "dollar", "bucks", "usd", "cents", "cent", "via", "by",
+}
+
+# Amount grammar: "1,250" / "1,250.00" group thousands with commas; otherwise
+# a comma before one or two digits is a decimal point ("12,50")
+_INTEGER = r"\d{1,3}(?:,\d{3})+|\d+"
+_NUMBER = r"(?<![\d,.])(\d{1,3}(?:,\d{3})+(?:\.\d{1,2})?|\d+(?:[.,]\d{1,2})?)(?!\d|[.,]\d)"
+
+# Amount patterns with the confidence each earns, most explicit first
+AMOUNT_PATTERNS: List[Tuple[str, "re.Pattern[str]", float]] = [
+    ("dollars_and_cents",
+     re.compile(rf"\$?\s*(?<![\d,.])({_INTEGER})\s*(?:dollars?|bucks)\s*(?:and\s*)?(\d{{1,2}})\s*(?:cents?|¢)"), 1.0),
+    ("cents", re.compile(rf"(?<![\d,.])({_INTEGER})\s*(?:cents?|¢|c\b)"), 1.0),
+    ("dollar_sign", re.compile(rf"\$\s*{_NUMBER}"), 1.0),
+    ("dollars", re.compile(rf"{_NUMBER}\s*(?:dollars?|bucks|usd)\b"), 1.0),
+    ("bare_decimal",
+     re.compile(r"(?<![\w.,])(\d{1,3}(?:,\d{3})+\.\d{1,2}|\d+[.,]\d{1,2})(?![\w.]|,\d)"), 0.95),
+    ("bare_integer", re.compile(rf"(?<![\w.,$])({_INTEGER})(?![\w.]|,\d)"), 0.9),
+]
+
+# A unit-less whole number this large is as likely cents ("starbucks 450") as dollars
+BARE_INTEGER_AMBIGUOUS = 100
+
+_WORD = re.compile(r"[a-z0-9'&-]+")
+
+
+def _phrase_pattern(phrases: Iterable[str]) -> "re.Pattern[str]":
+    """One regex matching any phrase as whole words, longest phrase first"""
+    alternatives = "|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+    return re.compile(rf"(?<![\w])(?:{alternatives})(?![\w])")
+
+
+TYPE_PATTERNS = {type_: _phrase_pattern(keywords) for type_, keywords in TYPE_KEYWORDS.items()}
+TYPE_WORDS = {word for keywords in TYPE_KEYWORDS.values() for keyword in keywords for word in keyword.split()}
+
+
+def _normalize(text: str) -> str:
+    """Lowercase, strip accents (Café -> cafe) and unify apostrophes"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return stripped.replace("’", "'").lower()
+
+
+@lru_cache(maxsize=1)
+def default_dining_halls() -> Tuple[str, ...]:
+    """Dining hall names from the DiningHalls section of the mock data files"""
+    names = set()
+    for path in glob.glob(os.path.join(MOCK_DATA_DIR, "*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            names.update(hall["name"] for hall in json.load(f).get("DiningHalls", []))
+    return tuple(sorted(names))
+
+
+@lru_cache(maxsize=64)
+def _alias_index(dining_halls: Tuple[str, ...]) -> Tuple[Dict[str, Tuple[str, bool]], "re.Pattern[str]"]:
+    """Normalized alias -> (canonical merchant, is a dining hall), plus a regex matching any alias"""
+    index: Dict[str, Tuple[str, bool]] = {}
+    for canonical, aliases in MERCHANT_LEXICON.items():
+        for alias in (canonical, *aliases):
+            index[_normalize(alias)] = (canonical, False)
+    for hall in dining_halls:
+        index[_normalize(hall)] = (hall, True)
+    return index, _phrase_pattern(index)
+
+
+@lru_cache(maxsize=4096)
+def _closest_alias(candidate: str, aliases: Tuple[str, ...], cutoff: float) -> Tuple[float, Optional[str]]:
+    """
+    Most similar alias to candidate with a difflib ratio of at least cutoff
+
+    Cached: the same few words ("lunch", "with friends") recur across entries.
+    """
+    best: Tuple[float, Optional[str]] = (0.0, None)
+    matcher = difflib.SequenceMatcher()
+    matcher.set_seq2(candidate)
+    for alias in aliases:
+        matcher.set_seq1(alias)
+        if matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= cutoff and ratio > best[0]:
+            best = (ratio, alias)
+    return best
+
+
+class LocalParse:
+    """Result of a local parse; amount/merchant are None when not found"""
+
+    __slots__ = ("merchant", "amount", "type", "confidence", "is_dining_hall", "signals")
+
+    def __init__(self, merchant: Optional[str], amount: Optional[float], type: str,
+                 confidence: float, is_dining_hall: bool, signals: Dict[str, str]):
+        self.merchant = merchant
+        self.amount = amount
+        self.type = type
+        self.confidence = confidence
+        self.is_dining_hall = is_dining_hall
+        self.signals = signals
+
+    @property
+    def complete(self) -> bool:
+        return self.merchant is not None and self.amount is not None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"merchant": self.merchant, "amount": self.amount, "type": self.type}
+
+
+class TransactionParser:
+    """
+    Grammar-based parser for free-text transaction entries
+
+    Each field gets its own confidence and the entry's confidence is their
+    product:
+        amount:    explicit unit ("$12", "1250 cents", "12 bucks") 1.0,
+                   bare decimal 0.95, bare integer 0.9; several candidate
+                   amounts or a bare integer of 100+ 0.5, none 0
+        merchant:  exact dining hall / lexicon alias 1.0, fuzzy match its
+                   difflib ratio, unknown words after "at"/"from" 0.6, none 0
+        type:      keyword 1.0, implied by a dining hall 0.95, defaulted to
+                   external 0.9, conflicting keywords 0.5
+
+    Also counts how many entries were answered locally vs. sent to the LLM.
+    """
+
+    def __init__(self, threshold: float, fuzzy_cutoff: float):
+        self.threshold = threshold
+        self.fuzzy_cutoff = fuzzy_cutoff
+
+        self._local = 0
+        self._llm = 0
+        self._llm_errors = 0
+        self._confidence_total = 0.0
+        self._parsed = 0
+
+    def parse(self, text: str, dining_halls: Optional[Iterable[str]] = None) -> LocalParse:
+        """
+        Parse text without calling out
+
+        Args:
+            text: Free-text entry, e.g. "spent 450 cents at starbucks with flex"
+            dining_halls: Dining hall names to recognise (default: the mock data's DiningHalls)
+        """
+        normalized = _normalize(text)
+        halls = tuple(sorted(set(dining_halls))) if dining_halls else default_dining_halls()
+
+        amount, amount_confidence, amount_signal, amount_spans = self._amount(normalized)
+        merchant, is_hall, merchant_confidence, merchant_signal = self._merchant(
+            normalized, amount_spans, _alias_index(halls)
+        )
+        type_, type_confidence, type_signal = self._type(normalized, is_hall)
+
+        confidence = round(amount_confidence * merchant_confidence * type_confidence, 3)
+        self._parsed += 1
+        self._confidence_total += confidence
+
+        return LocalParse(
+            merchant=merchant,
+            amount=amount,
+            type=type_,
+            confidence=confidence,
+            is_dining_hall=is_hall,
+            signals={"amount": amount_signal, "merchant": merchant_signal, "type": type_signal}
+        )
+
+    def _amount(self, text: str) -> Tuple[Optional[float], float, str, List[Tuple[int, int]]]:
+        # Matches from the most explicit tier that has any ("$3" and "450 cents" are one
+        # tier); a number already claimed by an earlier pattern is not read again
+        found: List[Tuple[str, float, float, Tuple[int, int]]] = []
+        for name, pattern, confidence in AMOUNT_PATTERNS:
+            if found and confidence < found[0][1]:
+                break
+            for match in pattern.finditer(text):
+                if not any(start < match.end() and match.start() < end for *_, (start, end) in found):
+                    found.append((name, confidence, self._amount_value(name, match), match.span()))
+        if not found:
+            return None, 0.0, "none", []
+
+        name, confidence = found[0][0], found[0][1]
+        values = {value for _, _, value, _ in found}
+        spans = [span for *_, span in found]
+        if len(values) > 1:
+            # "2 tacos for 7" / "450 cents and $3" - can't tell which number is the price
+            return max(values), 0.5, f"{name}:ambiguous", spans
+        value = values.pop()
+        if name == "bare_integer" and value >= BARE_INTEGER_AMBIGUOUS:
+            return value, 0.5, f"{name}:ambiguous", spans
+        return value, confidence, name, spans
+
+    @staticmethod
+    def _amount_value(name: str, match: "re.Match[str]") -> float:
+        if name == "dollars_and_cents":
+            return int(match.group(1).replace(",", "")) + int(match.group(2)) / 100
+        number = match.group(1)
+        if re.search(r",\d{3}", number):
+            number = number.replace(",", "")  # thousands separators
+        value = float(number.replace(",", "."))
+        if name == "cents":
+            value /= 100
+        return round(value, 2)
+
+    def _merchant(self, text: str, amount_spans: List[Tuple[int, int]],
+                  aliases: Tuple[Dict[str, Tuple[str, bool]], "re.Pattern[str]"]) -> Tuple[Optional[str], bool, float, str]:
+        index, alias_pattern = aliases
+
+        # Exact alias (the pattern tries longer aliases first, so "peets coffee" wins over "peets")
+        exact = alias_pattern.search(text)
+        if exact:
+            canonical, is_hall = index[exact.group(0)]
+            return canonical, is_hall, 1.0, "exact"
+
+        # Mask amounts, then fuzzy-match every 1-3 word window of what's left
+        for start, end in amount_spans:
+            text = text[:start] + " " * (end - start) + text[end:]
+        words = [word for word in _WORD.findall(text) if not word.isdigit()]
+        candidates = [
+            " ".join(words[i:i + size])
+            for size in (3, 2, 1)
+            for i in range(len(words) - size + 1)
+            if not all(word in STOPWORDS for word in words[i:i + size])
+        ]
+
+        best: Tuple[float, Optional[str]] = (0.0, None)
+        alias_names = tuple(index)
+        for candidate in candidates:
+            match = _closest_alias(candidate, alias_names, self.fuzzy_cutoff)
+            if match[0] > best[0]:
+                best = match
+        if best[1] is not None:
+            canonical, is_hall = index[best[1]]
+            return canonical, is_hall, round(best[0], 3), "fuzzy"
+
+        # Unknown place named after "at"/"from": keep it, but don't trust it much
+        named = re.search(r"\b(?:at|from)\s+([a-z][a-z'&-]*(?:\s+[a-z][a-z'&-]*){0,2})", text)
+        if named:
+            name_words = []
+            for word in named.group(1).split():
+                if word in STOPWORDS or word in TYPE_WORDS:
+                    break
+                name_words.append(word)
+            if name_words:
+                return " ".join(word.capitalize() for word in name_words), False, 0.6, "guessed"
+
+        return None, False, 0.0, "none"
+
+    @staticmethod
+    def _type(text: str, is_hall: bool) -> Tuple[str, float, str]:
+        found = [type_ for type_, pattern in TYPE_PATTERNS.items() if pattern.search(text)]
+
+        if len(found) == 1:
+            return found[0], 1.0, "keyword"
+        if len(found) > 1:
+            # "swiped my card" / "flex at the dining hall" - prefer the more specific type
+            for type_ in ("flex", "swipe", "external"):
+                if type_ in found:
+                    return type_, 0.5, "conflict"
+        if is_hall:
+            return "swipe", 0.95, "dining_hall"
+        return "external", 0.9, "default"
+
+    def record(self, source: str) -> None:
+        """Count an answered entry: "local", "llm" or "llm_error" """
+        if source == "local":
+            self._local += 1
+        elif source == "llm":
+            self._llm += 1
+        else:
+            self._llm_errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Local vs. LLM split for /metrics"""
+        answered = self._local + self._llm + self._llm_errors
+        return {
+            "threshold": self.threshold,
+            "parsed": self._parsed,
+            "local": self._local,
+            "llm": self._llm,
+            "llm_errors": self._llm_errors,
+            "local_rate": round(self._local / answered, 3) if answered else 0.0,
+            "avg_confidence": round(self._confidence_total / self._parsed, 3) if self._parsed else 0.0
+        }
+
+
+transaction_parser = TransactionParser(threshold=PARSER_CONFIDENCE_THRESHOLD, fuzzy_cutoff=PARSER_FUZZY_CUTOFF)
@@ -7,10 +7,11 @@ import os
 import requests
 import base64
 from typing import Dict, List, Optional, Any
-from dotenv import load_dotenv
 import logging
 
-load_dotenv()
+from src.singleflight import SingleFlight
+from src.resilience import Upstream
+from src import deadline
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +26,32 @@ MERCHANT_SEARCH_URL = "https://sandbox.api.visa.com/merchantsearch/v1/search"
 MERCHANT_LOCATOR_URL = "https://sandbox.api.visa.com/merchantlocator/v1/locator"
 VMORC_URL = "https://sandbox.api.visa.com/vmorc/v1/offers"
 
+# Identical concurrent merchant searches / offer lookups share one Visa request
+visa_flight = SingleFlight("visa")
+
+# Visa timeouts and breaker / retry policy; searches and offer lookups are
+# read-only, so transient failures are retried (override via .env)
+VISA_TIMEOUT = float(os.getenv("VISA_TIMEOUT", "10"))
+VISA_RETRIES = int(os.getenv("VISA_RETRIES", "2"))
+VISA_BREAKER_FAILURES = int(os.getenv("VISA_BREAKER_FAILURES", "5"))
+VISA_BREAKER_RESET = float(os.getenv("VISA_BREAKER_RESET", "30"))
+VISA_SLO_P95_MS = float(os.getenv("VISA_SLO_P95_MS", "3000"))
+
+def _transient_visa_error(e: BaseException) -> bool:
+    """Timeouts, connection failures, rate limits and server errors"""
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return isinstance(e, (requests.Timeout, requests.ConnectionError))
+
+visa_upstream = Upstream(
+    "visa",
+    retryable=_transient_visa_error,
+    retries=VISA_RETRIES,
+    failure_threshold=VISA_BREAKER_FAILURES,
+    reset_seconds=VISA_BREAKER_RESET,
+    slo_p95_ms=VISA_SLO_P95_MS
+)
+
 # MCC Code mappings for college spending categories
 MCC_CATEGORIES = {
     "fast_food": ["5814"],  # Fast Food Restaurants
@@ -45,6 +72,27 @@ def get_visa_auth_header() -> str:
     encoded = base64.b64encode(credentials.encode()).decode()
     return f"Basic {encoded}"
 
+def _post_visa(url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    POST to a Visa API under visa_upstream's breaker and retry policy
+    
+    Each attempt's timeout is capped by the request deadline (the contextvar
+    is copied into the worker thread by asyncio.to_thread).
+    
+    Raises:
+        CircuitOpenError: If the Visa breaker is open (callers use mock data at once)
+        DeadlineExceeded: If the request deadline has passed
+        requests.RequestException: If the request still fails after retries
+    """
+    def send() -> Dict[str, Any]:
+        response = requests.post(
+            url, headers=headers, json=payload, timeout=deadline.timeout(VISA_TIMEOUT, "visa")
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    return visa_upstream.call_sync(send)
+
 def search_merchant(
     merchant_name: str,
     latitude: Optional[float] = None,
@@ -99,15 +147,7 @@ def search_merchant(
             logger.info(f"Visa API not configured, using mock data for {merchant_name}")
             return get_mock_merchant_data(merchant_name)
         
-        response = requests.post(
-            MERCHANT_SEARCH_URL,
-            headers=headers,
-            json=payload,
-            timeout=10
-        )
-        
-        response.raise_for_status()
-        data = response.json()
+        data = _post_visa(MERCHANT_SEARCH_URL, headers, payload)
         
         # Extract first merchant result
         if data.get("response", {}).get("merchantList"):
@@ -163,15 +203,7 @@ def get_merchant_offers(
             logger.info("Visa API not configured, using mock offers")
             return get_mock_offers()
         
-        response = requests.post(
-            VMORC_URL,
-            headers=headers,
-            json=payload,
-            timeout=10
-        )
-        
-        response.raise_for_status()
-        data = response.json()
+        data = _post_visa(VMORC_URL, headers, payload)
         
         # Parse offers
         offers = []
@@ -0,0 +1,106 @@
+"""
+Startup warm-up - loads the forecasting stack in the background after boot
+Tracks progress so /ready can tell load balancers when the API is fully warm
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Warm the forecasting stack at startup; 0 = load everything on first use (override via .env)
+FORECAST_WARMUP = os.getenv("FORECAST_WARMUP", "1") != "0"
+
+
+def _warm_api_process() -> None:
+    """Import pandas / src.prediction and run one dummy NumPy forecast in the API process"""
+    from src.prediction import warm_up
+
+    warm_up(engine="numpy")
+
+
+class Warmup:
+    """
+    Background warm-up of the API process and the forecast worker pool
+
+    Two steps run concurrently once the server is up, each timed:
+        api:      import the forecasting code (pandas) here and run a dummy
+                  NumPy forecast, off the event loop
+        workers:  wait until every pool worker has imported Prophet, loaded
+                  the Stan model and run its dummy fit
+
+    Requests are served throughout; until warm-up finishes the first forecast
+    simply pays for whatever isn't loaded yet.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.state = "pending" if enabled else "disabled"
+        self.error: Optional[str] = None
+        self._steps_ms: Dict[str, float] = {}
+        self._total_ms: Optional[float] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ("ready", "disabled")
+
+    def start(self) -> None:
+        """Schedule warm-up on the running event loop (no-op if disabled or already started)"""
+        if not self.enabled or self._task is not None:
+            return
+        self.state = "warming"
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel an unfinished warm-up (server shutting down)"""
+        if self._task is None or self._task.done():
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _timed(self, step: str, warm: Callable[[], Awaitable[Any]]) -> None:
+        started = time.perf_counter()
+        await warm()
+        self._steps_ms[step] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def _run(self) -> None:
+        from src.forecast_executor import forecast_executor
+
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(
+                self._timed("api", lambda: asyncio.to_thread(_warm_api_process)),
+                self._timed("workers", forecast_executor.wait_until_warm)
+            )
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.error(f"Warm-up failed: {e}")
+            return
+
+        self._total_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.state = "ready"
+        logger.info(f"Warm-up complete in {self._total_ms:.0f} ms ({self._steps_ms})")
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness snapshot for /ready"""
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "steps_ms": dict(self._steps_ms),
+            "total_ms": self._total_ms,
+            "error": self.error
+        }
+
+
+warmup = Warmup(enabled=FORECAST_WARMUP)
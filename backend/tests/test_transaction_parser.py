@@ -0,0 +1,93 @@
+"""
+Amount grammar of the local transaction parser (src/transaction_parser.py)
+
+Run from backend/: python -m pytest tests
+"""
+
+import pytest
+
+from src.transaction_parser import PARSER_CONFIDENCE_THRESHOLD, TransactionParser
+
+HALLS = ["Main Dining Hall"]
+
+
+@pytest.fixture
+def parser():
+    return TransactionParser(threshold=PARSER_CONFIDENCE_THRESHOLD, fuzzy_cutoff=0.8)
+
+
+@pytest.mark.parametrize("text, amount", [
+    ("$1,250.00 at costco with card", 1250.0),
+    ("$1,250 at costco with card", 1250.0),
+    ("$12,345,678.90 at costco with card", 12345678.9),
+    ("1,000 dollars at costco with card", 1000.0),
+    ("$12,50 at starbucks with card", 12.5),
+    ("$4.5 at starbucks with card", 4.5),
+])
+def test_separators(parser, text, amount):
+    parsed = parser.parse(text, HALLS)
+    assert parsed.amount == amount
+    assert parsed.confidence == 1.0
+
+
+def test_bare_thousands_with_cents(parser):
+    parsed = parser.parse("1,250.00 at costco with card", HALLS)
+    assert parsed.amount == 1250.0
+    assert parsed.signals["amount"] == "bare_decimal"
+
+
+@pytest.mark.parametrize("text", [
+    "$1,2500 at costco with card",
+    "$1.250,00 at costco with card",
+])
+def test_malformed_grouping_is_not_read(parser, text):
+    parsed = parser.parse(text, HALLS)
+    assert parsed.amount is None
+    assert parsed.confidence < PARSER_CONFIDENCE_THRESHOLD
+
+
+@pytest.mark.parametrize("text, amount", [
+    ("450 cents at starbucks with flex", 4.5),
+    ("1,250 cents at chipotle with flex", 12.5),
+    ("99¢ at starbucks with flex", 0.99),
+    ("12 dollars and 50 cents at panera with flex", 12.5),
+])
+def test_cents(parser, text, amount):
+    parsed = parser.parse(text, HALLS)
+    assert parsed.amount == amount
+    assert parsed.confidence == 1.0
+
+
+@pytest.mark.parametrize("text", ["starbucks 450 card", "costco 1,250 card", "starbucks 100 card"])
+def test_unitless_integer_of_100_or_more_is_ambiguous(parser, text):
+    parsed = parser.parse(text, HALLS)
+    assert parsed.signals["amount"] == "bare_integer:ambiguous"
+    assert parsed.confidence < PARSER_CONFIDENCE_THRESHOLD
+
+
+def test_small_unitless_integer_is_read_locally(parser):
+    parsed = parser.parse("starbucks 45 card", HALLS)
+    assert parsed.amount == 45.0
+    assert parsed.confidence >= PARSER_CONFIDENCE_THRESHOLD
+
+
+@pytest.mark.parametrize("text", [
+    "2 tacos for 7 at chipotle with card",
+    "$7 and $9 at chipotle with card",
+    "450 cents and $3 at starbucks with card",
+])
+def test_several_amounts_are_ambiguous(parser, text):
+    parsed = parser.parse(text, HALLS)
+    assert parsed.signals["amount"].endswith(":ambiguous")
+    assert parsed.confidence < PARSER_CONFIDENCE_THRESHOLD
+
+
+@pytest.mark.parametrize("text", [
+    "$5 at starbucks and $5 tip with card",
+    "$12 dollars at panera with card",
+    "12 dollars and 50 cents at panera with card",
+])
+def test_one_amount_read_twice_is_not_ambiguous(parser, text):
+    parsed = parser.parse(text, HALLS)
+    assert not parsed.signals["amount"].endswith(":ambiguous")
+    assert parsed.confidence == 1.0
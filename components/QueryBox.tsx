@@ -3,7 +3,7 @@
 import { useState, useEffect } from 'react';
 import { createClient } from '@/lib/supabase/client';
 import { useRouter } from 'next/navigation';
-import { queryMealRecommendation } from '@/lib/api';
+import { streamMealRecommendation } from '@/lib/api';
 import { getSmartQueryResponse } from '@/lib/smartMockResponses';
 import { MOCK_USER, MOCK_DINING_HALLS } from '@/lib/mockData';
 import { DEMO_PROFILES } from '@/lib/demoProfiles';
@@ -12,6 +12,7 @@ export default function QueryBox() {
   const [query, setQuery] = useState('');
   const [response, setResponse] = useState('');
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
   const [userData, setUserData] = useState<any>(MOCK_USER);
   const router = useRouter();
   const supabase = createClient();
@@ -48,6 +49,7 @@ export default function QueryBox() {
     if (!query.trim()) return;
 
     setLoading(true);
+    setStreaming(true);
     setResponse('');
     
     // Reload user data BEFORE each query to get latest preferences
@@ -70,9 +72,13 @@ export default function QueryBox() {
       }
     }
     
-    const result = await queryMealRecommendation(query, freshUserData, MOCK_DINING_HALLS);
-    setResponse(result);
+    // Show the answer as it streams in; the skeleton only covers time-to-first-token
+    await streamMealRecommendation(query, freshUserData, MOCK_DINING_HALLS, (text) => {
+      setResponse(text);
+      setLoading(false);
+    });
     setLoading(false);
+    setStreaming(false);
   }
 
   return (
@@ -92,17 +98,17 @@ export default function QueryBox() {
             value={query}
             onChange={(e) => setQuery(e.target.value)}
             onKeyDown={(e) => {
-              if (e.key === 'Enter' && !loading && query.trim()) {
+              if (e.key === 'Enter' && !loading && !streaming && query.trim()) {
                 handleSubmit(e as any);
               }
             }}
             placeholder="What do you want to eat?"
             className="flex-1 px-5 py-4 rounded-xl text-gray-900 font-medium shadow-lg focus:outline-none focus:ring-4 focus:ring-white/50 transition-all"
-            disabled={loading}
+            disabled={loading || streaming}
           />
           <button
             onClick={handleSubmit}
-            disabled={loading || !query.trim()}
+            disabled={loading || streaming || !query.trim()}
             className="px-8 py-4 bg-white text-purple-600 font-bold rounded-xl hover:bg-purple-50 hover:scale-105 transition-all duration-300 disabled:opacity-50 disabled:cursor-not-allowed disabled:hover:scale-100 shadow-lg"
           >
             {loading ? '🤔 Thinking...' : '✨ Ask'}
@@ -57,6 +57,64 @@ export async function generateDailyFeed(userData: any, diningHalls: any[], curre
   }
 }
 
+// Streams recommendations from /api/recommendations/stream (NDJSON), calling
+// onRecommendation as each one arrives. Falls back to generateDailyFeed if
+// the stream fails before anything was received.
+export async function streamDailyFeed(
+  userData: any,
+  diningHalls: any[],
+  currentTime: Date,
+  onRecommendation: (rec: any) => void
+): Promise<any[]> {
+  const recs: any[] = [];
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/recommendations/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'Accept': 'application/x-ndjson' },
+      body: JSON.stringify({
+        user_data: userData,
+        dining_halls: diningHalls,
+        current_time: currentTime.toISOString()
+      })
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`API error: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // One recommendation per line
+      let newline = buffer.indexOf('\n');
+      while (newline !== -1) {
+        const line = buffer.slice(0, newline).trim();
+        buffer = buffer.slice(newline + 1);
+        newline = buffer.indexOf('\n');
+        if (!line) continue;
+
+        const rec = JSON.parse(line);
+        recs.push(rec);
+        onRecommendation(rec);
+      }
+    }
+
+    return recs;
+  } catch (error) {
+    console.error('Recommendations stream failed, retrying without streaming:', error);
+    if (recs.length > 0) return recs;
+    const fallback = await generateDailyFeed(userData, diningHalls, currentTime);
+    fallback.forEach(onRecommendation);
+    return fallback;
+  }
+}
+
 export async function queryMealRecommendation(query: string, userData: any, diningHalls: any[]) {
   try {
     // Get user's local time
@@ -91,6 +149,75 @@ export async function queryMealRecommendation(query: string, userData: any, dini
   }
 }
 
+// Streams the answer from /api/query/stream (Server-Sent Events), calling
+// onText with the full text so far on every chunk. Falls back to the
+// non-streaming endpoint if the stream can't be opened.
+export async function streamMealRecommendation(
+  query: string,
+  userData: any,
+  diningHalls: any[],
+  onText: (text: string) => void
+): Promise<string> {
+  const now = new Date();
+  const localISOTime = new Date(now.getTime() - (now.getTimezoneOffset() * 60000)).toISOString();
+
+  let text = '';
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/query/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+      body: JSON.stringify({
+        query: query,
+        user_data: userData,
+        dining_halls: diningHalls,
+        current_time: localISOTime
+      })
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`API error: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // SSE frames are separated by a blank line
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        const event = frame.match(/^event: (.*)$/m)?.[1];
+        const data = frame.match(/^data: (.*)$/m)?.[1];
+        if (!event || !data) continue;
+
+        const payload = JSON.parse(data);
+        if (event === 'delta') {
+          text += payload.text;
+        } else if (event === 'fallback' || event === 'done') {
+          text = payload.response;
+        }
+        onText(text);
+      }
+    }
+
+    return text;
+  } catch (error) {
+    console.error('Query stream failed, retrying without streaming:', error);
+    if (text) return text;
+    const result = await queryMealRecommendation(query, userData, diningHalls);
+    onText(result);
+    return result;
+  }
+}
+
 export async function getCurrentUserData(userEmail: string) {
   const { data: user } = await supabase
     .from('users')
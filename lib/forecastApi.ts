@@ -18,6 +18,9 @@ export interface ForecastRequest {
   mode: 'daily' | 'weekly' | 'monthly';
   filter_type?: 'category' | 'location' | 'type';
   filter_value?: string;
+  engine?: 'prophet' | 'numpy' | 'auto';
+  interval_strategy?: 'full' | 'reduced' | 'analytic';
+  interval_widths?: number[];
 }
 
 export interface ForecastResult {
@@ -26,6 +29,8 @@ export interface ForecastResult {
     predicted_amount: number;
     lower_bound: number;
     upper_bound: number;
+    // lower_bound_<pct> / upper_bound_<pct> for each extra interval width
+    [key: string]: string | number;
   }>;
   summary: {
     total_forecasted: number;
@@ -44,6 +49,13 @@ export interface ForecastResult {
       start: string;
       end: string;
     };
+    engine?: 'prophet' | 'numpy';
+    interval_strategy?: 'full' | 'reduced' | 'analytic';
+    timings_ms?: {
+      fit: number;
+      predict: number;
+      intervals?: number;
+    };
   };
 }
 
@@ -0,0 +1,81 @@
+// lib/rollupApi.ts - Spending rollup (chart data) API Wrapper
+const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+
+export type RollupGrain = 'day' | 'week' | 'month';
+export type RollupGroupBy = 'category' | 'location' | 'type';
+
+export interface RollupPoint {
+  period: string;  // first day of the day/week (Monday)/month
+  amount: number;
+  count: number;
+}
+
+export interface SpendingRollup {
+  user_id: string;
+  grain: RollupGrain;
+  group_by: RollupGroupBy | null;
+  periods: string[];
+  total: RollupPoint[];
+  groups?: Record<string, RollupPoint[]>;
+}
+
+export interface RollupRequest {
+  UserData: {
+    id?: string;  // required: rollups are keyed by the user's id
+    name: string;
+    [key: string]: any;
+  };
+  Transactions?: Array<{
+    id?: string;
+    date: string;
+    amount: number;
+    category?: string;
+    location?: string;
+    type?: string;
+    [key: string]: any;
+  }>;
+  grain?: RollupGrain;
+  group_by?: RollupGroupBy;
+}
+
+export async function getSpendingRollup(request: RollupRequest): Promise<SpendingRollup | null> {
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/spending-rollup`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(request)
+    });
+
+    if (!response.ok) {
+      throw new Error(`Rollup fetch failed: ${response.status}`);
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error('Spending rollup fetch failed:', error);
+    return null;
+  }
+}
+
+export async function appendRollupTransactions(
+  userData: RollupRequest['UserData'],
+  transactions: NonNullable<RollupRequest['Transactions']>
+): Promise<number> {
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/spending-rollup/append`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ UserData: userData, Transactions: transactions })
+    });
+
+    if (!response.ok) {
+      throw new Error(`Rollup append failed: ${response.status}`);
+    }
+
+    const data = await response.json();
+    return data.added || 0;
+  } catch (error) {
+    console.error('Rollup append failed:', error);
+    return 0;
+  }
+}
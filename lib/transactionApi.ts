@@ -6,6 +6,8 @@ export interface ParsedTransaction {
   amount: number;
   type: 'swipe' | 'flex' | 'external';
   category?: string;
+  confidence?: number | null;  // local parser confidence (null when Claude parsed it)
+  source?: 'local' | 'llm';
 }
 
 export async function parseTransaction(naturalLanguage: string): Promise<ParsedTransaction | null> {